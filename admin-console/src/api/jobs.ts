@@ -0,0 +1,25 @@
+import apiClient from './client';
+import { JobRun, JobRunStatus, JobSummary } from '@/types';
+
+export interface JobRunFilters {
+  job_id?: string;
+  status?: JobRunStatus;
+  limit?: number;
+}
+
+export const jobsApi = {
+  getSummaries: async (hours = 24): Promise<JobSummary[]> => {
+    const response = await apiClient.get<JobSummary[]>(`/admin/system/jobs?hours=${hours}`);
+    return response.data;
+  },
+
+  getRuns: async (filters?: JobRunFilters): Promise<JobRun[]> => {
+    const params = new URLSearchParams();
+    if (filters?.job_id) params.append('job_id', filters.job_id);
+    if (filters?.status) params.append('status', filters.status);
+    if (filters?.limit) params.append('limit', filters.limit.toString());
+
+    const response = await apiClient.get<JobRun[]>(`/admin/system/job-runs?${params.toString()}`);
+    return response.data;
+  },
+};
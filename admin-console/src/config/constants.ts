@@ -22,6 +22,7 @@ export const ROUTES = {
   PAYOUTS: '/payouts',
   MESSAGING: '/messaging',
   AUDIT_LOGS: '/audit-logs',
+  JOBS: '/jobs',
   SETTINGS: '/settings',
   PROFILE: '/profile',
   KYC: '/kyc',
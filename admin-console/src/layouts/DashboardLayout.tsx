@@ -37,6 +37,7 @@ import {
   Campaign,
   Home,
   Info,
+  Schedule,
 } from '@mui/icons-material';
 import { useAuthStore } from '@/store/auth';
 import { useThemeStore } from '@/store/theme';
@@ -57,6 +58,7 @@ const menuItems = [
   { text: 'Payouts', icon: <Payment />, path: ROUTES.PAYOUTS },
   { text: 'Messaging', icon: <Message />, path: ROUTES.MESSAGING },
   { text: 'Audit Logs', icon: <Assessment />, path: ROUTES.AUDIT_LOGS },
+  { text: 'Background Jobs', icon: <Schedule />, path: ROUTES.JOBS },
   { text: 'Banners', icon: <Campaign />, path: ROUTES.BANNERS },
   { text: 'About Us', icon: <Info />, path: ROUTES.ABOUT },
   { text: 'Settings', icon: <Settings />, path: ROUTES.SETTINGS },
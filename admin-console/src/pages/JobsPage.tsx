@@ -0,0 +1,224 @@
+import { useState } from 'react';
+import {
+  Box,
+  Typography,
+  Paper,
+  Table,
+  TableBody,
+  TableCell,
+  TableContainer,
+  TableHead,
+  TableRow,
+  TextField,
+  MenuItem,
+  Grid,
+  CircularProgress,
+  Chip,
+  Tooltip,
+} from '@mui/material';
+import { useQuery } from '@tanstack/react-query';
+import { jobsApi } from '@/api/jobs';
+import { JobRunStatus } from '@/types';
+
+const statusColors: Record<JobRunStatus, 'default' | 'warning' | 'info' | 'success' | 'error'> = {
+  running: 'info',
+  success: 'success',
+  error: 'error',
+  skipped: 'warning',
+};
+
+const formatDuration = (ms?: number) => {
+  if (ms === undefined || ms === null) return '-';
+  if (ms < 1000) return `${Math.round(ms)} ms`;
+  return `${(ms / 1000).toFixed(1)} s`;
+};
+
+const formatTime = (value?: string) => (value ? new Date(value).toLocaleString() : '-');
+
+export default function JobsPage() {
+  const [hours, setHours] = useState(24);
+  const [jobId, setJobId] = useState('');
+  const [status, setStatus] = useState<JobRunStatus | ''>('');
+
+  const { data: summaries, isLoading } = useQuery({
+    queryKey: ['job-summaries', hours],
+    queryFn: () => jobsApi.getSummaries(hours),
+    refetchInterval: 30000,
+  });
+
+  const { data: runs, isLoading: runsLoading } = useQuery({
+    queryKey: ['job-runs', jobId, status],
+    queryFn: () => jobsApi.getRuns({ job_id: jobId || undefined, status: status || undefined, limit: 200 }),
+    refetchInterval: 30000,
+  });
+
+  return (
+    <Box>
+      <Box display="flex" justifyContent="space-between" alignItems="center" mb={3}>
+        <Box>
+          <Typography variant="h4" gutterBottom fontWeight="bold">
+            Background Jobs
+          </Typography>
+          <Typography variant="body1" color="text.secondary">
+            Scheduled job runs, durations and failures
+          </Typography>
+        </Box>
+        <TextField
+          select
+          label="Window"
+          value={hours}
+          onChange={(e) => setHours(Number(e.target.value))}
+          sx={{ minWidth: 160 }}
+        >
+          <MenuItem value={1}>Last hour</MenuItem>
+          <MenuItem value={24}>Last 24 hours</MenuItem>
+          <MenuItem value={168}>Last 7 days</MenuItem>
+        </TextField>
+      </Box>
+
+      {isLoading ? (
+        <Box display="flex" justifyContent="center" alignItems="center" minHeight="30vh">
+          <CircularProgress />
+        </Box>
+      ) : (
+        <TableContainer component={Paper} sx={{ mb: 4 }}>
+          <Table size="small">
+            <TableHead>
+              <TableRow>
+                <TableCell>Job</TableCell>
+                <TableCell>Last Run</TableCell>
+                <TableCell>Last Success</TableCell>
+                <TableCell align="right">Runs</TableCell>
+                <TableCell align="right">Errors</TableCell>
+                <TableCell align="right">Skipped</TableCell>
+                <TableCell align="right">Avg / Max</TableCell>
+                <TableCell align="right">Rows Written</TableCell>
+              </TableRow>
+            </TableHead>
+            <TableBody>
+              {summaries && summaries.length > 0 ? (
+                summaries.map((job) => (
+                  <TableRow
+                    key={job.job_id}
+                    hover
+                    selected={job.job_id === jobId}
+                    onClick={() => setJobId(job.job_id === jobId ? '' : job.job_id)}
+                    sx={{ cursor: 'pointer' }}
+                  >
+                    <TableCell>{job.job_id}</TableCell>
+                    <TableCell>
+                      {job.last_run ? (
+                        <Tooltip title={job.last_run.error || ''}>
+                          <Chip
+                            label={`${job.last_run.status} · ${formatTime(job.last_run.started_at)}`}
+                            size="small"
+                            color={statusColors[job.last_run.status]}
+                          />
+                        </Tooltip>
+                      ) : (
+                        '-'
+                      )}
+                    </TableCell>
+                    <TableCell>{formatTime(job.last_success_at)}</TableCell>
+                    <TableCell align="right">{job.runs}</TableCell>
+                    <TableCell align="right">{job.errors}</TableCell>
+                    <TableCell align="right">{job.skipped}</TableCell>
+                    <TableCell align="right">
+                      {formatDuration(job.avg_duration_ms)} / {formatDuration(job.max_duration_ms)}
+                    </TableCell>
+                    <TableCell align="right">{job.rows_written}</TableCell>
+                  </TableRow>
+                ))
+              ) : (
+                <TableRow>
+                  <TableCell colSpan={8} align="center">
+                    No job runs recorded
+                  </TableCell>
+                </TableRow>
+              )}
+            </TableBody>
+          </Table>
+        </TableContainer>
+      )}
+
+      <Paper sx={{ p: 2, mb: 3 }}>
+        <Grid container spacing={2} alignItems="center">
+          <Grid item xs={12} sm={6} md={4}>
+            <TextField
+              fullWidth
+              label="Job"
+              value={jobId}
+              onChange={(e) => setJobId(e.target.value)}
+            />
+          </Grid>
+          <Grid item xs={12} sm={6} md={4}>
+            <TextField
+              select
+              fullWidth
+              label="Status"
+              value={status}
+              onChange={(e) => setStatus(e.target.value as JobRunStatus | '')}
+            >
+              <MenuItem value="">All</MenuItem>
+              <MenuItem value="running">Running</MenuItem>
+              <MenuItem value="success">Success</MenuItem>
+              <MenuItem value="error">Error</MenuItem>
+              <MenuItem value="skipped">Skipped</MenuItem>
+            </TextField>
+          </Grid>
+        </Grid>
+      </Paper>
+
+      {runsLoading ? (
+        <Box display="flex" justifyContent="center" alignItems="center" minHeight="30vh">
+          <CircularProgress />
+        </Box>
+      ) : (
+        <TableContainer component={Paper}>
+          <Table size="small">
+            <TableHead>
+              <TableRow>
+                <TableCell>Run</TableCell>
+                <TableCell>Job</TableCell>
+                <TableCell>Status</TableCell>
+                <TableCell>Started</TableCell>
+                <TableCell align="right">Duration</TableCell>
+                <TableCell align="right">Scanned</TableCell>
+                <TableCell align="right">Written</TableCell>
+                <TableCell>Worker</TableCell>
+                <TableCell>Error</TableCell>
+              </TableRow>
+            </TableHead>
+            <TableBody>
+              {runs && runs.length > 0 ? (
+                runs.map((run) => (
+                  <TableRow key={run.run_id}>
+                    <TableCell>#{run.run_id}</TableCell>
+                    <TableCell>{run.job_id}</TableCell>
+                    <TableCell>
+                      <Chip label={run.status} size="small" color={statusColors[run.status]} />
+                    </TableCell>
+                    <TableCell>{formatTime(run.started_at)}</TableCell>
+                    <TableCell align="right">{formatDuration(run.duration_ms)}</TableCell>
+                    <TableCell align="right">{run.rows_scanned ?? '-'}</TableCell>
+                    <TableCell align="right">{run.rows_written ?? '-'}</TableCell>
+                    <TableCell>{run.worker || '-'}</TableCell>
+                    <TableCell sx={{ maxWidth: 320, overflow: 'hidden', textOverflow: 'ellipsis', whiteSpace: 'nowrap' }}>
+                      {run.error ? <Tooltip title={run.error}><span>{run.error}</span></Tooltip> : '-'}
+                    </TableCell>
+                  </TableRow>
+                ))
+              ) : (
+                <TableRow>
+                  <TableCell colSpan={9} align="center">
+                    No job runs found
+                  </TableCell>
+                </TableRow>
+              )}
+            </TableBody>
+          </Table>
+        </TableContainer>
+      )}
+    </Box>
+  );
+}
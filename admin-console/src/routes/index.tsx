@@ -15,6 +15,7 @@ import PaymentsPage from '@/pages/PaymentsPage';
 import PayoutsPage from '@/pages/PayoutsPage';
 import MessagingPage from '@/pages/MessagingPage';
 import AuditLogsPage from '@/pages/AuditLogsPage';
+import JobsPage from '@/pages/JobsPage';
 import SettingsPage from '@/pages/SettingsPage';
 import BannersPage from '@/pages/BannersPage';
 import AboutUsPage from '@/pages/AboutUsPage';
@@ -44,6 +45,7 @@ export function AppRoutes() {
         <Route path={ROUTES.PAYOUTS} element={<PayoutsPage />} />
         <Route path={ROUTES.MESSAGING} element={<MessagingPage />} />
         <Route path={ROUTES.AUDIT_LOGS} element={<AuditLogsPage />} />
+        <Route path={ROUTES.JOBS} element={<JobsPage />} />
         <Route path={ROUTES.SETTINGS} element={<SettingsPage />} />
         <Route path={ROUTES.BANNERS} element={<BannersPage />} />
         <Route path={ROUTES.ABOUT} element={<AboutUsPage />} />
@@ -60,6 +60,33 @@ export interface AuditLog {
   user_name?: string;
 }
 
+export type JobRunStatus = 'running' | 'success' | 'error' | 'skipped';
+
+export interface JobRun {
+  run_id: number;
+  job_id: string;
+  status: JobRunStatus;
+  worker?: string;
+  started_at: string;
+  finished_at?: string;
+  duration_ms?: number;
+  rows_scanned?: number;
+  rows_written?: number;
+  error?: string;
+}
+
+export interface JobSummary {
+  job_id: string;
+  runs: number;
+  errors: number;
+  skipped: number;
+  avg_duration_ms?: number;
+  max_duration_ms?: number;
+  rows_written: number;
+  last_success_at?: string;
+  last_run?: JobRun;
+}
+
 export interface KYCSubmission {
   user_id: number;
   name: string;
@@ -0,0 +1,50 @@
+"""add composite indexes for hot filter paths
+
+Revision ID: 3f9a2c1d7b40
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a2c1d7b40'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns) - mirrored in the models' __table_args__
+INDEXES = [
+    ('idx_stock_movements_buyer_crop_type_date', 'stock_movements',
+     ['buyer_user_id', 'crop_id', 'movement_type', 'movement_date']),
+    ('idx_inventory_alerts_buyer_crop_type_status', 'inventory_alerts',
+     ['buyer_user_id', 'crop_id', 'alert_type', 'status']),
+    ('idx_orders_buyer_status_created', 'orders',
+     ['buyer_id', 'status', 'created_at']),
+    ('idx_lots_plan_status', 'lots',
+     ['plan_id', 'current_status']),
+    ('idx_listings_lot_active', 'listings',
+     ['lot_id', 'is_active']),
+    ('idx_production_plans_crop_status_harvest', 'production_plans',
+     ['crop_id', 'status', 'expected_harvest_window_start']),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the tables writable while Postgres builds the index;
+    # it can't run inside a transaction. IF NOT EXISTS covers databases whose
+    # tables (and indexes) were created by create_tables().
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,39 @@
+"""add alert_dirty_crops outbox
+
+Revision ID: 8b1e4d2c9a51
+Revises: 3f9a2c1d7b40
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1e4d2c9a51'
+down_revision: Union[str, None] = '3f9a2c1d7b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # `python -m app.migrate` runs create_tables() first, which may already
+    # have created this table from the model
+    if sa.inspect(op.get_bind()).has_table('alert_dirty_crops'):
+        return
+    op.create_table(
+        'alert_dirty_crops',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('crop_id', sa.Integer(), nullable=False),
+        sa.Column('marked_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['crop_id'], ['crops.crop_id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_alert_dirty_crops_crop_id'), 'alert_dirty_crops', ['crop_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_alert_dirty_crops_crop_id'), table_name='alert_dirty_crops')
+    op.drop_table('alert_dirty_crops')
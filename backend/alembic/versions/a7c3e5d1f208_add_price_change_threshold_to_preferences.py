@@ -0,0 +1,31 @@
+"""add price change threshold to buyer inventory preferences
+
+Revision ID: a7c3e5d1f208
+Revises: f3b2c8d4e915
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e5d1f208'
+down_revision: Union[str, None] = 'f3b2c8d4e915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases bootstrapped with create_all already have the column
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('buyer_inventory_preferences')}
+    if 'price_change_threshold_pct' not in columns:
+        op.add_column('buyer_inventory_preferences',
+                      sa.Column('price_change_threshold_pct', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('buyer_inventory_preferences') as batch_op:
+        batch_op.drop_column('price_change_threshold_pct')
@@ -0,0 +1,50 @@
+"""add job_runs
+
+Revision ID: b5d8f1a2c736
+Revises: a7c3e5d1f208
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d8f1a2c736'
+down_revision: Union[str, None] = 'a7c3e5d1f208'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # `python -m app.migrate` runs create_tables() first, which may already
+    # have created this table from the model
+    if sa.inspect(op.get_bind()).has_table('job_runs'):
+        return
+    op.create_table(
+        'job_runs',
+        sa.Column('run_id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.Enum('RUNNING', 'SUCCESS', 'ERROR', 'SKIPPED', name='jobrunstatus'), nullable=False),
+        sa.Column('worker', sa.String(length=128), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('duration_ms', sa.Float(), nullable=True),
+        sa.Column('rows_scanned', sa.Integer(), nullable=True),
+        sa.Column('rows_written', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('run_id'),
+    )
+    op.create_index(op.f('ix_job_runs_run_id'), 'job_runs', ['run_id'], unique=False)
+    op.create_index('idx_job_runs_job_started', 'job_runs', ['job_id', 'started_at'], unique=False)
+    op.create_index('idx_job_runs_started', 'job_runs', ['started_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_job_runs_started', table_name='job_runs')
+    op.drop_index('idx_job_runs_job_started', table_name='job_runs')
+    op.drop_index(op.f('ix_job_runs_run_id'), table_name='job_runs')
+    op.drop_table('job_runs')
+    sa.Enum(name='jobrunstatus').drop(op.get_bind(), checkfirst=True)
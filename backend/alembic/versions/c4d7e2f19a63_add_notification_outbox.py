@@ -0,0 +1,57 @@
+"""add notification_outbox
+
+Revision ID: c4d7e2f19a63
+Revises: 8b1e4d2c9a51
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d7e2f19a63'
+down_revision: Union[str, None] = '8b1e4d2c9a51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # `python -m app.migrate` runs create_tables() first, which may already
+    # have created this table from the model
+    if sa.inspect(op.get_bind()).has_table('notification_outbox'):
+        return
+    op.create_table(
+        'notification_outbox',
+        sa.Column('notification_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('channel', sa.Enum('EMAIL', 'SMS', name='notificationchannel'), nullable=False),
+        sa.Column('recipient', sa.String(length=255), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=True),
+        sa.Column('body_text', sa.Text(), nullable=False),
+        sa.Column('body_html', sa.Text(), nullable=True),
+        sa.Column('status', sa.Enum('PENDING', 'SENDING', 'SENT', 'DEAD', name='notificationstatus'), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('notification_id'),
+    )
+    op.create_index(op.f('ix_notification_outbox_notification_id'), 'notification_outbox', ['notification_id'], unique=False)
+    op.create_index(op.f('ix_notification_outbox_user_id'), 'notification_outbox', ['user_id'], unique=False)
+    op.create_index('idx_notification_outbox_status_next_attempt', 'notification_outbox',
+                    ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_notification_outbox_status_next_attempt', table_name='notification_outbox')
+    op.drop_index(op.f('ix_notification_outbox_user_id'), table_name='notification_outbox')
+    op.drop_index(op.f('ix_notification_outbox_notification_id'), table_name='notification_outbox')
+    op.drop_table('notification_outbox')
+    sa.Enum(name='notificationstatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='notificationchannel').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,47 @@
+"""backfill opening balance movements for the stock ledger
+
+Revision ID: c8e2a4f6b913
+Revises: b5d8f1a2c736
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e2a4f6b913'
+down_revision: Union[str, None] = 'b5d8f1a2c736'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OPENING_BALANCE_NOTE = 'Opening balance (ledger backfill)'
+
+
+def upgrade() -> None:
+    # Balances set before every change was recorded as a movement (and
+    # consumption the API used to record with a positive quantity) don't
+    # match their movements. One adjustment per stock makes the ledger
+    # match today's balances, so the nightly reconciliation only rebuilds
+    # drift from here on.
+    op.get_bind().execute(sa.text(
+        """
+        INSERT INTO stock_movements
+            (stock_id, buyer_user_id, crop_id, movement_type, quantity_kg, unit_cost_usd, notes, movement_date)
+        SELECT s.stock_id, s.buyer_user_id, s.crop_id, 'ADJUSTMENT',
+               s.current_quantity_kg - COALESCE(m.total, 0), s.unit_cost_usd, :note, CURRENT_TIMESTAMP
+        FROM buyer_stock s
+        LEFT JOIN (SELECT stock_id, SUM(quantity_kg) AS total FROM stock_movements GROUP BY stock_id) m
+            ON m.stock_id = s.stock_id
+        WHERE ABS(s.current_quantity_kg - COALESCE(m.total, 0)) > 0.0005
+        """
+    ), {'note': OPENING_BALANCE_NOTE})
+
+
+def downgrade() -> None:
+    op.get_bind().execute(
+        sa.text("DELETE FROM stock_movements WHERE movement_type = 'ADJUSTMENT' AND notes = :note"),
+        {'note': OPENING_BALANCE_NOTE},
+    )
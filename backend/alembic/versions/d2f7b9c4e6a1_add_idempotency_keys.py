@@ -0,0 +1,49 @@
+"""add idempotency_keys
+
+Revision ID: d2f7b9c4e6a1
+Revises: c8e2a4f6b913
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f7b9c4e6a1'
+down_revision: Union[str, None] = 'c8e2a4f6b913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # `python -m app.migrate` runs create_tables() first, which may already
+    # have created this table from the model
+    if sa.inspect(op.get_bind()).has_table('idempotency_keys'):
+        return
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('key_id', sa.Integer(), nullable=False),
+        sa.Column('scope', sa.String(length=64), nullable=False),
+        sa.Column('owner', sa.String(length=64), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('request_hash', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.Enum('IN_PROGRESS', 'COMPLETED', name='idempotencystatus'), nullable=False),
+        sa.Column('response_status', sa.Integer(), nullable=True),
+        sa.Column('response_body', sa.Text(), nullable=True),
+        sa.Column('locked_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('key_id'),
+        sa.UniqueConstraint('scope', 'owner', 'key', name='uq_idempotency_keys_scope_owner_key'),
+    )
+    op.create_index(op.f('ix_idempotency_keys_key_id'), 'idempotency_keys', ['key_id'], unique=False)
+    op.create_index('idx_idempotency_keys_expires', 'idempotency_keys', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_idempotency_keys_expires', table_name='idempotency_keys')
+    op.drop_index(op.f('ix_idempotency_keys_key_id'), table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
+    sa.Enum(name='idempotencystatus').drop(op.get_bind(), checkfirst=True)
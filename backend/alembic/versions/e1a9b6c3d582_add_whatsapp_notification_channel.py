@@ -0,0 +1,43 @@
+"""add whatsapp notification channel
+
+Revision ID: e1a9b6c3d582
+Revises: c4d7e2f19a63
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1a9b6c3d582'
+down_revision: Union[str, None] = 'c4d7e2f19a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # ADD VALUE can't run inside a transaction block before Postgres 12
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE notificationchannel ADD VALUE IF NOT EXISTS 'WHATSAPP'")
+    elif dialect != 'sqlite':
+        # SQLite stores the enum as an unconstrained VARCHAR
+        op.alter_column('notification_outbox', 'channel',
+                        existing_type=sa.Enum('EMAIL', 'SMS', name='notificationchannel'),
+                        type_=sa.Enum('EMAIL', 'SMS', 'WHATSAPP', name='notificationchannel'),
+                        existing_nullable=False)
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM notification_outbox WHERE channel = 'WHATSAPP'")
+    # Postgres can't drop an enum value; the unused label is harmless
+    dialect = op.get_bind().dialect.name
+    if dialect not in ('postgresql', 'sqlite'):
+        op.alter_column('notification_outbox', 'channel',
+                        existing_type=sa.Enum('EMAIL', 'SMS', 'WHATSAPP', name='notificationchannel'),
+                        type_=sa.Enum('EMAIL', 'SMS', name='notificationchannel'),
+                        existing_nullable=False)
@@ -0,0 +1,53 @@
+"""add stock_history_rollups
+
+Revision ID: f3b2c8d4e915
+Revises: e1a9b6c3d582
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b2c8d4e915'
+down_revision: Union[str, None] = 'e1a9b6c3d582'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # `python -m app.migrate` runs create_tables() first, which may already
+    # have created this table from the model
+    if sa.inspect(op.get_bind()).has_table('stock_history_rollups'):
+        return
+    op.create_table(
+        'stock_history_rollups',
+        sa.Column('rollup_id', sa.Integer(), nullable=False),
+        sa.Column('crop_id', sa.Integer(), nullable=False),
+        sa.Column('resolution', sa.String(length=10), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('sample_count', sa.Integer(), nullable=False),
+        sa.Column('total_available_kg', sa.Float(), nullable=False),
+        sa.Column('total_reserved_kg', sa.Float(), nullable=True),
+        sa.Column('total_sold_kg', sa.Float(), nullable=True),
+        sa.Column('remaining_kg', sa.Float(), nullable=False),
+        sa.Column('avg_price_per_kg', sa.Float(), nullable=True),
+        sa.Column('min_price_per_kg', sa.Float(), nullable=True),
+        sa.Column('max_price_per_kg', sa.Float(), nullable=True),
+        sa.Column('active_listings_count', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['crop_id'], ['crops.crop_id']),
+        sa.PrimaryKeyConstraint('rollup_id'),
+        sa.UniqueConstraint('crop_id', 'resolution', 'bucket_start', name='uq_stock_history_rollups_crop_bucket'),
+    )
+    op.create_index(op.f('ix_stock_history_rollups_rollup_id'), 'stock_history_rollups', ['rollup_id'], unique=False)
+    op.create_index('idx_stock_history_rollups_resolution_bucket', 'stock_history_rollups',
+                    ['resolution', 'bucket_start'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_stock_history_rollups_resolution_bucket', table_name='stock_history_rollups')
+    op.drop_index(op.f('ix_stock_history_rollups_rollup_id'), table_name='stock_history_rollups')
+    op.drop_table('stock_history_rollups')
@@ -19,7 +19,8 @@ from .endpoints import (
     banners,
     inventory_alerts,
     buyer_inventory,
-    admin_inventory
+    admin_inventory,
+    system
 )
 
 # Create main API router
@@ -47,3 +48,4 @@ api_router.include_router(banners.router, prefix="/banners", tags=["Banners"])
 api_router.include_router(inventory_alerts.router, prefix="/inventory", tags=["Inventory Alerts"])
 api_router.include_router(buyer_inventory.router, prefix="/buyer-inventory", tags=["Buyer Inventory Management"])
 api_router.include_router(admin_inventory.router, tags=["Admin Inventory Management"])
+api_router.include_router(system.router, prefix="/admin/system", tags=["System"])
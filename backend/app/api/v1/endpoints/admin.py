@@ -1,11 +1,12 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, select
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 
-from ....core.database import get_db
+from ....core.database import get_db, get_async_db
 from ....core.auth import get_current_active_user, require_staff
 from ....models.user import User, UserRole, UserStatus
 from ....models.order import Order, OrderStatus
@@ -40,67 +41,78 @@ class DashboardStats(BaseModel):
     items_expiring_soon: int
 
 
+async def _count(db: AsyncSession, model, *criteria) -> int:
+    """Run SELECT COUNT(*) for a model with optional filters"""
+    return await db.scalar(select(func.count()).select_from(model).where(*criteria)) or 0
+
+
 @router.get("/dashboard/stats", response_model=DashboardStats)
 async def get_dashboard_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_staff)
 ):
     """Get dashboard statistics for admin console"""
     
     # Farmers stats
-    total_farmers = db.query(User).filter(User.role == UserRole.FARMER).count()
-    active_farmers = db.query(User).filter(
+    total_farmers = await _count(db, User, User.role == UserRole.FARMER)
+    active_farmers = await _count(
+        db, User,
         User.role == UserRole.FARMER,
         User.status == UserStatus.ACTIVE
-    ).count()
+    )
     
     # Buyers stats
-    total_buyers = db.query(User).filter(User.role == UserRole.BUYER).count()
-    active_buyers = db.query(User).filter(
+    total_buyers = await _count(db, User, User.role == UserRole.BUYER)
+    active_buyers = await _count(
+        db, User,
         User.role == UserRole.BUYER,
         User.status == UserStatus.ACTIVE
-    ).count()
+    )
     
     # Orders stats
-    total_orders = db.query(Order).count()
-    orders_pending = db.query(Order).filter(Order.status == OrderStatus.PENDING_PAYMENT).count()
-    orders_in_transit = db.query(Order).filter(Order.status == OrderStatus.DISPATCHED).count()
+    total_orders = await _count(db, Order)
+    orders_pending = await _count(db, Order, Order.status == OrderStatus.PENDING_PAYMENT)
+    orders_in_transit = await _count(db, Order, Order.status == OrderStatus.DISPATCHED)
     
     # Orders delivered today
     today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    orders_delivered_today = db.query(Order).filter(
+    orders_delivered_today = await _count(
+        db, Order,
         Order.status == OrderStatus.DELIVERED,
         Order.actual_delivery_date != None,
         Order.actual_delivery_date >= today_start
-    ).count()
+    )
     
     # Revenue stats
-    total_revenue = db.query(func.sum(Order.total)).filter(
+    total_revenue = await db.scalar(select(func.sum(Order.total)).where(
         Order.status == OrderStatus.DELIVERED
-    ).scalar() or 0.0
+    )) or 0.0
     
     # Revenue this month
     month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    revenue_this_month = db.query(func.sum(Order.total)).filter(
+    revenue_this_month = await db.scalar(select(func.sum(Order.total)).where(
         Order.status == OrderStatus.DELIVERED,
         Order.actual_delivery_date != None,
         Order.actual_delivery_date >= month_start
-    ).scalar() or 0.0
+    )) or 0.0
     
     # Pending payouts
-    pending_payouts = db.query(func.sum(Payout.amount)).filter(
+    pending_payouts = await db.scalar(select(func.sum(Payout.amount)).where(
         Payout.status == PayoutStatus.PENDING
-    ).scalar() or 0.0
+    )) or 0.0
     
     # Pending KYC
-    pending_kyc = db.query(User).filter(
+    pending_kyc = await _count(
+        db, User,
         User.status == UserStatus.PENDING,
         User.is_verified == False
-    ).count()
+    )
     
     # Buyer inventory stats
     from ....models.buyer_stock import BuyerStock
-    buyer_stocks = db.query(BuyerStock).filter(BuyerStock.is_active == True).all()
+    buyer_stocks = (await db.execute(
+        select(BuyerStock).where(BuyerStock.is_active == True)
+    )).scalars().all()
     buyer_ids_with_stock = list(set([s.buyer_user_id for s in buyer_stocks]))
     buyers_with_stock = len(buyer_ids_with_stock)
     total_buyer_stock_value = sum(s.total_value_usd or 0.0 for s in buyer_stocks)
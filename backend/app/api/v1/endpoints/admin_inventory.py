@@ -1,11 +1,12 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, desc, select
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 
-from ....core.database import get_db
+from ....core.database import get_db, get_async_db
 from ....core.auth import require_staff
 from ....models.user import User, UserRole
 from ....models.buyer import Buyer
@@ -82,13 +83,15 @@ class AdminStockMovementResponse(BaseModel):
 # ============= Admin Inventory Dashboard Metrics =============
 @router.get("/admin/inventory/metrics", response_model=AdminInventoryMetrics)
 async def get_admin_inventory_metrics(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_staff)
 ):
     """Get overall inventory metrics across all buyers"""
     
     # Get all active stock items
-    stocks = db.query(BuyerStock).filter(BuyerStock.is_active == True).all()
+    stocks = (await db.execute(
+        select(BuyerStock).where(BuyerStock.is_active == True)
+    )).scalars().all()
     
     # Get unique buyers with stock
     buyer_ids = list(set([s.buyer_user_id for s in stocks]))
@@ -132,13 +135,17 @@ async def get_admin_inventory_metrics(
     today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     week_start = today_start - timedelta(days=7)
     
-    total_movements_today = db.query(StockMovement).filter(
-        StockMovement.movement_date >= today_start
-    ).count()
+    total_movements_today = await db.scalar(
+        select(func.count()).select_from(StockMovement).where(
+            StockMovement.movement_date >= today_start
+        )
+    )
     
-    total_movements_week = db.query(StockMovement).filter(
-        StockMovement.movement_date >= week_start
-    ).count()
+    total_movements_week = await db.scalar(
+        select(func.count()).select_from(StockMovement).where(
+            StockMovement.movement_date >= week_start
+        )
+    )
     
     return AdminInventoryMetrics(
         total_buyers_with_stock=total_buyers_with_stock,
@@ -157,30 +164,29 @@ async def get_admin_inventory_metrics(
 # ============= Buyer Stock Summaries =============
 @router.get("/admin/inventory/buyers", response_model=List[BuyerStockSummary])
 async def get_buyer_stock_summaries(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_staff)
 ):
     """Get stock summary for each buyer"""
     
     # Get all buyers with stock
-    buyer_ids = db.query(BuyerStock.buyer_user_id).distinct().all()
-    buyer_ids = [b[0] for b in buyer_ids]
+    buyer_ids = (await db.execute(select(BuyerStock.buyer_user_id).distinct())).scalars().all()
     
     result = []
     now = datetime.utcnow()
     
     for buyer_user_id in buyer_ids:
-        buyer_user = db.query(User).filter(User.user_id == buyer_user_id).first()
+        buyer_user = await db.get(User, buyer_user_id)
         if not buyer_user:
             continue
         
-        buyer_profile = db.query(Buyer).filter(Buyer.user_id == buyer_user_id).first()
+        buyer_profile = await db.scalar(select(Buyer).where(Buyer.user_id == buyer_user_id))
         
         # Get all stocks for this buyer
-        stocks = db.query(BuyerStock).filter(
+        stocks = (await db.execute(select(BuyerStock).where(
             BuyerStock.buyer_user_id == buyer_user_id,
             BuyerStock.is_active == True
-        ).all()
+        ))).scalars().all()
         
         total_stock_value = sum(s.total_value_usd or 0.0 for s in stocks)
         total_quantity_kg = sum(s.current_quantity_kg for s in stocks)
@@ -232,37 +238,37 @@ async def get_all_stock_items(
     crop_id: Optional[int] = Query(None, description="Filter by crop"),
     status_filter: Optional[str] = Query(None, description="Filter by status: safe, low, critical, reorder"),
     include_expired: bool = Query(False, description="Include expired items"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_staff)
 ):
     """Get all stock items across all buyers (admin view)"""
     
-    query = db.query(BuyerStock)
+    query = select(BuyerStock)
     
     if buyer_id:
-        buyer_profile = db.query(Buyer).filter(Buyer.buyer_id == buyer_id).first()
+        buyer_profile = await db.get(Buyer, buyer_id)
         if buyer_profile:
-            query = query.filter(BuyerStock.buyer_user_id == buyer_profile.user_id)
+            query = query.where(BuyerStock.buyer_user_id == buyer_profile.user_id)
     
     if crop_id:
-        query = query.filter(BuyerStock.crop_id == crop_id)
+        query = query.where(BuyerStock.crop_id == crop_id)
     
     if not include_expired:
-        query = query.filter(BuyerStock.is_expired == False)
+        query = query.where(BuyerStock.is_expired == False)
     
-    stocks = query.all()
+    stocks = (await db.execute(query)).scalars().all()
     result = []
     
     now = datetime.utcnow()
     
     for stock in stocks:
-        buyer_user = db.query(User).filter(User.user_id == stock.buyer_user_id).first()
+        buyer_user = await db.get(User, stock.buyer_user_id)
         if not buyer_user:
             continue
         
-        buyer_profile = db.query(Buyer).filter(Buyer.user_id == stock.buyer_user_id).first()
+        buyer_profile = await db.scalar(select(Buyer).where(Buyer.user_id == stock.buyer_user_id))
         
-        crop = db.query(Crop).filter(Crop.crop_id == stock.crop_id).first()
+        crop = await db.get(Crop, stock.crop_id)
         if not crop:
             continue
         
@@ -327,38 +333,38 @@ async def get_all_stock_movements(
     crop_id: Optional[int] = Query(None),
     movement_type: Optional[StockMovementType] = Query(None),
     days: int = Query(30, description="Number of days to look back"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_staff)
 ):
     """Get all stock movements across all buyers (admin view)"""
     
-    query = db.query(StockMovement)
+    query = select(StockMovement)
     
     if buyer_id:
-        buyer_profile = db.query(Buyer).filter(Buyer.buyer_id == buyer_id).first()
+        buyer_profile = await db.get(Buyer, buyer_id)
         if buyer_profile:
-            query = query.filter(StockMovement.buyer_user_id == buyer_profile.user_id)
+            query = query.where(StockMovement.buyer_user_id == buyer_profile.user_id)
     
     if crop_id:
-        query = query.filter(StockMovement.crop_id == crop_id)
+        query = query.where(StockMovement.crop_id == crop_id)
     
     if movement_type:
-        query = query.filter(StockMovement.movement_type == movement_type)
+        query = query.where(StockMovement.movement_type == movement_type)
     
     start_date = datetime.utcnow() - timedelta(days=days)
-    query = query.filter(StockMovement.movement_date >= start_date)
+    query = query.where(StockMovement.movement_date >= start_date)
     
-    movements = query.order_by(desc(StockMovement.movement_date)).limit(500).all()
+    movements = (await db.execute(query.order_by(desc(StockMovement.movement_date)).limit(500))).scalars().all()
     
     result = []
     for movement in movements:
-        buyer_user = db.query(User).filter(User.user_id == movement.buyer_user_id).first()
+        buyer_user = await db.get(User, movement.buyer_user_id)
         if not buyer_user:
             continue
         
-        buyer_profile = db.query(Buyer).filter(Buyer.user_id == movement.buyer_user_id).first()
+        buyer_profile = await db.scalar(select(Buyer).where(Buyer.user_id == movement.buyer_user_id))
         
-        crop = db.query(Crop).filter(Crop.crop_id == movement.crop_id).first()
+        crop = await db.get(Crop, movement.crop_id)
         if not crop:
             continue
         
@@ -385,13 +391,15 @@ async def get_all_stock_movements(
 @router.get("/admin/inventory/sales-intensity", response_model=List[dict])
 async def get_all_sales_intensity(
     days: int = Query(30, description="Analysis period in days"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_staff)
 ):
     """Get sales intensity analysis aggregated across all buyers"""
     
     # Get all active stocks
-    stocks = db.query(BuyerStock).filter(BuyerStock.is_active == True).all()
+    stocks = (await db.execute(
+        select(BuyerStock).where(BuyerStock.is_active == True)
+    )).scalars().all()
     
     # Group by crop
     crop_stocks = {}
@@ -404,7 +412,7 @@ async def get_all_sales_intensity(
     analysis_start = datetime.utcnow() - timedelta(days=days)
     
     for crop_id, crop_stock_list in crop_stocks.items():
-        crop = db.query(Crop).filter(Crop.crop_id == crop_id).first()
+        crop = await db.get(Crop, crop_id)
         if not crop:
             continue
         
@@ -418,12 +426,12 @@ async def get_all_sales_intensity(
         
         for stock in crop_stock_list:
             # Get consumption movements for this buyer/crop
-            consumption_movements = db.query(StockMovement).filter(
+            consumption_movements = (await db.execute(select(StockMovement).where(
                 StockMovement.buyer_user_id == stock.buyer_user_id,
                 StockMovement.crop_id == crop_id,
                 StockMovement.movement_type == StockMovementType.CONSUMPTION,
                 StockMovement.movement_date >= analysis_start
-            ).all()
+            ))).scalars().all()
             
             buyer_consumption = sum(abs(m.quantity_kg) for m in consumption_movements)
             total_consumption_kg += buyer_consumption
@@ -7,7 +7,7 @@ from datetime import datetime
 import json
 
 from ....core.database import get_db
-from ....core.auth import require_staff, get_password_hash
+from ....core.auth import require_staff, get_password_hash_async
 from ....models.user import User, UserRole, UserStatus
 from ....models.farm import Farm
 from ....models.production import ProductionPlan
@@ -156,6 +156,9 @@ async def create_buyer(
 ):
     """Create a new buyer user (admin only)"""
     
+    # Hash before any DB work so no pooled connection waits on bcrypt
+    hashed_password = await get_password_hash_async(buyer_data.password)
+    
     # Check if user already exists
     existing_user = db.query(User).filter(
         (User.phone == buyer_data.phone) | 
@@ -169,8 +172,6 @@ async def create_buyer(
         )
     
     # Create new buyer user
-    hashed_password = get_password_hash(buyer_data.password)
-    
     # Prepare profile data
     profile_data = {
         "bio": buyer_data.bio,
@@ -273,6 +274,9 @@ async def create_farmer(
 ):
     """Create a new farmer user (admin only)"""
     
+    # Hash before any DB work so no pooled connection waits on bcrypt
+    hashed_password = await get_password_hash_async(farmer_data.password)
+    
     # Check if user already exists
     existing_user = db.query(User).filter(
         (User.phone == farmer_data.phone) | 
@@ -286,8 +290,6 @@ async def create_farmer(
         )
     
     # Create new farmer user
-    hashed_password = get_password_hash(farmer_data.password)
-    
     # Prepare profile data
     profile_data = {
         "bio": farmer_data.bio,
@@ -10,8 +10,8 @@ from ....core.auth import (
     authenticate_user,
     create_access_token,
     get_current_active_user,
-    get_password_hash,
-    verify_password
+    get_password_hash_async,
+    verify_password_async
 )
 from ....models.user import User, UserRole, UserStatus
 
@@ -87,7 +87,7 @@ async def login(
     db: Session = Depends(get_db)
 ):
     """Authenticate user and return access token"""
-    user = authenticate_user(db, login_data.username, login_data.password)
+    user = await authenticate_user(db, login_data.username, login_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -95,7 +95,7 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Update last login
+    # Update last login (also saves a rehashed password)
     user.last_login = datetime.utcnow()
     db.commit()
     
@@ -129,6 +129,9 @@ async def register(
     db: Session = Depends(get_db)
 ):
     """Register new user"""
+    # Hash before any DB work so no pooled connection waits on bcrypt
+    hashed_password = await get_password_hash_async(user_data.password)
+    
     # Check if user already exists
     existing_user = db.query(User).filter(
         (User.phone == user_data.phone) | 
@@ -142,8 +145,6 @@ async def register(
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
-    
     new_user = User(
         name=user_data.name,
         phone=user_data.phone,
@@ -234,7 +235,7 @@ async def change_password(
     
     # Verify old password
     try:
-        if not verify_password(password_data.old_password, current_user.hashed_password):
+        if not await verify_password_async(password_data.old_password, current_user.hashed_password):
             logger.warning(f"Password change failed: Incorrect current password for user {current_user.user_id}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -258,7 +259,7 @@ async def change_password(
     
     # Update password with new hash
     try:
-        current_user.hashed_password = get_password_hash(password_data.new_password)
+        current_user.hashed_password = await get_password_hash_async(password_data.new_password)
         db.commit()
         db.refresh(current_user)
         logger.info(f"Password changed successfully for user {current_user.user_id}")
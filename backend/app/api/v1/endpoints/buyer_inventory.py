@@ -1,12 +1,13 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, func, desc, select
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 import json
 
-from ....core.database import get_db
+from ....core.database import get_db, get_async_db
 from ....core.auth import get_current_active_user, require_buyer
 from ....models.user import User, UserRole
 from ....models.buyer import Buyer
@@ -68,6 +69,27 @@ class StockMovementCreate(BaseModel):
     batch_number: Optional[str] = None
 
 
+class StockIngestRowResult(BaseModel):
+    row: int
+    status: str  # "applied" or "rejected"
+    stock_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class StockIngestStock(BaseModel):
+    stock_id: int
+    crop_id: int
+    new_quantity_kg: float
+
+
+class StockIngestResponse(BaseModel):
+    rows: int
+    applied: int
+    rejected: int
+    stocks: List[StockIngestStock]
+    results: List[StockIngestRowResult]
+
+
 class ReorderPointCalculation(BaseModel):
     crop_id: int
     average_daily_usage_kg: float
@@ -92,20 +114,20 @@ class SalesIntensityAnalysis(BaseModel):
 # ============= Stock Dashboard =============
 @router.get("/dashboard/metrics", response_model=StockDashboardMetrics)
 async def get_stock_dashboard_metrics(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_buyer)
 ):
     """Get overall stock dashboard metrics"""
     
-    buyer = db.query(Buyer).filter(Buyer.user_id == current_user.user_id).first()
+    buyer = await db.scalar(select(Buyer).where(Buyer.user_id == current_user.user_id))
     if not buyer:
         raise HTTPException(status_code=404, detail="Buyer profile not found")
     
     # Get all active stock items
-    stocks = db.query(BuyerStock).filter(
+    stocks = (await db.execute(select(BuyerStock).where(
         BuyerStock.buyer_user_id == current_user.user_id,
         BuyerStock.is_active == True
-    ).all()
+    ))).scalars().all()
     
     total_stock_value = sum(s.total_value_usd or 0.0 for s in stocks)
     total_quantity_kg = sum(s.current_quantity_kg for s in stocks)
@@ -156,25 +178,25 @@ async def get_stock_dashboard_metrics(
 async def get_stock_items(
     include_expired: bool = Query(False, description="Include expired items"),
     status_filter: Optional[str] = Query(None, description="Filter by status: safe, low, critical, reorder"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_buyer)
 ):
     """Get all stock items for the buyer"""
     
-    query = db.query(BuyerStock).filter(
+    query = select(BuyerStock).where(
         BuyerStock.buyer_user_id == current_user.user_id
     )
     
     if not include_expired:
-        query = query.filter(BuyerStock.is_expired == False)
+        query = query.where(BuyerStock.is_expired == False)
     
-    stocks = query.all()
+    stocks = (await db.execute(query)).scalars().all()
     result = []
     
     now = datetime.utcnow()
     
     for stock in stocks:
-        crop = db.query(Crop).filter(Crop.crop_id == stock.crop_id).first()
+        crop = await db.get(Crop, stock.crop_id)
         if not crop:
             continue
         
@@ -238,11 +260,28 @@ async def get_stock_items(
 @router.post("/stock/movements", response_model=dict)
 async def create_stock_movement(
     movement_data: StockMovementCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_buyer)
 ):
-    """Record a stock movement (purchase, consumption, waste, etc.)"""
-    
+    """
+    Record a stock movement (purchase, consumption, waste, etc.)
+
+    A retry with the same Idempotency-Key gets the first response back
+    instead of recording the movement twice.
+    """
+    from ....services.idempotency import idempotency
+
+    with idempotency(db, "stock.movements", idempotency_key, movement_data,
+                     owner=f"user:{current_user.user_id}") as request:
+        if request.replay is not None:
+            return request.replay
+        result = _record_stock_movement(db, movement_data, current_user)
+        request.complete(result)
+        return result
+
+
+def _record_stock_movement(db: Session, movement_data: StockMovementCreate, current_user: User) -> dict:
     buyer = db.query(Buyer).filter(Buyer.user_id == current_user.user_id).first()
     if not buyer:
         raise HTTPException(status_code=404, detail="Buyer profile not found")
@@ -271,13 +310,10 @@ async def create_stock_movement(
         db.add(stock)
         db.flush()
     
-    # Calculate quantity change
-    quantity_change = movement_data.quantity_kg
-    if movement_data.movement_type in [StockMovementType.CONSUMPTION, StockMovementType.WASTE]:
-        quantity_change = -abs(quantity_change)
+    from ....services.stock_ledger import apply_stock_delta, signed_quantity
     
-    # Update stock quantity
-    stock.current_quantity_kg += quantity_change
+    # Calculate quantity change
+    quantity_change = signed_quantity(movement_data.movement_type, movement_data.quantity_kg)
     
     # Handle purchase-specific fields
     if movement_data.movement_type == StockMovementType.PURCHASE:
@@ -299,25 +335,17 @@ async def create_stock_movement(
         if movement_data.order_id:
             stock.supplier_order_id = movement_data.order_id
     
-    # Update stock value
-    if stock.unit_cost_usd:
-        stock.total_value_usd = stock.current_quantity_kg * stock.unit_cost_usd
-    
-    # Mark as expired if quantity is 0 and expired
-    if stock.current_quantity_kg <= 0:
-        stock.is_active = False
-        if stock.expiry_date and stock.expiry_date < datetime.utcnow():
-            stock.is_expired = True
-    
-    stock.last_movement_date = datetime.utcnow()
+    # Update quantity, value and active/expired flags in one UPDATE, so
+    # concurrent movements on this stock don't overwrite each other
+    new_quantity_kg = apply_stock_delta(db, stock, quantity_change)
     
-    # Create movement record
+    # Create movement record (signed, like the rest of the ledger)
     movement = StockMovement(
         stock_id=stock.stock_id,
         buyer_user_id=current_user.user_id,
         crop_id=movement_data.crop_id,
         movement_type=movement_data.movement_type,
-        quantity_kg=movement_data.quantity_kg,
+        quantity_kg=quantity_change,
         unit_cost_usd=movement_data.unit_cost_usd,
         total_cost_usd=movement_data.unit_cost_usd * movement_data.quantity_kg if movement_data.unit_cost_usd else None,
         order_id=movement_data.order_id,
@@ -327,16 +355,49 @@ async def create_stock_movement(
     
     db.add(movement)
     db.commit()
-    db.refresh(stock)
     
     return {
         "message": "Stock movement recorded",
         "stock_id": stock.stock_id,
-        "new_quantity_kg": stock.current_quantity_kg,
+        "new_quantity_kg": new_quantity_kg,
         "movement_id": movement.movement_id
     }
 
 
+@router.post("/stock/movements/bulk", response_model=StockIngestResponse)
+async def ingest_stock_movements(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$",
+                                  description="Defaults from Content-Type: text/csv is CSV, anything else JSON lines"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_buyer)
+):
+    """
+    Record a feed of stock movements (e.g. a day of POS sales) in one request
+
+    The body is JSON lines or CSV with a header row; each row has crop_id,
+    movement_type, quantity_kg and optionally unit_cost_usd, movement_date
+    and notes. Rows are applied in committed chunks as the body streams in,
+    and invalid rows are reported per row without failing the feed.
+    """
+    from ....services.stock_ingest import IngestLimitExceeded, StockMovementIngest
+
+    buyer = await db.scalar(select(Buyer.buyer_id).where(Buyer.user_id == current_user.user_id))
+    if not buyer:
+        raise HTTPException(status_code=404, detail="Buyer profile not found")
+
+    content_type = request.headers.get("content-type", "")
+    fmt = format or ("csv" if content_type.startswith("text/csv") else "ndjson")
+    ingest = StockMovementIngest(current_user.user_id, fmt)
+    try:
+        async for data in request.stream():
+            await db.run_sync(ingest.feed, data)
+        return await db.run_sync(ingest.finish)
+    except IngestLimitExceeded as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"{e}; the first {ingest.applied} rows were applied")
+
+
 # ============= Reorder Point Calculation =============
 @router.post("/stock/calculate-reorder-point", response_model=ReorderPointCalculation)
 async def calculate_reorder_point(
@@ -356,7 +417,8 @@ async def calculate_reorder_point(
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
     
     # Calculate average daily usage from consumption movements
-    consumption_movements = db.query(func.sum(StockMovement.quantity_kg)).filter(
+    # abs(): consumption is stored negative (older rows from this API are positive)
+    consumption_movements = db.query(func.sum(func.abs(StockMovement.quantity_kg))).filter(
         StockMovement.buyer_user_id == current_user.user_id,
         StockMovement.crop_id == crop_id,
         StockMovement.movement_type == StockMovementType.CONSUMPTION,
@@ -500,29 +562,29 @@ async def get_stock_movements(
     crop_id: Optional[int] = Query(None),
     movement_type: Optional[StockMovementType] = Query(None),
     days: int = Query(30, description="Number of days to look back"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_buyer)
 ):
     """Get stock movement history"""
     
-    query = db.query(StockMovement).filter(
+    query = select(StockMovement).where(
         StockMovement.buyer_user_id == current_user.user_id
     )
     
     if crop_id:
-        query = query.filter(StockMovement.crop_id == crop_id)
+        query = query.where(StockMovement.crop_id == crop_id)
     
     if movement_type:
-        query = query.filter(StockMovement.movement_type == movement_type)
+        query = query.where(StockMovement.movement_type == movement_type)
     
     start_date = datetime.utcnow() - timedelta(days=days)
-    query = query.filter(StockMovement.movement_date >= start_date)
+    query = query.where(StockMovement.movement_date >= start_date)
     
-    movements = query.order_by(desc(StockMovement.movement_date)).limit(100).all()
+    movements = (await db.execute(query.order_by(desc(StockMovement.movement_date)).limit(100))).scalars().all()
     
     result = []
     for movement in movements:
-        crop = db.query(Crop).filter(Crop.crop_id == movement.crop_id).first()
+        crop = await db.get(Crop, movement.crop_id)
         result.append({
             "movement_id": movement.movement_id,
             "crop_id": movement.crop_id,
@@ -542,26 +604,26 @@ async def get_stock_movements(
 # ============= Auto Reorder Suggestions =============
 @router.get("/stock/reorder-suggestions", response_model=List[dict])
 async def get_reorder_suggestions(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_buyer)
 ):
     """Get automated reorder suggestions based on stock levels and ROP"""
     
-    buyer = db.query(Buyer).filter(Buyer.user_id == current_user.user_id).first()
+    buyer = await db.scalar(select(Buyer).where(Buyer.user_id == current_user.user_id))
     if not buyer:
         raise HTTPException(status_code=404, detail="Buyer profile not found")
     
     # Get stocks that are at or below reorder point
-    stocks = db.query(BuyerStock).filter(
+    stocks = (await db.execute(select(BuyerStock).where(
         BuyerStock.buyer_user_id == current_user.user_id,
         BuyerStock.is_active == True,
         BuyerStock.reorder_point_kg.isnot(None),
         BuyerStock.current_quantity_kg <= BuyerStock.reorder_point_kg
-    ).all()
+    ))).scalars().all()
     
     result = []
     for stock in stocks:
-        crop = db.query(Crop).filter(Crop.crop_id == stock.crop_id).first()
+        crop = await db.get(Crop, stock.crop_id)
         if not crop:
             continue
         
@@ -573,10 +635,10 @@ async def get_reorder_suggestions(
             suggested_reorder_kg = max(0, target_stock_kg - stock.current_quantity_kg)
         
         # Get preference for reorder quantity
-        preference = db.query(BuyerInventoryPreference).filter(
+        preference = await db.scalar(select(BuyerInventoryPreference).where(
             BuyerInventoryPreference.buyer_user_id == current_user.user_id,
             BuyerInventoryPreference.crop_id == stock.crop_id
-        ).first()
+        ))
         
         if preference and preference.reorder_quantity_kg:
             suggested_reorder_kg = preference.reorder_quantity_kg
@@ -1,12 +1,13 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, func, select
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 import json
 
-from ....core.database import get_db
+from ....core.database import get_db, get_async_db
 from ....core.auth import get_current_active_user, require_buyer
 from ....models.user import User, UserRole
 from ....models.buyer_inventory import (
@@ -34,6 +35,7 @@ class InventoryPreferenceCreate(BaseModel):
     enable_low_stock_alerts: bool = True
     enable_harvest_alerts: bool = True
     enable_price_alerts: bool = False
+    price_change_threshold_pct: Optional[float] = Field(None, gt=0)
     alert_frequency: str = "daily"
     notification_channels: Optional[dict] = None
     is_favorite: bool = False
@@ -49,6 +51,7 @@ class InventoryPreferenceUpdate(BaseModel):
     enable_low_stock_alerts: Optional[bool] = None
     enable_harvest_alerts: Optional[bool] = None
     enable_price_alerts: Optional[bool] = None
+    price_change_threshold_pct: Optional[float] = Field(None, gt=0)
     alert_frequency: Optional[str] = None
     notification_channels: Optional[dict] = None
     is_favorite: Optional[bool] = None
@@ -68,6 +71,7 @@ class InventoryPreferenceResponse(BaseModel):
     enable_low_stock_alerts: bool
     enable_harvest_alerts: bool
     enable_price_alerts: bool
+    price_change_threshold_pct: Optional[float] = None
     alert_frequency: str
     notification_channels: Optional[dict]
     is_favorite: bool
@@ -165,6 +169,7 @@ async def create_inventory_preference(
             enable_low_stock_alerts=preference_data.enable_low_stock_alerts,
             enable_harvest_alerts=preference_data.enable_harvest_alerts,
             enable_price_alerts=preference_data.enable_price_alerts,
+            price_change_threshold_pct=preference_data.price_change_threshold_pct,
             alert_frequency=preference_data.alert_frequency,
             notification_channels=notification_json,
             is_favorite=preference_data.is_favorite,
@@ -291,12 +296,14 @@ async def get_inventory_alerts(
     severity_filter: Optional[AlertSeverity] = Query(None, description="Filter by severity"),
     crop_id: Optional[int] = Query(None, description="Filter by crop"),
     limit: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_buyer)
 ):
     """Get inventory alerts for the current buyer"""
     
-    query = db.query(InventoryAlert).filter(
+    query = select(InventoryAlert).options(
+        selectinload(InventoryAlert.crop)
+    ).where(
         InventoryAlert.buyer_user_id == current_user.user_id,
         or_(
             InventoryAlert.expires_at == None,
@@ -305,18 +312,18 @@ async def get_inventory_alerts(
     )
     
     if status_filter:
-        query = query.filter(InventoryAlert.status == status_filter)
+        query = query.where(InventoryAlert.status == status_filter)
     
     if severity_filter:
-        query = query.filter(InventoryAlert.severity == severity_filter)
+        query = query.where(InventoryAlert.severity == severity_filter)
     
     if crop_id:
-        query = query.filter(InventoryAlert.crop_id == crop_id)
+        query = query.where(InventoryAlert.crop_id == crop_id)
     
-    alerts = query.order_by(
+    alerts = (await db.execute(query.order_by(
         InventoryAlert.severity.desc(),
         InventoryAlert.created_at.desc()
-    ).limit(limit).all()
+    ).limit(limit))).scalars().all()
     
     result = []
     for alert in alerts:
@@ -399,20 +406,22 @@ async def dismiss_alert(
 @router.get("/stock-levels", response_model=List[StockLevelResponse])
 async def get_stock_levels(
     favorite_only: bool = Query(False, description="Show only favorite crops"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_buyer)
 ):
     """Get current stock levels for crops the buyer is monitoring"""
     
     # Get buyer preferences
-    query = db.query(BuyerInventoryPreference).filter(
+    query = select(BuyerInventoryPreference).options(
+        selectinload(BuyerInventoryPreference.crop)
+    ).where(
         BuyerInventoryPreference.buyer_user_id == current_user.user_id
     )
     
     if favorite_only:
-        query = query.filter(BuyerInventoryPreference.is_favorite == True)
+        query = query.where(BuyerInventoryPreference.is_favorite == True)
     
-    preferences = query.all()
+    preferences = (await db.execute(query)).scalars().all()
     
     if not preferences:
         return []
@@ -425,22 +434,22 @@ async def get_stock_levels(
         crop = pref.crop
         
         # Aggregate stock from all active lots/listings for this crop
-        stock_query = db.query(
+        stock_query = select(
             func.sum(Lot.available_kg).label('total_available'),
             func.sum(Lot.reserved_kg).label('total_reserved'),
             func.sum(Lot.sold_kg).label('total_sold'),
             func.count(Listing.listing_id).label('listings_count')
-        ).join(
+        ).select_from(Lot).join(
             Listing, Listing.lot_id == Lot.lot_id
         ).join(
             ProductionPlan, ProductionPlan.plan_id == Lot.plan_id
-        ).filter(
+        ).where(
             ProductionPlan.crop_id == crop.crop_id,
             Lot.current_status == "available",
             Listing.is_active == True
         )
         
-        stock_data = stock_query.first()
+        stock_data = (await db.execute(stock_query)).first()
         
         total_available = stock_data.total_available or 0.0
         total_reserved = stock_data.total_reserved or 0.0
@@ -458,11 +467,11 @@ async def get_stock_levels(
             alert_level = "ok"
         
         # Get next harvest date
-        next_harvest = db.query(ProductionPlan).filter(
+        next_harvest = await db.scalar(select(ProductionPlan).where(
             ProductionPlan.crop_id == crop.crop_id,
             ProductionPlan.status.in_(["growing", "harvest_ready", "harvesting"]),
             ProductionPlan.expected_harvest_window_start != None
-        ).order_by(ProductionPlan.expected_harvest_window_start.asc()).first()
+        ).order_by(ProductionPlan.expected_harvest_window_start.asc()).limit(1))
         
         next_harvest_date = None
         days_until_harvest = None
@@ -492,7 +501,7 @@ async def get_stock_levels(
 class StockHistoryResponse(BaseModel):
     history_id: int
     crop_id: int
-    crop_name: Optional[str]
+    crop_name: Optional[str] = None
     total_available_kg: float
     total_reserved_kg: float
     total_sold_kg: float
@@ -501,7 +510,9 @@ class StockHistoryResponse(BaseModel):
     min_price_per_kg: Optional[float]
     max_price_per_kg: Optional[float]
     active_listings_count: int
-    recorded_at: datetime
+    recorded_at: datetime  # snapshot time, or bucket start for rollups
+    resolution: str = "raw"  # raw snapshot, or an hour/day/week rollup
+    sample_count: int = 1  # snapshots averaged into this point
 
     class Config:
         from_attributes = True
@@ -511,26 +522,72 @@ class StockHistoryResponse(BaseModel):
 async def get_stock_history(
     crop_id: int,
     days: int = Query(30, ge=1, le=365, description="Number of days of history"),
-    db: Session = Depends(get_db),
+    resolution: Optional[str] = Query(None, pattern="^(raw|hour|day|week)$",
+                                      description="Override the automatic resolution"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_buyer)
 ):
-    """Get historical stock levels for a crop"""
-    from datetime import timedelta
+    """Get historical stock levels for a crop
     
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
+    Short windows return raw snapshots; longer ones read the coarsest
+    rollup that still gives a detailed chart (services/stock_history.py).
+    """
+    from ....models.stock_history import StockHistory, StockHistoryRollup
+    from ....services.stock_history import PERIODS, RAW, bucket_start, history_resolution
     
-    from ....models.stock_history import StockHistory
+    cutoff_date = datetime.utcnow() - timedelta(days=days)
+    resolution = resolution or history_resolution(days)
     
-    history_records = db.query(StockHistory).filter(
-        StockHistory.crop_id == crop_id,
-        StockHistory.recorded_at >= cutoff_date
-    ).order_by(StockHistory.recorded_at.asc()).all()
+    # Every record belongs to the same crop
+    crop = await db.get(Crop, crop_id)
+    crop_name = crop.name if crop else None
     
-    result = []
-    for record in history_records:
+    def raw_response(record):
         response = StockHistoryResponse.model_validate(record)
-        response.crop_name = record.crop.name if record.crop else None
-        result.append(response)
+        response.crop_name = crop_name
+        return response
+    
+    if resolution == RAW:
+        history_records = (await db.execute(select(StockHistory).where(
+            StockHistory.crop_id == crop_id,
+            StockHistory.recorded_at >= cutoff_date
+        ).order_by(StockHistory.recorded_at.asc()))).scalars().all()
+        return [raw_response(record) for record in history_records]
+    
+    rollups = (await db.execute(select(StockHistoryRollup).where(
+        StockHistoryRollup.crop_id == crop_id,
+        StockHistoryRollup.resolution == resolution,
+        StockHistoryRollup.bucket_start >= bucket_start(cutoff_date, resolution)
+    ).order_by(StockHistoryRollup.bucket_start.asc()))).scalars().all()
+    
+    result = [
+        StockHistoryResponse(
+            history_id=rollup.rollup_id,
+            crop_id=rollup.crop_id,
+            crop_name=crop_name,
+            total_available_kg=rollup.total_available_kg,
+            total_reserved_kg=rollup.total_reserved_kg or 0.0,
+            total_sold_kg=rollup.total_sold_kg or 0.0,
+            remaining_kg=rollup.remaining_kg,
+            avg_price_per_kg=rollup.avg_price_per_kg,
+            min_price_per_kg=rollup.min_price_per_kg,
+            max_price_per_kg=rollup.max_price_per_kg,
+            active_listings_count=round(rollup.active_listings_count or 0),
+            recorded_at=rollup.bucket_start,
+            resolution=resolution,
+            sample_count=rollup.sample_count,
+        )
+        for rollup in rollups
+    ]
+    
+    # The current bucket isn't rolled up yet; end the chart on the latest snapshot
+    since = result[-1].recorded_at + PERIODS[resolution] if result else cutoff_date
+    latest = (await db.execute(select(StockHistory).where(
+        StockHistory.crop_id == crop_id,
+        StockHistory.recorded_at >= since
+    ).order_by(StockHistory.recorded_at.desc()).limit(1))).scalars().first()
+    if latest:
+        result.append(raw_response(latest))
     
     return result
 
@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, Query
 from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 import json
 import os
 
-from ....core.database import get_db
-from ....core.auth import get_current_active_user
+from ....core.database import get_db, get_async_db
+from ....core.auth import get_current_active_user, get_optional_user_id
 from ....models.user import User
-from ....models.order import Order, OrderStatus
+from ....models.order import Order, OrderItem, OrderStatus
 from ....models.crop import Crop
+from ....models.pricing import Listing
+from ....models.production import Lot, ProductionPlan
 from ....models.buyer import Buyer
 
 router = APIRouter()
@@ -81,33 +85,46 @@ async def preview_order(order: OrderIn):
 
 
 @router.post("/")
-async def submit_order(order: OrderIn):
-    preview = await preview_order(order)
-    record = {
-        "order_number": f"M-{str(abs(hash(json.dumps(order.model_dump(), sort_keys=True))))[:6]}",
-        "order": order.model_dump(),
-        "totals": preview,
-    }
-    try:
-        existing = []
-        if os.path.exists(ORDERS_FILE):
-            with open(ORDERS_FILE, 'r', encoding='utf-8') as f:
-                existing = json.load(f)
-        existing.append(record)
-        with open(ORDERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(existing, f, indent=2)
-    except Exception:
-        # If file write fails, still return the record
-        pass
-    return record
+async def submit_order(
+    order: OrderIn,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    caller_id: Optional[int] = Depends(get_optional_user_id),
+    db: Session = Depends(get_db)
+):
+    """Submit an order; a retry with the same Idempotency-Key gets the first response back"""
+    from ....services.idempotency import idempotency
+
+    owner = f"user:{caller_id}" if caller_id is not None else None
+    with idempotency(db, "orders.submit", idempotency_key, order, owner) as request:
+        if request.replay is not None:
+            return request.replay
+        preview = await preview_order(order)
+        record = {
+            "order_number": f"M-{str(abs(hash(json.dumps(order.model_dump(), sort_keys=True))))[:6]}",
+            "order": order.model_dump(),
+            "totals": preview,
+        }
+        try:
+            existing = []
+            if os.path.exists(ORDERS_FILE):
+                with open(ORDERS_FILE, 'r', encoding='utf-8') as f:
+                    existing = json.load(f)
+            existing.append(record)
+            with open(ORDERS_FILE, 'w', encoding='utf-8') as f:
+                json.dump(existing, f, indent=2)
+        except Exception:
+            # If file write fails, still return the record
+            pass
+        request.complete(record)
+        return record
 
 
 # Admin endpoint to list all orders
 class OrderResponse(BaseModel):
     order_id: int
-    buyer_user_id: int
+    buyer_user_id: Optional[int] = None
     buyer_name: Optional[str] = None
-    crop_id: int
+    crop_id: Optional[int] = None
     crop_name: Optional[str] = None
     quantity_kg: float
     unit_price_usd: float
@@ -122,49 +139,53 @@ class OrderResponse(BaseModel):
 
 @router.get("/", response_model=List[OrderResponse])
 async def list_orders(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
     status: Optional[str] = Query(None),
     limit: int = Query(100, ge=1, le=1000)
 ):
     """List all orders (admin/ops only or user's own orders)"""
-    query = db.query(Order)
+    query = select(Order)
     
     # If not admin/ops, only show user's own orders
     # Join through Buyer table to get user_id
     if current_user.role.value not in ['ADMIN', 'OPS']:
-        buyer = db.query(Buyer).filter(Buyer.user_id == current_user.user_id).first()
+        buyer = await db.scalar(select(Buyer).where(Buyer.user_id == current_user.user_id))
         if buyer:
-            query = query.filter(Order.buyer_id == buyer.buyer_id)
+            query = query.where(Order.buyer_id == buyer.buyer_id)
         else:
             # Buyer profile doesn't exist, return empty list
             return []
     
     if status:
-        query = query.filter(Order.status == status)
+        query = query.where(Order.status == status)
     
-    orders = query.order_by(Order.created_at.desc()).limit(limit).all()
+    orders = (await db.execute(query.order_by(Order.created_at.desc()).limit(limit))).scalars().all()
     result = []
     
     for order in orders:
         # Get buyer info through Buyer table
-        buyer_record = db.query(Buyer).filter(Buyer.buyer_id == order.buyer_id).first()
+        buyer_record = await db.get(Buyer, order.buyer_id)
         buyer_user = None
         if buyer_record:
-            buyer_user = db.query(User).filter(User.user_id == buyer_record.user_id).first()
+            buyer_user = await db.get(User, buyer_record.user_id)
         
-        # Get crop names from order items
-        from ....models.order import OrderItem
-        order_items = db.query(OrderItem).filter(OrderItem.order_id == order.order_id).all()
-        crop_names = []
-        for item in order_items:
-            crop = db.query(Crop).filter(Crop.crop_id == item.crop_id).first()
-            if crop:
-                crop_names.append(crop.name)
+        # Get order items with their crop (listing -> lot -> production plan -> crop)
+        item_rows = (await db.execute(
+            select(OrderItem, Crop)
+            .outerjoin(Listing, Listing.listing_id == OrderItem.listing_id)
+            .outerjoin(Lot, Lot.lot_id == Listing.lot_id)
+            .outerjoin(ProductionPlan, ProductionPlan.plan_id == Lot.plan_id)
+            .outerjoin(Crop, Crop.crop_id == ProductionPlan.crop_id)
+            .where(OrderItem.order_id == order.order_id)
+            .order_by(OrderItem.order_item_id)
+        )).all()
+        order_items = [item for item, _ in item_rows]
+        crops = [crop for _, crop in item_rows if crop]
         
         # Use first crop for backward compatibility (or create a summary)
-        crop_name = crop_names[0] if crop_names else None
-        crop_id = order_items[0].crop_id if order_items else None
+        crop_name = crops[0].name if crops else None
+        crop_id = crops[0].crop_id if crops else None
         
         result.append(OrderResponse(
             order_id=order.order_id,
@@ -173,7 +194,7 @@ async def list_orders(
             crop_id=crop_id,
             crop_name=crop_name,
             quantity_kg=float(sum(item.qty_kg for item in order_items)) if order_items else 0.0,
-            unit_price_usd=float(order_items[0].unit_price_usd) if order_items else 0.0,
+            unit_price_usd=float(order_items[0].unit_price) if order_items else 0.0,
             total_amount_usd=float(order.total),
             status=order.status.value,
             delivery_date=order.actual_delivery_date,
@@ -220,3 +241,53 @@ async def update_order_status(
     except ValueError:
         from fastapi import HTTPException
         raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
+
+
+class MarkDeliveredIn(BaseModel):
+    order_ids: List[int] = Field(min_length=1, max_length=1000)
+    delivered_at: Optional[datetime] = None
+
+
+class MarkDeliveredResponse(BaseModel):
+    delivered: List[int]
+    already_delivered: List[int]
+    not_found: List[int]
+    movements_created: int
+
+
+@router.post("/mark-delivered", response_model=MarkDeliveredResponse)
+def mark_orders_delivered(
+    payload: MarkDeliveredIn,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Mark many orders delivered and sync buyer stock in one transaction (admin/ops only)"""
+    if current_user.role.value not in ['ADMIN', 'OPS']:
+        from fastapi import HTTPException
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    from ....services.stock_sync import sync_stock_from_orders
+
+    order_ids = list(dict.fromkeys(payload.order_ids))
+    orders = {
+        order.order_id: order
+        for order in db.scalars(select(Order).where(Order.order_id.in_(order_ids)))
+    }
+    to_deliver = [orders[order_id] for order_id in order_ids
+                  if order_id in orders and orders[order_id].status != OrderStatus.DELIVERED]
+    delivered_ids = {order.order_id for order in to_deliver}
+    delivered_at = payload.delivered_at or datetime.utcnow()
+    for order in to_deliver:
+        order.status = OrderStatus.DELIVERED
+        order.actual_delivery_date = delivered_at
+
+    # Unlike the single-order update, a stock sync failure fails the whole batch
+    movements = sync_stock_from_orders(db, to_deliver, commit=False)
+    db.commit()
+    return MarkDeliveredResponse(
+        delivered=[order.order_id for order in to_deliver],
+        already_delivered=[order_id for order_id in order_ids
+                           if order_id in orders and order_id not in delivered_ids],
+        not_found=[order_id for order_id in order_ids if order_id not in orders],
+        movements_created=movements,
+    )
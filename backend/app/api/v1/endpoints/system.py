@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ....core.auth import require_staff
+from ....core.config import settings
+from ....core.database import get_async_db, get_pool_status
+from ....models.job_run import JobRun, JobRunStatus
+from ....models.user import User
+
+router = APIRouter()
+
+
+# ============= Database Pool =============
+class PoolStatus(BaseModel):
+    pool_class: str
+    size: Optional[int] = None
+    checked_in: Optional[int] = None
+    checked_out: Optional[int] = None
+    overflow: Optional[int] = None
+    max_overflow: Optional[int] = None
+    timeout_seconds: Optional[float] = None
+    checkouts: int
+    timeouts: int
+    avg_wait_ms: float
+    max_wait_ms: float
+    last_wait_ms: float
+
+
+class DatabasePoolResponse(BaseModel):
+    sync_engine: PoolStatus
+    async_engine: PoolStatus
+    statement_timeout_ms: int
+
+
+@router.get("/db-pool", response_model=DatabasePoolResponse)
+async def get_database_pool_status(
+    current_user: User = Depends(require_staff)
+):
+    """Report connection pool usage and checkout wait times (staff only)"""
+    status = get_pool_status()
+    return DatabasePoolResponse(
+        sync_engine=PoolStatus(**status["sync"]),
+        async_engine=PoolStatus(**status["async"]),
+        statement_timeout_ms=settings.DB_STATEMENT_TIMEOUT_MS,
+    )
+
+
+# ============= Scheduled Jobs =============
+class JobRunResponse(BaseModel):
+    run_id: int
+    job_id: str
+    status: JobRunStatus
+    worker: Optional[str] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    duration_ms: Optional[float] = None
+    rows_scanned: Optional[int] = None
+    rows_written: Optional[int] = None
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class JobSummary(BaseModel):
+    job_id: str
+    runs: int = 0
+    errors: int = 0
+    skipped: int = 0
+    avg_duration_ms: Optional[float] = None
+    max_duration_ms: Optional[float] = None
+    rows_written: int = 0
+    last_success_at: Optional[datetime] = None
+    last_run: Optional[JobRunResponse] = None
+
+
+@router.get("/jobs", response_model=List[JobSummary])
+async def get_job_summaries(
+    hours: int = Query(24, ge=1, le=24 * 30, description="Window for the run statistics"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_staff)
+):
+    """Run counts, durations and the latest run of each background job (staff only)"""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    executed = JobRun.status != JobRunStatus.SKIPPED
+    stats = await db.execute(select(
+        JobRun.job_id,
+        func.count(case((executed, 1))),
+        func.count(case((JobRun.status == JobRunStatus.ERROR, 1))),
+        func.count(case((JobRun.status == JobRunStatus.SKIPPED, 1))),
+        func.avg(case((executed, JobRun.duration_ms))),
+        func.max(JobRun.duration_ms),
+        func.coalesce(func.sum(JobRun.rows_written), 0),
+    ).where(JobRun.started_at >= since).group_by(JobRun.job_id))
+    summaries = {}
+    for job_id, runs, errors, skipped, avg_ms, max_ms, rows in stats:
+        summaries[job_id] = JobSummary(job_id=job_id, runs=runs, errors=errors, skipped=skipped,
+                                       avg_duration_ms=avg_ms, max_duration_ms=max_ms, rows_written=rows)
+
+    # Latest run and latest success of every job, however old
+    last_runs = (await db.execute(select(JobRun).where(JobRun.run_id.in_(
+        select(func.max(JobRun.run_id)).group_by(JobRun.job_id)
+    )))).scalars().all()
+    for run in last_runs:
+        summary = summaries.setdefault(run.job_id, JobSummary(job_id=run.job_id))
+        summary.last_run = JobRunResponse.model_validate(run)
+    last_successes = await db.execute(select(JobRun.job_id, func.max(JobRun.finished_at)).where(
+        JobRun.status == JobRunStatus.SUCCESS).group_by(JobRun.job_id))
+    for job_id, finished_at in last_successes:
+        if job_id in summaries:
+            summaries[job_id].last_success_at = finished_at
+
+    return [summaries[job_id] for job_id in sorted(summaries)]
+
+
+@router.get("/job-runs", response_model=List[JobRunResponse])
+async def get_job_runs(
+    job_id: Optional[str] = Query(None),
+    status: Optional[JobRunStatus] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_staff)
+):
+    """Most recent background job runs, newest first (staff only)"""
+    query = select(JobRun)
+    if job_id:
+        query = query.where(JobRun.job_id == job_id)
+    if status:
+        query = query.where(JobRun.status == status)
+    runs = (await db.execute(query.order_by(JobRun.run_id.desc()).limit(limit))).scalars().all()
+    return [JobRunResponse.model_validate(run) for run in runs]
@@ -1,21 +1,69 @@
+import logging
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Union
+import anyio
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import event, select
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from .cache import TTLCache
 from .config import settings
 from .database import get_db
 from ..models.user import User, UserRole, UserStatus
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Password hashing; hashes with a different cost report needs_update()
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# Limits bcrypt calls per worker, created on first use (needs a running loop)
+_hash_limiter: Optional[anyio.CapacityLimiter] = None
 
 # JWT token scheme - make it optional for some endpoints
 security = HTTPBearer(auto_error=False)
 
+# token -> user_id for tokens that already passed signature/expiry checks
+_token_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+# user_id -> detached User, merged into each request's session without a query
+_principal_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+
+
+def invalidate_user_cache(user_id: int):
+    """Forget the cached principal and tokens of a user (status, role or password changed)"""
+    _principal_cache.pop(user_id)
+    _token_cache.pop_where(lambda token, cached_user_id: cached_user_id == user_id)
+
+
+def clear_auth_caches():
+    """Drop every cached token and principal"""
+    _token_cache.clear()
+    _principal_cache.clear()
+
+
+# Any committed change to a users row (suspend/activate, KYC review, password
+# or profile updates) evicts that user, so endpoints need no explicit calls.
+# Registered on the Session class, so AsyncSession's sync sessions are covered.
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = [obj.user_id for obj in (*session.dirty, *session.deleted) if isinstance(obj, User)]
+    if changed:
+        session.info.setdefault("auth_changed_users", set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop("auth_changed_users", ()):
+        invalidate_user_cache(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_changed_users(session, previous_transaction):
+    session.info.pop("auth_changed_users", None)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against its hash"""
@@ -27,6 +75,32 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def _run_hash_work(func, *args):
+    """Run a bcrypt call in a worker thread, at most PASSWORD_HASH_THREADS at a time.
+
+    bcrypt holds the CPU for ~100-300 ms per call; run inline it stalls every
+    other request on the event loop for that long. Sync sessions check
+    connections out on the event loop thread, so callers should not hold one
+    across the wait: if every waiting request pinned a connection, the next
+    checkout would block the loop until pool_timeout while the holders can't
+    resume to release theirs. Endpoints hash before their own DB work.
+    """
+    global _hash_limiter
+    if _hash_limiter is None:
+        _hash_limiter = anyio.CapacityLimiter(settings.PASSWORD_HASH_THREADS)
+    return await anyio.to_thread.run_sync(func, *args, limiter=_hash_limiter)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password() off the event loop"""
+    return await _run_hash_work(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash() off the event loop"""
+    return await _run_hash_work(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -48,45 +122,103 @@ def verify_token(token: str) -> Optional[dict]:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         return payload
     except JWTError as e:
-        print(f"DEBUG: JWTError in verify_token: {type(e).__name__} - {str(e)}")
+        logger.debug(f"Token rejected: {type(e).__name__} - {e}")
         return None
     except Exception as e:
-        print(f"DEBUG: Unexpected error in verify_token: {type(e).__name__} - {str(e)}")
+        logger.warning(f"Unexpected error verifying token: {type(e).__name__} - {e}")
         return None
 
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-    """Authenticate user with username/email and password"""
-    import logging
-    logger = logging.getLogger(__name__)
-    
+async def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+    """Authenticate user with username/email and password.
+
+    The lookup runs on its own short session so no connection is held while
+    bcrypt runs; the user is then loaded into db. A hash made with another
+    cost factor is replaced with one at BCRYPT_ROUNDS; the caller's commit
+    saves it.
+    """
     # Try to find user by phone or email
-    user = db.query(User).filter(
-        (User.phone == username) | (User.email == username)
-    ).first()
+    with Session(db.get_bind()) as lookup:
+        found = lookup.execute(
+            select(User.user_id, User.phone, User.hashed_password)
+            .where((User.phone == username) | (User.email == username))
+        ).first()
     
-    if not user:
+    if not found:
         logger.warning(f"Authentication failed: User not found for username: {username}")
         return None
     
-    # Verify password
+    # Verify password (and rehash if the cost changed) in one thread hop
     try:
-        password_valid = verify_password(password, user.hashed_password)
+        password_valid, new_hash = await _run_hash_work(
+            pwd_context.verify_and_update, password, found.hashed_password
+        )
         if not password_valid:
-            logger.warning(f"Authentication failed: Invalid password for user {user.user_id} ({user.phone})")
+            logger.warning(f"Authentication failed: Invalid password for user {found.user_id} ({found.phone})")
             return None
     except Exception as e:
-        logger.error(f"Password verification error for user {user.user_id}: {e}")
+        logger.error(f"Password verification error for user {found.user_id}: {e}")
+        return None
+    
+    user = db.get(User, found.user_id)
+    if user is None:
         return None
     
     if user.status != UserStatus.ACTIVE:
         logger.warning(f"Authentication failed: User {user.user_id} is not ACTIVE (status: {user.status})")
         return None
     
+    if new_hash:
+        user.hashed_password = new_hash
+        logger.info(f"Rehashed password for user {user.user_id} at cost {settings.BCRYPT_ROUNDS}")
+    
     logger.info(f"Authentication successful for user {user.user_id} ({user.phone})")
     return user
 
 
+def _user_id_from_token(token: str) -> Optional[int]:
+    """Validate a JWT and return its subject, reusing earlier verifications"""
+    user_id = _token_cache.get(token)
+    if user_id is not None:
+        return user_id
+    
+    payload = verify_token(token)
+    if payload is None:
+        return None
+    
+    # JWT 'sub' claim is a string, convert to int
+    sub_claim = payload.get("sub")
+    try:
+        user_id = int(sub_claim)
+    except (ValueError, TypeError):
+        logger.debug(f"Invalid 'sub' claim in token: {sub_claim!r}")
+        return None
+    
+    # jwt.decode already validated expiry; never cache past it
+    exp = payload.get("exp")
+    ttl = exp - time.time() if isinstance(exp, (int, float)) else None
+    _token_cache.set(token, user_id, ttl=ttl)
+    return user_id
+
+
+def _load_principal(db: Session, user_id: int) -> Optional[User]:
+    """Return the user attached to db, from the principal cache when possible"""
+    cached = _principal_cache.get(user_id)
+    if cached is not None:
+        # load=False copies the cached row into this session without a SELECT;
+        # the copy behaves like a queried instance for updates and lazy loads
+        return db.merge(cached, load=False)
+    
+    user = db.query(User).filter(User.user_id == user_id).first()
+    if user is None or not _principal_cache.enabled:
+        return user
+    # Keep the freshly loaded (clean) instance as the cache entry and hand the
+    # request its own copy, so request-side changes never leak into the cache
+    db.expunge(user)
+    _principal_cache.set(user_id, user)
+    return db.merge(user, load=False)
+
+
 async def get_current_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db)
@@ -99,48 +231,21 @@ async def get_current_user(
     )
     
     if credentials is None:
-        print("DEBUG: No credentials provided in Authorization header")
+        logger.debug("No credentials provided in Authorization header")
         raise credentials_exception
     
-    try:
-        print(f"DEBUG: Verifying token: {credentials.credentials[:20]}...")
-        print(f"DEBUG: Token length: {len(credentials.credentials)}")
-        print(f"DEBUG: Using SECRET_KEY length: {len(settings.SECRET_KEY)}, ALGORITHM: {settings.ALGORITHM}")
-        
-        payload = verify_token(credentials.credentials)
-        if payload is None:
-            print("DEBUG: Token verification returned None")
-            raise credentials_exception
-        
-        # JWT 'sub' claim is a string, convert to int
-        sub_claim = payload.get("sub")
-        if sub_claim is None:
-            print("DEBUG: No 'sub' claim in token payload")
-            raise credentials_exception
-        
-        try:
-            user_id: int = int(sub_claim)
-        except (ValueError, TypeError):
-            print(f"DEBUG: Invalid 'sub' claim format: {sub_claim}")
-            raise credentials_exception
-        
-        print(f"DEBUG: Token valid, user_id={user_id}, exp={payload.get('exp')}")
-        
-        # jwt.decode already validates expiration automatically, so no need to check again
-            
-    except JWTError as e:
-        print(f"DEBUG: JWTError during token verification: {e}")
+    user_id = _user_id_from_token(credentials.credentials)
+    if user_id is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = _load_principal(db, user_id)
     if user is None:
-        print(f"DEBUG: User {user_id} not found in database")
+        logger.info(f"Token for unknown user {user_id}")
         raise credentials_exception
     
-    print(f"DEBUG: User found: {user.name}, status={user.status}")
     # Check if user is still active
     if user.status != UserStatus.ACTIVE:
-        print(f"DEBUG: User {user_id} is not ACTIVE (status={user.status})")
+        logger.info(f"Rejected token for user {user_id}: status is {user.status}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User account is not active"
@@ -159,6 +264,15 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
     return current_user
 
 
+async def get_optional_user_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+) -> Optional[int]:
+    """User id of a valid bearer token, or None for anonymous requests (no DB lookup)"""
+    if credentials is None:
+        return None
+    return _user_id_from_token(credentials.credentials)
+
+
 # Role-based access control
 class RequireRole:
     def __init__(self, *allowed_roles: UserRole):
@@ -9,15 +9,41 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./munda_market.db"
     DATABASE_TEST_URL: Optional[str] = None
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 300
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # Postgres only, 0 disables
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MB
+    DB_N_PLUS_ONE_THRESHOLD: int = 10  # warn when one statement repeats more often per request, 0 disables
     
     # Security
     SECRET_KEY: str = "your-secret-key-here-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # bcrypt cost (2^rounds iterations); existing hashes are upgraded on login
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_THREADS: int = 4  # concurrent hash/verify calls per worker
+    # Per-process cache of verified tokens and authenticated users; status and
+    # password changes made through another worker apply after at most this long
+    AUTH_CACHE_TTL_SECONDS: int = 60  # 0 disables
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
     
     # WhatsApp Business API
     WHATSAPP_API_URL: Optional[str] = None
     WHATSAPP_ACCESS_TOKEN: Optional[str] = None
+    WHATSAPP_RATE_PER_SECOND: float = 20.0  # 0 disables pacing
+    WHATSAPP_RATE_BURST: int = 20
+    
+    # SMS: "twilio", or "http" for a JSON gateway at SMS_GATEWAY_URL
+    # (scripts/sms_gateway_stub.py locally)
+    SMS_PROVIDER: str = "twilio"
+    SMS_GATEWAY_URL: Optional[str] = None
+    SMS_GATEWAY_TOKEN: Optional[str] = None
+    SMS_RATE_PER_SECOND: float = 1.0  # provider send limit per process; 0 disables pacing
+    SMS_RATE_BURST: int = 5
+    NOTIFICATION_HTTP_TIMEOUT_SECONDS: int = 10
     
     # SMS (Twilio)
     TWILIO_ACCOUNT_SID: Optional[str] = None
@@ -30,6 +56,12 @@ class Settings(BaseSettings):
     SMTP_USER: Optional[str] = None
     SMTP_PASSWORD: Optional[str] = None
     SMTP_FROM: str = "noreply@mundamarket.co.zw"
+    SMTP_STARTTLS: bool = True
+    SMTP_TIMEOUT_SECONDS: int = 30
+    # Connections are pooled (up to NOTIFICATION_EMAIL_CONCURRENCY per process)
+    # and reused for this many messages, or until idle this long
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100
+    SMTP_IDLE_TIMEOUT_SECONDS: int = 60
     
     # Payment Gateways
     STRIPE_PUBLISHABLE_KEY: Optional[str] = None
@@ -50,14 +82,93 @@ class Settings(BaseSettings):
     
     # Application
     DEBUG: bool = True
+    # "full": create tables and ensure the admin user on every boot (local dev)
+    # "fast": skip schema work at startup; run `python -m app.migrate` on deploy
+    BOOT_MODE: str = "full"
+    RUN_SCHEDULER: bool = True  # set false on web workers when a separate worker runs jobs
+    # Every process that runs a scheduler competes for one lock; only the holder
+    # runs jobs, and a follower takes over within a poll interval if it dies
+    SCHEDULER_LEADER_ELECTION: bool = True
+    SCHEDULER_LEADER_POLL_SECONDS: int = 10
+    SCHEDULER_LOCK_KEY: int = 72_310_017  # Postgres advisory lock id
+    SCHEDULER_LOCK_FILE: Optional[str] = None  # non-Postgres: defaults to a per-database file in the temp dir
+    SCHEDULER_MISFIRE_GRACE_SECONDS: int = 60  # a run starting later than this is skipped as missed
+    JOB_RUN_RETENTION_DAYS: int = 14  # job_runs history shown in the admin console
     LOG_LEVEL: str = "info"
+    METRICS_TOKEN: Optional[str] = None  # when set, /metrics requires "Authorization: Bearer <token>"
     ALLOWED_HOSTS: List[str] = Field(default_factory=lambda: ["localhost", "127.0.0.1"])
     
+    # Inventory alerts: crops touched by lot/listing/plan changes are re-evaluated
+    # every few seconds; the full scan of all preferences runs nightly
+    ALERT_DIRTY_CROP_INTERVAL_SECONDS: int = 30
+    ALERT_DIRTY_CROP_BATCH_SIZE: int = 50
+    ALERT_RECONCILE_HOUR: int = 2  # server local time
+    # Split the nightly scan into buyer ranges evaluated in worker processes (1: one pass in the scheduler thread)
+    ALERT_PARTITIONS: int = 1
+    ALERT_PARTITION_WORKERS: int = 0  # 0: one per CPU, at most ALERT_PARTITIONS
+    STOCK_HISTORY_INTERVAL_MINUTES: int = 360  # stock/price snapshot cadence behind the history charts
+    PRICE_ALERT_THRESHOLD_PCT: float = 10.0  # price move that raises an alert, unless a preference sets its own
+    # Price alerts compare with the newest snapshot at least this old (and under twice this old)
+    PRICE_ALERT_LOOKBACK_HOURS: int = 24
+    # Raw snapshots roll up into hourly, daily and weekly averages; each tier is
+    # deleted after this long, once the next tier covers it (weekly is kept)
+    STOCK_HISTORY_RAW_RETENTION_DAYS: int = 14
+    STOCK_HISTORY_HOURLY_RETENTION_DAYS: int = 90
+    STOCK_HISTORY_DAILY_RETENTION_DAYS: int = 730
+    # Bulk POS/ERP movement feeds: rows applied and committed per chunk, and the cap per request
+    STOCK_INGEST_CHUNK_SIZE: int = 5000
+    STOCK_INGEST_MAX_ROWS: int = 500_000
+    # Nightly check of stock balances against the movement ledger; drifted balances are rebuilt unless disabled
+    STOCK_RECONCILE_HOUR: int = 3  # server local time
+    STOCK_RECONCILE_FIX: bool = True
+    STOCK_LEDGER_TOLERANCE_KG: float = 0.001
+    # Idempotency-Key header on order submission and stock movements: stored responses
+    # are replayed for this long; an unfinished claim is taken over after the lock timeout
+    IDEMPOTENCY_TTL_HOURS: int = 24
+    IDEMPOTENCY_LOCK_TIMEOUT_SECONDS: int = 60
+    
+    # Notification outbox: alert jobs queue email/SMS rows and the dispatcher
+    # job delivers them with retries, off the alert transactions
+    NOTIFICATION_TRANSPORT: str = "live"  # "stub" logs messages instead of calling SMTP/Twilio
+    NOTIFICATION_DISPATCH_INTERVAL_SECONDS: int = 10
+    NOTIFICATION_BATCH_SIZE: int = 100
+    NOTIFICATION_EMAIL_CONCURRENCY: int = 4  # parallel sends per channel per process
+    NOTIFICATION_SMS_CONCURRENCY: int = 2
+    NOTIFICATION_WHATSAPP_CONCURRENCY: int = 2
+    NOTIFICATION_MAX_ATTEMPTS: int = 6  # then the row is dead-lettered
+    NOTIFICATION_RETRY_BASE_SECONDS: int = 30  # doubles after every failed attempt
+    NOTIFICATION_RETRY_MAX_SECONDS: int = 3600
+    NOTIFICATION_CLAIM_TIMEOUT_SECONDS: int = 300  # reclaim rows a crashed dispatcher left in "sending"
+    
     # API Settings
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Munda Market"
     PROJECT_VERSION: str = "1.0.0"
     
+    @field_validator("BOOT_MODE")
+    @classmethod
+    def validate_boot_mode(cls, v):
+        v = v.strip().lower()
+        if v not in ("full", "fast"):
+            raise ValueError("BOOT_MODE must be 'full' or 'fast'")
+        return v
+
+    @field_validator("NOTIFICATION_TRANSPORT")
+    @classmethod
+    def validate_notification_transport(cls, v):
+        v = v.strip().lower()
+        if v not in ("live", "stub"):
+            raise ValueError("NOTIFICATION_TRANSPORT must be 'live' or 'stub'")
+        return v
+
+    @field_validator("SMS_PROVIDER")
+    @classmethod
+    def validate_sms_provider(cls, v):
+        v = v.strip().lower()
+        if v not in ("twilio", "http"):
+            raise ValueError("SMS_PROVIDER must be 'twilio' or 'http'")
+        return v
+
     @field_validator("ALLOWED_HOSTS", mode="before")
     @classmethod
     def parse_hosts(cls, v):
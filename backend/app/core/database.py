@@ -1,19 +1,179 @@
-from sqlalchemy import create_engine
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from .config import settings
 
+
+def get_async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto the matching asyncio driver"""
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgres://"):
+        # Render/Heroku style URLs use the legacy "postgres" scheme
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+
+# ============= Pool Statistics =============
+class PoolStats:
+    """Checkout wait times for one connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += waited
+            self.last_wait = waited
+            if waited > self.max_wait:
+                self.max_wait = waited
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": (self.total_wait / self.checkouts * 1000) if self.checkouts else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+                "last_wait_ms": self.last_wait * 1000,
+            }
+
+
+sync_pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+
+class _TimedPoolMixin:
+    """Time how long each checkout waits for a free connection"""
+
+    stats: PoolStats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    stats = sync_pool_stats
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    stats = async_pool_stats
+
+
+# ============= Engine Configuration =============
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return _is_sqlite(url) and (":memory:" in url or url.rstrip("/").endswith("sqlite:"))
+
+
+def _engine_options(url: str, is_async: bool) -> dict:
+    """Pool and connect arguments for the sync or async engine"""
+    options = {
+        "pool_pre_ping": True,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "echo": settings.DEBUG,
+    }
+    if _is_memory_sqlite(url):
+        # In-memory SQLite is per-connection; keep SQLAlchemy's default pool
+        return options
+
+    options.update(
+        poolclass=TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+
+    if _is_sqlite(url):
+        if not is_async:
+            # Pooled connections are handed between threadpool workers
+            options["connect_args"] = {"check_same_thread": False}
+    elif settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside a writer; busy_timeout waits on locks instead of failing"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+
+def create_sync_engine(url: str, poolclass=None):
+    """A sync engine with the app's pool settings and SQLite pragmas (also used by worker processes)
+
+    poolclass replaces the sized request pool, e.g. NullPool for a
+    long-lived connection that shouldn't take a slot from requests.
+    """
+    options = _engine_options(url, is_async=False)
+    if poolclass is not None:
+        for option in ("pool_size", "max_overflow", "pool_timeout"):
+            options.pop(option, None)
+        options["poolclass"] = poolclass
+    sync_engine = create_engine(url, **options)
+    if _is_sqlite(url) and not _is_memory_sqlite(url):
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+    return sync_engine
+
+
 # Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    echo=settings.DEBUG
-)
+engine = create_sync_engine(settings.DATABASE_URL)
+
+# Async engine for `async def` endpoints - queries are awaited instead of
+# blocking the event loop
+_async_url = get_async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(_async_url, **_engine_options(_async_url, is_async=True))
+
+if _is_sqlite(settings.DATABASE_URL) and not _is_memory_sqlite(settings.DATABASE_URL):
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async session factory. expire_on_commit=False keeps loaded attributes usable
+# after commit, since lazy loads are not available on AsyncSession.
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Create declarative base for models
 Base = declarative_base()
 
@@ -27,6 +187,36 @@ def get_db():
         db.close()
 
 
+# Dependency to get async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 # Create all tables
 def create_tables():
     Base.metadata.create_all(bind=engine)
+
+
+def get_pool_status() -> dict:
+    """Checked-out/overflow connections and checkout wait times for both engines"""
+    status = {}
+    for name, eng, stats in (
+        ("sync", engine, sync_pool_stats),
+        ("async", async_engine.sync_engine, async_pool_stats),
+    ):
+        pool = eng.pool
+        entry = {"pool_class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            entry.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                # overflow() is negative until the base pool is exhausted
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow,
+                timeout_seconds=pool.timeout(),
+            )
+        entry.update(stats.snapshot())
+        status[name] = entry
+    return status
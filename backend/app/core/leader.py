@@ -0,0 +1,210 @@
+"""
+Leader election so only one process runs the background jobs
+
+Every uvicorn worker (and any `python -m app.worker`) starts a scheduler,
+but each also runs a LeaderElector that tries to take a single lock every
+few seconds. The holder resumes its scheduler; everyone else keeps theirs
+paused. On Postgres the lock is a session-level advisory lock held on a
+dedicated connection outside the request pool, elsewhere an OS file lock. Either way the lock is
+released when the leader's process dies, and the next poll in another
+process takes over.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from typing import Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+from .config import settings
+from .database import create_sync_engine
+from .metrics import observe_leadership
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+# ============= Locks =============
+class AdvisoryLock:
+    """Postgres session advisory lock, held for as long as its connection lives"""
+
+    def __init__(self, engine: Engine, key: int):
+        self.engine = engine
+        self.key = key
+        self._conn = None
+
+    def acquire(self) -> bool:
+        conn = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            acquired = conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key})
+        except Exception:
+            conn.close()
+            raise
+        if not acquired:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def held(self) -> bool:
+        """Ping the lock's connection; if it dropped, the server has released the lock"""
+        if self._conn is None:
+            return False
+        try:
+            self._conn.scalar(text("SELECT 1"))
+            return True
+        except Exception:
+            self._discard()
+            return False
+
+    def release(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.scalar(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            self._conn.close()
+            self._conn = None
+        except Exception:
+            self._discard()
+
+    def _discard(self):
+        # Never hand a connection that may still hold the lock back to the pool
+        try:
+            self._conn.invalidate()
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+
+class FileLock:
+    """Exclusive, non-blocking OS lock on a file; the OS drops it if the process dies.
+
+    Only coordinates processes on one host, which is all a SQLite database
+    can be shared between anyway.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def acquire(self) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+def scheduler_lock(engine: Engine):
+    """The lock scheduler processes sharing this database compete for"""
+    if engine.dialect.name == "postgresql":
+        # The lock pins its connection for as long as this process leads; an
+        # unpooled engine keeps that connection out of the request pool
+        lock_engine = create_sync_engine(engine.url.render_as_string(hide_password=False), poolclass=NullPool)
+        return AdvisoryLock(lock_engine, settings.SCHEDULER_LOCK_KEY)
+    if engine.dialect.name != "sqlite":
+        logger.warning(f"No advisory lock for {engine.dialect.name}; scheduler leader election only covers this host")
+    path = settings.SCHEDULER_LOCK_FILE
+    if not path:
+        digest = hashlib.sha1(str(engine.url).encode()).hexdigest()[:12]
+        path = os.path.join(tempfile.gettempdir(), f"munda-scheduler-{digest}.lock")
+    return FileLock(path)
+
+
+# ============= Election =============
+class LeaderElector:
+    """Polls a lock from a daemon thread and calls on_elected/on_demoted as leadership changes"""
+
+    def __init__(self, lock, on_elected: Callable[[], None], on_demoted: Callable[[], None],
+                 interval: float = 10.0):
+        self.lock = lock
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.interval = interval
+        self.is_leader = False
+        self._mutex = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.poll()
+        self._thread = threading.Thread(target=self._run, name="leader-elector", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        """Take the lock if it's free, or step down if it was lost"""
+        with self._mutex:
+            try:
+                if self.is_leader:
+                    if not self.lock.held():
+                        self._set_leader(False, "lost the scheduler lock")
+                elif self.lock.acquire():
+                    self._set_leader(True, "acquired the scheduler lock")
+            except Exception as e:
+                logger.warning(f"Leader election check failed: {e}")
+
+    def confirm(self) -> bool:
+        """Re-check the lock right before a job runs, so a stale leader can't run it"""
+        with self._mutex:
+            if self.is_leader and not self.lock.held():
+                self._set_leader(False, "lost the scheduler lock")
+            return self.is_leader
+
+    def stop(self):
+        """Stop polling and release the lock so another process can take over at once.
+
+        on_demoted isn't called; stop whatever runs the jobs first.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+        with self._mutex:
+            if self.is_leader:
+                self.is_leader = False
+                observe_leadership(False)
+                logger.info(f"Process {os.getpid()} released the scheduler lock")
+            self.lock.release()
+
+    def _set_leader(self, leader: bool, reason: str):
+        self.is_leader = leader
+        observe_leadership(leader)
+        logger.info(f"Process {os.getpid()} {reason}; {'running' if leader else 'pausing'} scheduled jobs")
+        (self.on_elected if leader else self.on_demoted)()
@@ -0,0 +1,248 @@
+"""
+In-process metrics registry with Prometheus text exposition
+
+Tracks per-route request latency histograms and status counts (fed by
+CORSTimingMiddleware), scheduler job durations and row counts (fed by
+services/scheduler.py), scheduler leadership (fed by core/leader.py),
+notification deliveries (fed by services/notification_queue.py), and reads
+connection pool stats at scrape time.
+Everything lives in process memory, so each worker exposes its own
+series and Prometheus aggregates across them.
+"""
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Tuple
+
+# Seconds; covers fast cached reads through slow report endpoints
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}" for labels, v in items]
+
+
+class Gauge(Counter):
+    """Last observed value keyed by label values"""
+
+    kind = "gauge"
+
+    def set(self, *labelvalues: str, value: float):
+        with self._lock:
+            self._values[labelvalues] = value
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *labelvalues: str, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+        lines = []
+        for labels, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+# ============= Registry =============
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route template",
+    ("method", "route"),
+)
+http_requests_total = Counter(
+    "http_requests_total", "Requests by route template and status code",
+    ("method", "route", "status"),
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries", "SQL statements executed per request",
+    ("method", "route"), buckets=(1, 2, 5, 10, 20, 50, 100, 250),
+)
+job_duration = Histogram(
+    "scheduler_job_duration_seconds", "Background job run time",
+    ("job",), buckets=JOB_BUCKETS,
+)
+job_runs_total = Counter(
+    "scheduler_job_runs_total", "Background job runs by outcome",
+    ("job", "outcome"),
+)
+job_rows_total = Counter(
+    "scheduler_job_rows_total", "Rows written by background jobs",
+    ("job",),
+)
+job_last_rows = Gauge(
+    "scheduler_job_last_rows", "Rows written by the most recent run of a job",
+    ("job",),
+)
+job_last_success = Gauge(
+    "scheduler_job_last_success_timestamp_seconds", "Unix time the job last finished successfully",
+    ("job",),
+)
+job_skipped_total = Counter(
+    "scheduler_job_skipped_total", "Job runs not started: overlap (previous run still going), missed, not_leader",
+    ("job", "reason"),
+)
+scheduler_leader = Gauge(
+    "scheduler_leader", "1 while this process holds the scheduler lock and runs the jobs",
+)
+stock_ledger_drift_stocks = Gauge(
+    "stock_ledger_drift_stocks", "Stock balances that differed from their movement ledger at the last reconciliation",
+)
+stock_ledger_drift_kg = Gauge(
+    "stock_ledger_drift_kg", "Total |balance - ledger| in kg at the last reconciliation",
+)
+notifications_total = Counter(
+    "notifications_total", "Outbox delivery attempts by channel and outcome (sent, retry, dead)",
+    ("channel", "outcome"),
+)
+
+REGISTRY = [
+    http_request_duration,
+    http_requests_total,
+    http_request_db_queries,
+    job_duration,
+    job_runs_total,
+    job_rows_total,
+    job_last_rows,
+    job_last_success,
+    job_skipped_total,
+    scheduler_leader,
+    stock_ledger_drift_stocks,
+    stock_ledger_drift_kg,
+    notifications_total,
+]
+
+
+def observe_request(method: str, route: str, status: int, duration: float, db_queries: int):
+    http_request_duration.observe(method, route, value=duration)
+    http_requests_total.inc(method, route, str(status))
+    http_request_db_queries.observe(method, route, value=db_queries)
+
+
+def observe_job(job: str, duration: float, rows: int, succeeded: bool, finished_at: float):
+    job_duration.observe(job, value=duration)
+    job_runs_total.inc(job, "success" if succeeded else "error")
+    if succeeded:
+        job_rows_total.inc(job, amount=rows)
+        job_last_rows.set(job, value=rows)
+        job_last_success.set(job, value=finished_at)
+
+
+def observe_job_skipped(job: str, reason: str):
+    job_skipped_total.inc(job, reason)
+
+
+def observe_leadership(is_leader: bool):
+    scheduler_leader.set(value=1 if is_leader else 0)
+
+
+def observe_stock_drift(stocks: int, kg: float):
+    stock_ledger_drift_stocks.set(value=stocks)
+    stock_ledger_drift_kg.set(value=kg)
+
+
+def observe_notification(channel: str, outcome: str):
+    notifications_total.inc(channel, outcome)
+
+
+def _pool_samples() -> List[str]:
+    """Connection pool gauges, read at scrape time"""
+    from .database import get_pool_status
+
+    metrics = (
+        ("checked_out", "db_pool_checked_out", "gauge", "Connections currently checked out"),
+        ("checked_in", "db_pool_checked_in", "gauge", "Idle connections in the pool"),
+        ("overflow", "db_pool_overflow", "gauge", "Connections open beyond pool_size"),
+        ("size", "db_pool_size", "gauge", "Configured pool_size"),
+        ("checkouts", "db_pool_checkouts_total", "counter", "Connection checkouts"),
+        ("timeouts", "db_pool_checkout_timeouts_total", "counter", "Checkouts that hit pool_timeout"),
+        ("max_wait_ms", "db_pool_checkout_max_wait_ms", "gauge", "Longest checkout wait"),
+        ("avg_wait_ms", "db_pool_checkout_avg_wait_ms", "gauge", "Mean checkout wait"),
+    )
+    status = get_pool_status()
+    lines = []
+    for key, name, kind, documentation in metrics:
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {kind}")
+        for engine_name, entry in status.items():
+            if entry.get(key) is not None:
+                lines.append(f'{name}{{engine="{engine_name}"}} {_format_value(entry[key])}')
+    return lines
+
+
+def render_prometheus() -> str:
+    """All metrics in Prometheus text exposition format 0.0.4"""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    lines.extend(_pool_samples())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,131 @@
+"""
+Pure ASGI middleware for CORS and request timing
+
+Replaces the BaseHTTPMiddleware CORS class and the @app.middleware("http")
+timer. Both of those ran the endpoint in an extra task and streamed the
+response through a memory channel. This middleware only rewrites the
+http.response.start message.
+"""
+import logging
+import re
+import time
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import observe_request
+from .query_stats import track_queries, warn_on_repeated_queries
+
+logger = logging.getLogger(__name__)
+
+CORS_ALLOW_METHODS = "GET, POST, PUT, DELETE, PATCH, OPTIONS"
+
+
+class OriginMatcher:
+    """Allow-list of exact origins plus an optional pattern, memoized per origin"""
+
+    def __init__(self, origins: Iterable[str], pattern: Optional[str] = None, cache_size: int = 1024):
+        self.origins = frozenset(origins)
+        self.pattern = re.compile(pattern) if pattern else None
+        # Bounded, since the Origin header is client controlled
+        self._cached_check = lru_cache(maxsize=cache_size)(self._check)
+
+    def _check(self, origin: str) -> bool:
+        if origin in self.origins:
+            return True
+        if self.pattern is not None and self.pattern.fullmatch(origin):
+            return True
+        # Logged once per origin rather than on every request
+        logger.warning(f"CORS: Origin not allowed: {origin}")
+        return False
+
+    def __call__(self, origin: Optional[str]) -> bool:
+        if not origin:
+            return False
+        return self._cached_check(origin)
+
+
+def cors_headers(origin: str) -> dict:
+    """CORS headers for an allowed origin (used by the exception handlers too)"""
+    return {
+        "Access-Control-Allow-Origin": origin,
+        "Access-Control-Allow-Credentials": "true",
+        "Access-Control-Allow-Methods": CORS_ALLOW_METHODS,
+        "Access-Control-Allow-Headers": "*",
+    }
+
+
+def route_label(scope: Scope) -> str:
+    """Route template for metrics labels, e.g. /api/v1/orders/{order_id}"""
+    # Set on the shared scope by FastAPI's router once a route has matched;
+    # raw paths would give one series per order id
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    return "unmatched"
+
+
+class CORSTimingMiddleware:
+    """CORS for explicit origins + a pattern, X-Process-Time/X-DB-* headers and request metrics"""
+
+    def __init__(self, app: ASGIApp, origin_matcher: OriginMatcher, max_age: int = 3600):
+        self.app = app
+        self.origin_matcher = origin_matcher
+        self.max_age = str(max_age)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value.decode("latin-1")
+                break
+        is_allowed = self.origin_matcher(origin)
+        start_time = time.perf_counter()
+        status_code = 500
+
+        with track_queries() as query_stats:
+            async def send_with_headers(message: Message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    headers = MutableHeaders(scope=message)
+                    headers["X-Process-Time"] = str(time.perf_counter() - start_time)
+                    headers["X-DB-Queries"] = str(query_stats.count)
+                    headers["X-DB-Time"] = f"{query_stats.total_time:.6f}"
+                    if is_allowed:
+                        for key, value in cors_headers(origin).items():
+                            headers[key] = value
+                        if scope["method"] == "OPTIONS":
+                            headers["Access-Control-Max-Age"] = self.max_age
+                        else:
+                            headers["Access-Control-Expose-Headers"] = "*"
+                await send(message)
+
+            try:
+                if scope["method"] == "OPTIONS":
+                    # Preflight is answered here; disallowed origins are rejected
+                    await self._send_empty(200 if is_allowed else 403, send_with_headers)
+                else:
+                    await self.app(scope, receive, send_with_headers)
+            finally:
+                observe_request(
+                    scope["method"], route_label(scope), status_code,
+                    time.perf_counter() - start_time, query_stats.count,
+                )
+
+        warn_on_repeated_queries(query_stats, f"{scope['method']} {scope['path']}")
+
+    @staticmethod
+    async def _send_empty(status_code: int, send: Send):
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-length", b"0")],
+        })
+        await send({"type": "http.response.body", "body": b""})
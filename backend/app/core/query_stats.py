@@ -0,0 +1,105 @@
+"""
+Per-request SQL instrumentation
+
+Engine-level event listeners count statements and time spent in the
+database for the request currently being handled. The request middleware
+opens a QueryStats scope, reports it in the X-DB-Queries / X-DB-Time
+headers, and logs a warning when the same statement shape repeats more
+than DB_N_PLUS_ONE_THRESHOLD times (the usual sign of an N+1 loop).
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_current_stats: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+# Expanded IN lists and multi-row VALUES: "(?, ?, ?)" / "($1, $2)" -> "(?)"
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|\$\d+|%\(\w+\)s|%s|:\w+)\s*,?)+\)")
+_NUMBERED_PARAM = re.compile(r"\$\d+")
+
+
+def normalize_statement(statement: str) -> str:
+    """Reduce a SQL statement to its shape so repeated queries compare equal"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _NUMBERED_PARAM.sub("?", shape)
+    return _PLACEHOLDER_LIST.sub("(?)", shape)
+
+
+class QueryStats:
+    """Statement count, DB time and statement shapes for one request"""
+
+    def __init__(self):
+        # Sync endpoints run in the threadpool while the middleware waits on
+        # the event loop, so guard the counters
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        shape = normalize_statement(statement)
+        with self._lock:
+            self.count += 1
+            self.total_time += elapsed
+            self.shapes[shape] += 1
+
+    def repeated_statements(self, threshold: int) -> list:
+        """Statement shapes executed more than threshold times"""
+        with self._lock:
+            return [(shape, n) for shape, n in self.shapes.most_common() if n > threshold]
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Collect SQL statistics for everything executed inside the block"""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def warn_on_repeated_queries(stats: QueryStats, label: str):
+    """Log likely N+1 patterns for a finished request"""
+    threshold = settings.DB_N_PLUS_ONE_THRESHOLD
+    if threshold <= 0:
+        return
+    for shape, n in stats.repeated_statements(threshold):
+        logger.warning(
+            f"Possible N+1 in {label}: statement ran {n} times "
+            f"({stats.count} queries total): {shape[:300]}"
+        )
+
+
+# ============= Engine Listeners =============
+# Registered on the Engine class so both the sync engine and the async
+# engine's underlying sync engine are covered.
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    started = conn.info.get("query_start_time")
+    if not started:
+        return
+    stats.record(statement, time.perf_counter() - started.pop())
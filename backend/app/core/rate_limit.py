@@ -0,0 +1,54 @@
+"""
+Thread-safe token bucket for pacing calls to rate-limited providers
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+
+class TokenBucket:
+    """`rate` tokens per second, bursting up to `capacity`.
+
+    acquire() reserves its tokens before sleeping, so concurrent callers
+    queue up behind each other instead of all waking at the same instant.
+    A rate of 0 or less disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 timer: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = max(capacity if capacity is not None else rate, 1)
+        self._timer = timer
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = timer()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: float = 1, timeout: Optional[float] = None) -> Optional[float]:
+        """Take tokens now and return how long to wait before using them, or None if that exceeds timeout"""
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            self._refill(self._timer())
+            wait = max(0.0, (tokens - self._tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                return None
+            self._tokens -= tokens
+            return wait
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """Block until tokens are available; False if that would take longer than timeout"""
+        wait = self.reserve(tokens, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            self._sleep(wait)
+        return True
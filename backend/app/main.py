@@ -1,14 +1,18 @@
+import time
+
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
-import time
+from fastapi.responses import JSONResponse, PlainTextResponse
 import logging
-import re
+import secrets
 
 from .core.config import settings
 from .core.database import create_tables
+from .core.metrics import render_prometheus
+from .core.middleware import CORSTimingMiddleware, OriginMatcher, cors_headers
 from .api.v1 import api_router
-from .services.scheduler import start_scheduler, stop_scheduler
 
 # Configure logging
 logging.basicConfig(
@@ -50,67 +54,15 @@ logger.info(f"CORS configured with {len(allowed_origins)} allowed origins")
 if settings.DEBUG:
     logger.info(f"DEBUG mode: CORS origins = {allowed_origins}")
 
+# Exact origins plus Vercel preview deployments; decisions are memoized per origin
+origin_matcher = OriginMatcher(allowed_origins, pattern=r"https://[^/]+\.vercel\.app")
+
+
 # Helper function to check if origin is allowed
 def is_origin_allowed(origin: str) -> bool:
     """Check if an origin is allowed for CORS"""
-    if not origin:
-        return False
-    if origin in allowed_origins:
-        return True
-    if re.match(r"https://.*\.vercel\.app", origin):
-        return True
-    return False
-
-# Custom CORS middleware to handle both explicit origins and regex patterns
-# This is needed because FastAPI's CORSMiddleware doesn't support both
-# allow_origin_regex and allow_origins together with allow_credentials=True
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request as StarletteRequest
-from starlette.responses import Response
-
-class CustomCORSMiddleware(BaseHTTPMiddleware):
-    """Custom CORS middleware that supports both explicit origins and regex patterns"""
-    
-    async def dispatch(self, request: StarletteRequest, call_next):
-        origin = request.headers.get("origin")
-        
-        # Check if origin is allowed
-        is_allowed = is_origin_allowed(origin) if origin else False
-        
-        if origin and not is_allowed:
-            logger.warning(f"CORS: Origin not allowed: {origin}")
-        
-        # Handle preflight OPTIONS request
-        if request.method == "OPTIONS":
-            if is_allowed and origin:
-                response = Response(status_code=200)
-                response.headers["Access-Control-Allow-Origin"] = origin
-                response.headers["Access-Control-Allow-Credentials"] = "true"
-                response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, PATCH, OPTIONS"
-                response.headers["Access-Control-Allow-Headers"] = "*"
-                response.headers["Access-Control-Max-Age"] = "3600"
-                logger.info(f"CORS: Allowed OPTIONS preflight for origin: {origin}")
-                return response
-            else:
-                # Reject preflight for disallowed origins
-                logger.warning(f"CORS: Rejected OPTIONS preflight for origin: {origin}")
-                return Response(status_code=403)
-        
-        # Process the request
-        response = await call_next(request)
-        
-        # Add CORS headers to response if origin is allowed
-        if is_allowed and origin:
-            response.headers["Access-Control-Allow-Origin"] = origin
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-            response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, PATCH, OPTIONS"
-            response.headers["Access-Control-Allow-Headers"] = "*"
-            response.headers["Access-Control-Expose-Headers"] = "*"
-            logger.debug(f"CORS: Added headers for origin: {origin}")
-        
-        return response
+    return origin_matcher(origin)
 
-app.add_middleware(CustomCORSMiddleware)
 
 # Trusted hosts middleware (security)
 if not settings.DEBUG:
@@ -119,14 +71,11 @@ if not settings.DEBUG:
         allowed_hosts=settings.ALLOWED_HOSTS
     )
 
-# Request timing middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
+# CORS + request timing in one pure ASGI middleware (outermost). Handles both
+# explicit origins and the Vercel pattern, which FastAPI's CORSMiddleware
+# can't combine with allow_credentials=True, and sets X-Process-Time and the
+# per-request X-DB-Queries / X-DB-Time headers.
+app.add_middleware(CORSTimingMiddleware, origin_matcher=origin_matcher)
 
 # Global exception handler - MUST add CORS headers
 @app.exception_handler(HTTPException)
@@ -142,10 +91,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     )
     # Add CORS headers to error responses
     if is_origin_allowed(origin):
-        response.headers["Access-Control-Allow-Origin"] = origin
-        response.headers["Access-Control-Allow-Credentials"] = "true"
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, PATCH, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "*"
+        response.headers.update(cors_headers(origin))
     return response
 
 # General exception handler for unhandled exceptions
@@ -169,10 +115,7 @@ async def general_exception_handler(request: Request, exc: Exception):
     )
     # Add CORS headers to error responses
     if is_origin_allowed(origin):
-        response.headers["Access-Control-Allow-Origin"] = origin
-        response.headers["Access-Control-Allow-Credentials"] = "true"
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, PATCH, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "*"
+        response.headers.update(cors_headers(origin))
     return response
 
 # Health check endpoint
@@ -185,6 +128,15 @@ async def health_check():
         "timestamp": time.time()
     }
 
+# Prometheus metrics (per worker process)
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get("authorization", "")
+        if not secrets.compare_digest(supplied, f"Bearer {settings.METRICS_TOKEN}"):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -277,60 +229,44 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 # Startup event
 @app.on_event("startup")
 async def startup_event():
-    from .core.database import SessionLocal
-    from .core.auth import get_password_hash
-    from .models.user import User, UserRole, UserStatus
-    
-    logger.info(f"Starting {settings.PROJECT_NAME} v{settings.PROJECT_VERSION}")
+    logger.info(f"Starting {settings.PROJECT_NAME} v{settings.PROJECT_VERSION} (boot mode: {settings.BOOT_MODE})")
     if settings.DEBUG:
         logger.info("Debug mode is enabled")
     
-    # Always ensure database tables exist (for initial setup)
-    # In production with migrations, this will just verify tables exist
-    try:
-        create_tables()
-        logger.info("Database tables created/verified")
-    except Exception as e:
-        logger.error(f"Error creating database tables: {e}")
-        # Don't fail startup, just log the error
-    
-    # Ensure admin user exists
-    db = SessionLocal()
-    try:
-        admin = db.query(User).filter(User.role == UserRole.ADMIN).first()
-        if not admin:
-            admin = User(
-                name="System Administrator",
-                phone="+263771234567",
-                email="admin@mundamarket.co.zw",
-                hashed_password=get_password_hash("admin123"),
-                role=UserRole.ADMIN,
-                status=UserStatus.ACTIVE,
-                is_verified=True,
-            )
-            db.add(admin)
-            db.commit()
-            logger.info("Admin user created automatically")
-        else:
-            logger.info(f"Admin user exists (ID: {admin.user_id})")
-    except Exception as e:
-        logger.error(f"Error ensuring admin user: {e}")
-        db.rollback()
-    finally:
-        db.close()
+    if settings.BOOT_MODE == "full":
+        # Local development: create tables and the admin user on every boot.
+        # Deploys use BOOT_MODE=fast and run `python -m app.migrate` once instead.
+        from .migrate import ensure_admin_user
+        
+        try:
+            create_tables()
+            logger.info("Database tables created/verified")
+        except Exception as e:
+            logger.error(f"Error creating database tables: {e}")
+            # Don't fail startup, just log the error
+        
+        try:
+            ensure_admin_user()
+        except Exception as e:
+            logger.error(f"Error ensuring admin user: {e}")
     
     # Start background scheduler for alerts and stock history
-    try:
-        start_scheduler()
-        logger.info("Background scheduler started")
-    except Exception as e:
-        logger.error(f"Error starting scheduler: {e}")
+    if settings.RUN_SCHEDULER:
+        try:
+            from .services.scheduler import start_scheduler
+            start_scheduler()
+        except Exception as e:
+            logger.error(f"Error starting scheduler: {e}")
+    
+    logger.info(f"Ready {time.perf_counter() - _import_started:.2f}s after app import began")
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info(f"Shutting down {settings.PROJECT_NAME}")
-    stop_scheduler()
+    if settings.RUN_SCHEDULER:
+        from .services.scheduler import stop_scheduler
+        stop_scheduler()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,83 @@
+"""
+Schema and bootstrap data setup, run once per deploy instead of on every boot
+
+    python -m app.migrate                # create missing tables, alembic upgrade head, ensure admin
+    python -m app.migrate --no-admin     # schema only
+
+Web workers started with BOOT_MODE=fast skip all of this; BOOT_MODE=full
+(the local development default) still runs ensure_schema() and
+ensure_admin_user() from the startup event.
+"""
+import argparse
+import logging
+import os
+import sys
+
+from .core.config import settings
+from .core.database import SessionLocal, create_tables
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def ensure_schema():
+    """Create missing tables, then apply Alembic revisions"""
+    from alembic import command
+    from alembic.config import Config
+    from . import models  # noqa: F401  (registers every table on Base.metadata)
+
+    # There is no baseline revision for the original tables, so create_all
+    # covers a fresh database and the revisions only add what came later
+    create_tables()
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    command.upgrade(config, "head")
+
+
+def ensure_admin_user() -> bool:
+    """Create the default admin account if no admin exists; returns True if created"""
+    from .core.auth import get_password_hash
+    from .models.user import User, UserRole, UserStatus
+
+    db = SessionLocal()
+    try:
+        admin = db.query(User).filter(User.role == UserRole.ADMIN).first()
+        if admin:
+            logger.info(f"Admin user exists (ID: {admin.user_id})")
+            return False
+        db.add(User(
+            name="System Administrator",
+            phone="+263771234567",
+            email="admin@mundamarket.co.zw",
+            hashed_password=get_password_hash("admin123"),
+            role=UserRole.ADMIN,
+            status=UserStatus.ACTIVE,
+            is_verified=True,
+        ))
+        db.commit()
+        logger.info("Admin user created automatically")
+        return True
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Apply database schema and bootstrap data")
+    parser.add_argument("--no-admin", action="store_true", help="Don't create the default admin user")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    logger.info(f"Migrating {settings.PROJECT_NAME} database")
+    ensure_schema()
+    logger.info("Database schema is up to date")
+    if not args.no_admin:
+        ensure_admin_user()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
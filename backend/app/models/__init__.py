@@ -11,9 +11,12 @@ from .logistics import Shipment
 from .quality import QCCheck
 from .audit import AuditLog, SecurityEvent
 from .banner import Banner, BannerType, BannerPlatform
-from .buyer_inventory import BuyerInventoryPreference, InventoryAlert, AlertSeverity, AlertStatus
-from .stock_history import StockHistory
+from .buyer_inventory import BuyerInventoryPreference, InventoryAlert, AlertSeverity, AlertStatus, AlertDirtyCrop
+from .stock_history import StockHistory, StockHistoryRollup
 from .buyer_stock import BuyerStock, StockMovement, StockMovementType, SalesIntensityCode
+from .notification import NotificationOutbox, NotificationChannel, NotificationStatus
+from .job_run import JobRun, JobRunStatus
+from .idempotency import IdempotencyKey, IdempotencyStatus
 
 __all__ = [
     "User",
@@ -40,9 +43,18 @@ __all__ = [
     "InventoryAlert",
     "AlertSeverity",
     "AlertStatus",
+    "AlertDirtyCrop",
     "StockHistory",
+    "StockHistoryRollup",
     "BuyerStock",
     "StockMovement",
     "StockMovementType",
-    "SalesIntensityCode"
+    "SalesIntensityCode",
+    "NotificationOutbox",
+    "NotificationChannel",
+    "NotificationStatus",
+    "JobRun",
+    "JobRunStatus",
+    "IdempotencyKey",
+    "IdempotencyStatus"
 ]
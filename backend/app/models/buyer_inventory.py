@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Enum as SQLEnum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from enum import Enum
@@ -51,7 +51,8 @@ class BuyerInventoryPreference(Base):
     # Alert preferences
     enable_low_stock_alerts = Column(Boolean, default=True)
     enable_harvest_alerts = Column(Boolean, default=True)
-    enable_price_alerts = Column(Boolean, default=False)  # Future: price change alerts
+    enable_price_alerts = Column(Boolean, default=False)
+    price_change_threshold_pct = Column(Float, nullable=True)  # None: settings.PRICE_ALERT_THRESHOLD_PCT
     alert_frequency = Column(String(20), default="daily")  # daily, weekly, realtime
     
     # Notification channels (JSON)
@@ -125,6 +126,24 @@ class InventoryAlert(Base):
     listing = relationship("Listing")
     lot = relationship("Lot")
     
+    # Composite index for the existing-alert check in alert generation
+    __table_args__ = (
+        Index('idx_inventory_alerts_buyer_crop_type_status', 'buyer_user_id', 'crop_id', 'alert_type', 'status'),
+    )
+    
     def __repr__(self):
         return f"<InventoryAlert(id={self.alert_id}, buyer={self.buyer_user_id}, type={self.alert_type}, severity={self.severity})>"
 
+
+
+class AlertDirtyCrop(Base):
+    """Outbox of crops whose lots, listings or production plans changed since their alerts were evaluated"""
+    __tablename__ = "alert_dirty_crops"
+    
+    # Append-only: writers never contend on a row; the alert job deletes what it processed
+    id = Column(Integer, primary_key=True)
+    crop_id = Column(Integer, ForeignKey("crops.crop_id"), nullable=False, index=True)
+    marked_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    def __repr__(self):
+        return f"<AlertDirtyCrop(crop_id={self.crop_id}, marked={self.marked_at})>"
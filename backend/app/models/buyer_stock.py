@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Enum as SQLEnum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from enum import Enum
@@ -128,6 +128,11 @@ class StockMovement(Base):
     crop = relationship("Crop")
     order = relationship("Order", foreign_keys=[order_id])
     
+    # Composite index for consumption/history lookups per buyer and crop
+    __table_args__ = (
+        Index('idx_stock_movements_buyer_crop_type_date', 'buyer_user_id', 'crop_id', 'movement_type', 'movement_date'),
+    )
+    
     def __repr__(self):
         return f"<StockMovement(id={self.movement_id}, type={self.movement_type}, qty={self.quantity_kg}kg)>"
 
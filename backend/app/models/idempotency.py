@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Enum as SQLEnum, Index, UniqueConstraint
+from enum import Enum
+from ..core.database import Base
+
+
+class IdempotencyStatus(str, Enum):
+    """State of a request made with an Idempotency-Key"""
+    IN_PROGRESS = "in_progress"  # Claimed by the first request; duplicates get 409 until it finishes
+    COMPLETED = "completed"      # Response stored; duplicates get it replayed
+
+
+class IdempotencyKey(Base):
+    """Client-supplied Idempotency-Key and the response of the request that used it (services/idempotency.py).
+
+    Unique per endpoint scope and caller, and deleted once expires_at passes.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key_id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(64), nullable=False)   # endpoint, e.g. "orders.submit"
+    owner = Column(String(64), nullable=False, default="")  # "user:<id>", or "" for anonymous endpoints
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)  # sha256 of the request body
+
+    status = Column(SQLEnum(IdempotencyStatus), nullable=False, default=IdempotencyStatus.IN_PROGRESS)
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)  # JSON
+
+    locked_at = Column(DateTime(timezone=True), nullable=False)  # when the current attempt claimed the key
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('scope', 'owner', 'key', name='uq_idempotency_keys_scope_owner_key'),
+        Index('idx_idempotency_keys_expires', 'expires_at'),
+    )
+
+    def __repr__(self):
+        return f"<IdempotencyKey(id={self.key_id}, scope={self.scope}, key={self.key}, status={self.status})>"
@@ -0,0 +1,43 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Enum as SQLEnum, Index
+from sqlalchemy.sql import func
+from enum import Enum
+from ..core.database import Base
+
+
+class JobRunStatus(str, Enum):
+    """Outcome of a scheduled job run"""
+    RUNNING = "running"
+    SUCCESS = "success"
+    ERROR = "error"
+    SKIPPED = "skipped"  # Dropped: the previous run was still going, or it fired too late
+
+
+class JobRun(Base):
+    """One run of a scheduled background job (services/scheduler.py).
+
+    Written when the run starts and updated when it ends, so a run that is
+    still going, or whose process died, shows up as RUNNING.
+    """
+    __tablename__ = "job_runs"
+
+    run_id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String(64), nullable=False)
+    status = Column(SQLEnum(JobRunStatus), nullable=False, default=JobRunStatus.RUNNING)
+    worker = Column(String(128), nullable=True)  # host:pid that ran it
+
+    started_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    duration_ms = Column(Float, nullable=True)
+
+    rows_scanned = Column(Integer, nullable=True)  # inputs examined, where the job reports them
+    rows_written = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+
+    # Latest runs per job, and retention deletes by age
+    __table_args__ = (
+        Index('idx_job_runs_job_started', 'job_id', 'started_at'),
+        Index('idx_job_runs_started', 'started_at'),
+    )
+
+    def __repr__(self):
+        return f"<JobRun(id={self.run_id}, job={self.job_id}, status={self.status})>"
@@ -0,0 +1,56 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum as SQLEnum, Index
+from sqlalchemy.sql import func
+from enum import Enum
+from ..core.database import Base
+
+
+class NotificationChannel(str, Enum):
+    """Delivery channels handled by the notification dispatcher"""
+    EMAIL = "email"
+    SMS = "sms"
+    WHATSAPP = "whatsapp"
+
+
+class NotificationStatus(str, Enum):
+    """Outbox delivery status"""
+    PENDING = "pending"   # Waiting for its next attempt
+    SENDING = "sending"   # Claimed by a dispatcher
+    SENT = "sent"
+    DEAD = "dead"         # Gave up; kept for inspection and manual retry
+
+
+class NotificationOutbox(Base):
+    """Email/SMS messages waiting to be delivered by the background dispatcher.
+
+    Rows are written in the same transaction as the alert they announce, so a
+    rolled-back alert never notifies anyone and a slow provider never holds
+    the alert job's transaction open.
+    """
+    __tablename__ = "notification_outbox"
+
+    notification_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=True, index=True)
+
+    channel = Column(SQLEnum(NotificationChannel), nullable=False)
+    recipient = Column(String(255), nullable=False)  # email address or E.164 phone number
+    subject = Column(String(255), nullable=True)
+    body_text = Column(Text, nullable=False)
+    body_html = Column(Text, nullable=True)
+
+    # Delivery state
+    status = Column(SQLEnum(NotificationStatus), nullable=False, default=NotificationStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    # The dispatcher's claim query: due rows by status, oldest first
+    __table_args__ = (
+        Index('idx_notification_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f"<NotificationOutbox(id={self.notification_id}, channel={self.channel}, status={self.status})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Enum as SQLEnum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from enum import Enum
@@ -113,6 +113,11 @@ class Order(Base):
         """Count total number of line items"""
         return len(self.order_items)
     
+    # Composite index for a buyer's orders filtered by status, newest first
+    __table_args__ = (
+        Index('idx_orders_buyer_status_created', 'buyer_id', 'status', 'created_at'),
+    )
+    
     def __repr__(self):
         return f"<Order(id={self.order_id}, number='{self.order_number}', status='{self.status}', total=${self.total})>"
 
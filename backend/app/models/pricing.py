@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Enum as SQLEnum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from enum import Enum
@@ -162,5 +162,10 @@ class Listing(Base):
             return (self.markup_amount_per_kg / self.base_price_per_kg) * 100
         return 0
     
+    # Composite index for active listings per lot
+    __table_args__ = (
+        Index('idx_listings_lot_active', 'lot_id', 'is_active'),
+    )
+    
     def __repr__(self):
         return f"<Listing(id={self.listing_id}, price=${self.sell_price_per_kg}/kg, lot={self.lot_id})>"
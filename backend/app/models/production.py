@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Enum as SQLEnum, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Enum as SQLEnum, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from enum import Enum
@@ -100,6 +100,11 @@ class ProductionPlan(Base):
     crop = relationship("Crop", back_populates="production_plans")
     lots = relationship("Lot", back_populates="production_plan")
     
+    # Composite index for upcoming-harvest lookups per crop
+    __table_args__ = (
+        Index('idx_production_plans_crop_status_harvest', 'crop_id', 'status', 'expected_harvest_window_start'),
+    )
+    
     def __repr__(self):
         return f"<ProductionPlan(id={self.plan_id}, crop='{self.crop.name if self.crop else 'N/A'}', hectares={self.hectares})>"
 
@@ -169,6 +174,11 @@ class Lot(Base):
     # order_items = relationship("OrderItem", back_populates="lot")  # Remove for now
     qc_checks = relationship("QCCheck", back_populates="lot")
     
+    # Composite index for available lots per production plan
+    __table_args__ = (
+        Index('idx_lots_plan_status', 'plan_id', 'current_status'),
+    )
+    
     @property
     def remaining_kg(self):
         """Calculate remaining available quantity"""
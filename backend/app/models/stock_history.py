@@ -1,7 +1,7 @@
 """
 Model for tracking historical stock levels
 """
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index, String, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ..core.database import Base
@@ -45,3 +45,39 @@ class StockHistory(Base):
     def __repr__(self):
         return f"<StockHistory(crop_id={self.crop_id}, remaining={self.remaining_kg}kg, recorded={self.recorded_at})>"
 
+
+
+class StockHistoryRollup(Base):
+    """Stock snapshots averaged over an hour, day or week.
+
+    Hourly buckets are built from raw StockHistory rows, daily from hourly and
+    weekly (starting Monday) from daily, so raw snapshots and finer rollups
+    can be expired while long-range charts keep reading a few hundred rows.
+    """
+    __tablename__ = "stock_history_rollups"
+    
+    rollup_id = Column(Integer, primary_key=True, index=True)
+    crop_id = Column(Integer, ForeignKey("crops.crop_id"), nullable=False)
+    resolution = Column(String(10), nullable=False)  # hour, day, week
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    sample_count = Column(Integer, nullable=False, default=1)  # raw snapshots behind this bucket
+    
+    # Means over the bucket, except min/max price which are the extremes
+    total_available_kg = Column(Float, nullable=False)
+    total_reserved_kg = Column(Float, default=0.0)
+    total_sold_kg = Column(Float, default=0.0)
+    remaining_kg = Column(Float, nullable=False)
+    avg_price_per_kg = Column(Float, nullable=True)
+    min_price_per_kg = Column(Float, nullable=True)
+    max_price_per_kg = Column(Float, nullable=True)
+    active_listings_count = Column(Float, default=0.0)
+    
+    crop = relationship("Crop")
+    
+    __table_args__ = (
+        UniqueConstraint('crop_id', 'resolution', 'bucket_start', name='uq_stock_history_rollups_crop_bucket'),
+        Index('idx_stock_history_rollups_resolution_bucket', 'resolution', 'bucket_start'),
+    )
+    
+    def __repr__(self):
+        return f"<StockHistoryRollup(crop_id={self.crop_id}, {self.resolution} from {self.bucket_start})>"
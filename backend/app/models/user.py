@@ -65,13 +65,11 @@ class User(Base):
     
     def verify_password(self, password: str) -> bool:
         """Verify password against stored hash"""
-        from passlib.context import CryptContext
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        return pwd_context.verify(password, self.hashed_password)
+        from ..core.auth import verify_password
+        return verify_password(password, self.hashed_password)
     
     @staticmethod
     def hash_password(password: str) -> str:
         """Hash password for storage"""
-        from passlib.context import CryptContext
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        return pwd_context.hash(password)
+        from ..core.auth import get_password_hash
+        return get_password_hash(password)
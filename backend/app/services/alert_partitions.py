@@ -0,0 +1,150 @@
+"""
+Partitioned alert generation across a process pool
+
+The nightly full scan can split the buyers into ALERT_PARTITIONS contiguous
+buyer_user_id ranges of similar preference counts and evaluate each range
+in a worker process with its own engine and session, keeping the work out
+of the API process. Partitions never share a buyer, and
+generate_inventory_alerts() updates existing alerts rather than adding new
+ones, so a partition that fails and is retried never duplicates alerts.
+"""
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..core.config import settings
+from ..models.buyer_inventory import BuyerInventoryPreference
+from .inventory_alerts import generate_inventory_alerts
+
+logger = logging.getLogger(__name__)
+
+# Session factory of a pool worker process, set up by _init_worker()
+_worker_sessions = None
+
+
+def buyer_partitions(db: Session, partitions: int) -> List[Tuple[int, int]]:
+    """Inclusive buyer_user_id ranges, at most `partitions`, with similar numbers of preferences"""
+    rows = db.execute(
+        select(BuyerInventoryPreference.buyer_user_id, func.count())
+        .where(BuyerInventoryPreference.enable_low_stock_alerts == True)
+        .group_by(BuyerInventoryPreference.buyer_user_id)
+        .order_by(BuyerInventoryPreference.buyer_user_id)
+    ).all()
+    if not rows:
+        return []
+    target = sum(count for _, count in rows) / max(partitions, 1)
+    ranges = []
+    first = None
+    seen = 0
+    for buyer_id, count in rows:
+        if first is None:
+            first = buyer_id
+        seen += count
+        if len(ranges) < partitions - 1 and seen >= target * (len(ranges) + 1):
+            ranges.append((first, buyer_id))
+            first = None
+    if first is not None:
+        ranges.append((first, rows[-1][0]))
+    return ranges
+
+
+def _init_worker(database_url: str):
+    global _worker_sessions
+    from ..core.database import create_sync_engine
+
+    _worker_sessions = sessionmaker(bind=create_sync_engine(database_url), autocommit=False, autoflush=False)
+
+
+def evaluate_partition(index: int, buyer_range: Tuple[int, int], sessions=None) -> dict:
+    """Run generate_inventory_alerts() for one buyer range and time it"""
+    sessions = sessions or _worker_sessions
+    started = time.perf_counter()
+    with sessions() as db:
+        result = generate_inventory_alerts(db, buyer_range=buyer_range)
+    return {
+        **result,
+        "partition": index,
+        "first_buyer_id": buyer_range[0],
+        "last_buyer_id": buyer_range[1],
+        "seconds": time.perf_counter() - started,
+        "pid": os.getpid(),
+    }
+
+
+def generate_inventory_alerts_partitioned(db: Session, partitions: Optional[int] = None,
+                                          workers: Optional[int] = None, max_attempts: int = 2,
+                                          database_url: Optional[str] = None) -> dict:
+    """
+    Evaluate every buyer's low-stock and harvest alerts in parallel partitions
+
+    Partitions that fail in the pool (including a crashed worker) are retried
+    in this process, up to max_attempts runs each.
+
+    Args:
+        db: Session used to plan the partitions and for retries
+        partitions: Number of buyer ranges (default ALERT_PARTITIONS)
+        workers: Pool size (default ALERT_PARTITION_WORKERS, or one per CPU)
+        database_url: Database the workers connect to (default: db's)
+
+    Returns:
+        dict: Summed counts as generate_inventory_alerts() returns them, plus
+        "partitions": per-partition counts, buyer range, seconds and attempts
+    """
+    ranges = buyer_partitions(db, partitions or settings.ALERT_PARTITIONS)
+    db.rollback()  # don't hold a read transaction open while the workers write
+    if not ranges:
+        return {"alerts_created": 0, "alerts_updated": 0, "total_processed": 0, "partitions": []}
+
+    workers = min(workers or settings.ALERT_PARTITION_WORKERS or os.cpu_count() or 1, len(ranges))
+    bind = db.get_bind()
+    database_url = database_url or bind.url.render_as_string(hide_password=False)
+
+    results = {}
+    failed = []
+    # spawn, not fork: the parent runs scheduler and server threads whose
+    # locks a forked child could inherit mid-acquire
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(database_url,)) as pool:
+        futures = {pool.submit(evaluate_partition, index, buyer_range): (index, buyer_range)
+                   for index, buyer_range in enumerate(ranges)}
+        for future in as_completed(futures):
+            index, buyer_range = futures[future]
+            try:
+                results[index] = {**future.result(), "attempts": 1}
+            except Exception as e:
+                logger.warning(f"Alert partition {index} (buyers {buyer_range[0]}-{buyer_range[1]}) failed: {e}")
+                failed.append((index, buyer_range))
+
+    retry_sessions = sessionmaker(bind=bind, autocommit=False, autoflush=False)
+    still_failing = []
+    for index, buyer_range in sorted(failed):
+        for attempt in range(2, max_attempts + 1):
+            try:
+                results[index] = {**evaluate_partition(index, buyer_range, retry_sessions), "attempts": attempt}
+                break
+            except Exception as e:
+                logger.warning(f"Alert partition {index} retry {attempt} failed: {e}")
+        else:
+            still_failing.append(index)
+    if still_failing:
+        raise RuntimeError(f"Alert partitions {still_failing} failed after {max_attempts} attempts")
+
+    partition_results = [results[index] for index in sorted(results)]
+    for result in partition_results:
+        logger.info(
+            f"Alert partition {result['partition']} (buyers {result['first_buyer_id']}-{result['last_buyer_id']}): "
+            f"{result['total_processed']} preferences in {result['seconds']:.2f}s, "
+            f"{result['alerts_created']} created, {result['alerts_updated']} updated"
+        )
+    return {
+        "alerts_created": sum(r["alerts_created"] for r in partition_results),
+        "alerts_updated": sum(r["alerts_updated"] for r in partition_results),
+        "total_processed": sum(r["total_processed"] for r in partition_results),
+        "partitions": partition_results,
+    }
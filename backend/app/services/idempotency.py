@@ -0,0 +1,204 @@
+"""
+Idempotency-Key support for endpoints that create records
+
+Mobile clients retry POSTs whose response they never saw. When a request
+carries an Idempotency-Key header, the first request with that key claims
+it in idempotency_keys (unique per endpoint scope and caller) and its
+response is stored there; later requests with the same key get that
+response back without running the endpoint again, until the key expires
+after IDEMPOTENCY_TTL_HOURS. Keys live in the database, so a retry that
+lands on another worker process is still recognised.
+
+A duplicate that arrives while the first request is still running gets
+409 (retry shortly). A key reused with a different body gets 422. If the
+first request fails, its claim is released so a retry runs again. A claim
+left by a crashed process is taken over after
+IDEMPOTENCY_LOCK_TIMEOUT_SECONDS.
+
+Anonymous callers can't be told apart, so their keys are also scoped to
+the request body: two clients that happen to pick the same key only share
+it if they send the same request.
+"""
+import hashlib
+import json
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Iterator, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.idempotency import IdempotencyKey, IdempotencyStatus
+
+logger = logging.getLogger(__name__)
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+def request_hash(payload: Any) -> str:
+    return hashlib.sha256(
+        json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
+
+
+class IdempotentRequest:
+    """
+    One request's use of an Idempotency-Key
+
+    After begin(), either `replay` holds the stored response to return, or
+    the key is claimed and the endpoint runs and calls complete() with its
+    response. Key rows are written on their own sessions, so the claim is
+    visible to duplicates before the endpoint's own transaction commits.
+    """
+
+    def __init__(self, db: Session, scope: str, key: Optional[str], payload: Any, owner: Optional[str]):
+        self.bind = db.get_bind()
+        self.scope = scope
+        self.key = key
+        self.request_hash = request_hash(payload) if key else None
+        if owner is None and key:
+            owner = f"anon:{self.request_hash[:32]}"
+        self.owner = owner
+        self.replay: Optional[JSONResponse] = None
+        self.claimed = False
+        self.completed = False
+        self._locked_at: Optional[datetime] = None
+
+    def _match(self):
+        return and_(IdempotencyKey.scope == self.scope, IdempotencyKey.owner == self.owner,
+                    IdempotencyKey.key == self.key)
+
+    def begin(self):
+        if not self.key:
+            return
+        now = datetime.utcnow()
+        claim = {
+            "request_hash": self.request_hash,
+            "status": IdempotencyStatus.IN_PROGRESS,
+            "locked_at": now,
+            "expires_at": now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+        }
+        with Session(self.bind) as db:
+            try:
+                db.execute(insert(IdempotencyKey).values(scope=self.scope, owner=self.owner, key=self.key, **claim))
+                db.commit()
+                self.claimed, self._locked_at = True, now
+                return
+            except IntegrityError:
+                db.rollback()
+
+            # Taken: reclaim it if it expired or its request was abandoned
+            stale_before = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS)
+            reclaimed = db.execute(
+                update(IdempotencyKey)
+                .where(self._match(), or_(
+                    IdempotencyKey.expires_at <= now,
+                    and_(IdempotencyKey.status == IdempotencyStatus.IN_PROGRESS,
+                         IdempotencyKey.locked_at <= stale_before),
+                ))
+                .values(response_status=None, response_body=None, **claim)
+            ).rowcount
+            db.commit()
+            if reclaimed:
+                self.claimed, self._locked_at = True, now
+                return
+
+            row = db.execute(
+                select(IdempotencyKey.request_hash, IdempotencyKey.status,
+                       IdempotencyKey.response_status, IdempotencyKey.response_body)
+                .where(self._match())
+            ).first()
+
+        if row is None:
+            # Released by a failed first attempt in the meantime
+            raise HTTPException(status_code=409, detail="Request with this Idempotency-Key just failed; retry it",
+                                headers={"Retry-After": "1"})
+        if row.request_hash != self.request_hash:
+            raise HTTPException(status_code=422,
+                                detail="Idempotency-Key was already used with a different request")
+        if row.status == IdempotencyStatus.IN_PROGRESS:
+            raise HTTPException(status_code=409, detail="Request with this Idempotency-Key is still in progress",
+                                headers={"Retry-After": "1"})
+        logger.debug(f"Replaying {self.scope} response for Idempotency-Key {self.key}")
+        self.replay = JSONResponse(content=json.loads(row.response_body), status_code=row.response_status,
+                                   headers={REPLAY_HEADER: "true"})
+
+    def _store(self, status_code: int, body_json: str):
+        with Session(self.bind) as db:
+            db.execute(
+                update(IdempotencyKey)
+                .where(self._match(), IdempotencyKey.locked_at == self._locked_at)
+                .values(status=IdempotencyStatus.COMPLETED, response_status=status_code, response_body=body_json)
+            )
+            db.commit()
+
+    def complete(self, body: Any, status_code: int = 200):
+        """Store the response that duplicates of this request will get
+
+        Called once the endpoint's work is committed, so the claim is never
+        released from here on: if the response can't be stored, a minimal
+        one is stored instead, and if that fails too the claim is left in
+        progress until it goes stale.
+        """
+        if not self.claimed:
+            return
+        self.completed = True
+        try:
+            self._store(status_code, json.dumps(jsonable_encoder(body)))
+            return
+        except Exception as e:
+            logger.error(f"Could not store {self.scope} response for Idempotency-Key {self.key}: {e}")
+        try:
+            self._store(status_code, json.dumps({"detail": "Request was already processed"}))
+        except Exception as e:
+            logger.error(f"Could not complete {self.scope} Idempotency-Key {self.key}: {e}")
+
+    def release(self):
+        """Drop the claim so a retry runs the request again (the endpoint failed)"""
+        if not self.claimed or self.completed:
+            return
+        with Session(self.bind) as db:
+            db.execute(delete(IdempotencyKey).where(
+                self._match(), IdempotencyKey.locked_at == self._locked_at,
+                IdempotencyKey.status == IdempotencyStatus.IN_PROGRESS,
+            ))
+            db.commit()
+        self.claimed = False
+
+
+@contextmanager
+def idempotency(db: Session, scope: str, key: Optional[str], payload: Any,
+                owner: Optional[str]) -> Iterator[IdempotentRequest]:
+    """
+    Run an endpoint body at most once per Idempotency-Key
+
+        with idempotency(db, "orders.submit", idempotency_key, order, owner) as request:
+            if request.replay is not None:
+                return request.replay
+            ...
+            request.complete(response)
+            return response
+
+    owner identifies the caller (e.g. "user:42"); None for anonymous
+    requests. Without a key the body simply runs. If it raises before
+    complete(), or returns without calling it, the key is released.
+    """
+    request = IdempotentRequest(db, scope, key, payload, owner)
+    request.begin()
+    try:
+        yield request
+    finally:
+        request.release()
+
+
+def expire_idempotency_keys(db: Session) -> int:
+    """Delete keys past their TTL; returns how many"""
+    deleted = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow())).rowcount
+    db.commit()
+    return deleted
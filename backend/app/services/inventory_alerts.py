@@ -1,18 +1,24 @@
 """
 Service for generating inventory alerts based on buyer preferences and stock levels
 """
+from collections import defaultdict
 from datetime import datetime, timedelta
+from itertools import chain
+from typing import Iterable, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_, event, func, insert, inspect, select, update
 import json
 
+from ..core.config import settings
 from ..models.buyer_inventory import (
+    AlertDirtyCrop,
     BuyerInventoryPreference,
     InventoryAlert,
     AlertSeverity,
     AlertStatus
 )
 from ..models.crop import Crop
+from ..models.notification import NotificationChannel, NotificationOutbox
 from ..models.production import Lot, ProductionPlan
 from ..models.pricing import Listing
 from ..models.stock_history import StockHistory
@@ -20,19 +26,98 @@ from ..models.user import User
 from .notifications import notification_service
 
 
-def generate_inventory_alerts(db: Session, buyer_user_id: int = None):
+def _notification_channels(preference: BuyerInventoryPreference) -> dict:
+    """Parse a preference's notification_channels JSON"""
+    if not preference.notification_channels:
+        return {}
+    try:
+        return json.loads(preference.notification_channels)
+    except (TypeError, ValueError):
+        return {"in_app": True}
+
+
+def _low_stock_severity(remaining_kg: float, threshold_kg: float) -> AlertSeverity:
+    if remaining_kg <= 0:
+        return AlertSeverity.CRITICAL
+    if remaining_kg < threshold_kg * 0.5:
+        return AlertSeverity.HIGH
+    if remaining_kg < threshold_kg * 0.75:
+        return AlertSeverity.MEDIUM
+    return AlertSeverity.LOW
+
+
+def _stock_levels_by_crop(db: Session, crop_ids) -> dict:
+    """crop_id -> (total_available, total_reserved, total_sold) over available lots with active listings"""
+    rows = db.query(
+        ProductionPlan.crop_id,
+        func.sum(Lot.available_kg),
+        func.sum(Lot.reserved_kg),
+        func.sum(Lot.sold_kg)
+    ).select_from(Lot).join(
+        Listing, Listing.lot_id == Lot.lot_id
+    ).join(
+        ProductionPlan, ProductionPlan.plan_id == Lot.plan_id
+    ).filter(
+        ProductionPlan.crop_id.in_(crop_ids),
+        Lot.current_status == "available",
+        Listing.is_active == True
+    ).group_by(ProductionPlan.crop_id)
+    
+    return {
+        crop_id: (available or 0.0, reserved or 0.0, sold or 0.0)
+        for crop_id, available, reserved, sold in rows
+    }
+
+
+def _queue_notifications(db: Session, notifications) -> None:
+    """Bulk insert outbox rows for (buyer_user_id, title, message, alert_data, channels) tuples
+
+    inventory_alert_messages() picks the enabled channels the user has contact details for.
+    """
+    # In-app alerts are already stored; only load users who enabled an outbound channel
+    notifications = [n for n in notifications if any(n[4].get(channel.value) for channel in NotificationChannel)]
+    if not notifications:
+        return
+    users = {
+        user.user_id: user
+        for user in db.query(User).filter(User.user_id.in_({n[0] for n in notifications}))
+    }
+    outbox_rows = []
+    for user_id, title, message, alert_data, notification_channels in notifications:
+        user = users.get(user_id)
+        if user:
+            outbox_rows.extend(notification_service.inventory_alert_messages(
+                user=user,
+                alert_title=title,
+                alert_message=message,
+                alert_data=alert_data,
+                notification_channels=notification_channels
+            ))
+    if outbox_rows:
+        db.execute(insert(NotificationOutbox), outbox_rows)
+
+
+def generate_inventory_alerts(db: Session, buyer_user_id: int = None, crop_ids: Optional[Iterable[int]] = None,
+                              buyer_range: Optional[Tuple[int, int]] = None):
     """
     Generate inventory alerts for buyers based on their preferences and current stock levels.
     
+    Stock levels, active alerts and upcoming harvests are each read with one
+    query for all preferences; new alerts are bulk inserted and existing
+    low-stock alerts bulk updated, so the query count doesn't grow with the
+    number of preferences.
+    
     Args:
         db: Database session
         buyer_user_id: Optional specific buyer ID. If None, processes all buyers.
+        crop_ids: Optional crops to limit evaluation to. If None, processes all crops.
+        buyer_range: Optional inclusive (first, last) buyer_user_id range, for
+            evaluating one partition of the buyers (services/alert_partitions.py)
     
     Returns:
         dict: Summary of alerts generated
     """
-    alerts_created = 0
-    alerts_updated = 0
+    now = datetime.utcnow()
     
     # Get all active preferences
     query = db.query(BuyerInventoryPreference).filter(
@@ -41,238 +126,379 @@ def generate_inventory_alerts(db: Session, buyer_user_id: int = None):
     
     if buyer_user_id:
         query = query.filter(BuyerInventoryPreference.buyer_user_id == buyer_user_id)
+    if crop_ids is not None:
+        query = query.filter(BuyerInventoryPreference.crop_id.in_(list(crop_ids)))
+    if buyer_range is not None:
+        query = query.filter(BuyerInventoryPreference.buyer_user_id.between(*buyer_range))
     
-    preferences = query.all()
+    # A fixed order keeps reruns (and retried partitions) deterministic
+    preferences = query.order_by(BuyerInventoryPreference.preference_id).all()
+    if not preferences:
+        return {"alerts_created": 0, "alerts_updated": 0, "total_processed": 0}
+    
+    crop_ids = {preference.crop_id for preference in preferences}
+    crops = {crop.crop_id: crop for crop in db.query(Crop).filter(Crop.crop_id.in_(crop_ids))}
+    stock_levels = _stock_levels_by_crop(db, crop_ids)
+    
+    # Active alerts this job maintains, keyed by (buyer, crop)
+    alert_query = db.query(
+        InventoryAlert.alert_id,
+        InventoryAlert.buyer_user_id,
+        InventoryAlert.crop_id,
+        InventoryAlert.alert_type,
+        InventoryAlert.lot_id
+    ).filter(
+        InventoryAlert.crop_id.in_(crop_ids),
+        InventoryAlert.alert_type.in_(["low_stock", "harvest_window"]),
+        InventoryAlert.status == AlertStatus.ACTIVE
+    )
+    if buyer_user_id:
+        alert_query = alert_query.filter(InventoryAlert.buyer_user_id == buyer_user_id)
+    if buyer_range is not None:
+        alert_query = alert_query.filter(InventoryAlert.buyer_user_id.between(*buyer_range))
+    
+    low_stock_alert_ids = {}
+    harvest_alert_keys = set()
+    for alert in alert_query.order_by(InventoryAlert.alert_id):
+        key = (alert.buyer_user_id, alert.crop_id)
+        if alert.alert_type == "low_stock":
+            low_stock_alert_ids.setdefault(key, alert.alert_id)
+        elif alert.lot_id is None:  # General harvest alert
+            harvest_alert_keys.add(key)
+    
+    # Upcoming harvests per crop, out to the widest window any preference uses
+    harvests_by_crop = defaultdict(list)
+    harvest_preferences = [p for p in preferences if p.enable_harvest_alerts]
+    if harvest_preferences:
+        horizon = now + timedelta(days=max(p.days_after_harvest_alert or 0 for p in harvest_preferences))
+        harvests = db.query(
+            ProductionPlan.crop_id,
+            ProductionPlan.expected_harvest_window_start,
+            ProductionPlan.expected_yield_kg
+        ).filter(
+            ProductionPlan.crop_id.in_({p.crop_id for p in harvest_preferences}),
+            ProductionPlan.status.in_(["growing", "harvest_ready", "harvesting"]),
+            ProductionPlan.expected_harvest_window_start != None,
+            ProductionPlan.expected_harvest_window_start >= now,
+            ProductionPlan.expected_harvest_window_start <= horizon
+        ).order_by(ProductionPlan.expected_harvest_window_start)
+        for harvest in harvests:
+            harvests_by_crop[harvest.crop_id].append(harvest)
+    
+    new_alerts = []
+    alert_updates = []
+    notifications = []
     
     for preference in preferences:
-        crop = preference.crop
+        crop = crops.get(preference.crop_id)
         if not crop:
             continue
+        key = (preference.buyer_user_id, crop.crop_id)
         
-        # Get current stock levels for this crop
-        stock_query = db.query(
-            func.sum(Lot.available_kg).label('total_available'),
-            func.sum(Lot.reserved_kg).label('total_reserved'),
-            func.sum(Lot.sold_kg).label('total_sold')
-        ).join(
-            Listing, Listing.lot_id == Lot.lot_id
-        ).join(
-            ProductionPlan, ProductionPlan.plan_id == Lot.plan_id
-        ).filter(
-            ProductionPlan.crop_id == crop.crop_id,
-            Lot.current_status == "available",
-            Listing.is_active == True
-        )
-        
-        stock_data = stock_query.first()
-        
-        total_available = stock_data.total_available or 0.0
-        total_reserved = stock_data.total_reserved or 0.0
-        total_sold = stock_data.total_sold or 0.0
+        total_available, total_reserved, total_sold = stock_levels.get(crop.crop_id, (0.0, 0.0, 0.0))
         remaining_kg = total_available - total_reserved - total_sold
         
         # Check for low stock alert
-        if preference.enable_low_stock_alerts and preference.min_stock_threshold_kg:
-            if remaining_kg < preference.min_stock_threshold_kg:
-                # Determine severity
-                if remaining_kg <= 0:
-                    severity = AlertSeverity.CRITICAL
-                elif remaining_kg < preference.min_stock_threshold_kg * 0.5:
-                    severity = AlertSeverity.HIGH
-                elif remaining_kg < preference.min_stock_threshold_kg * 0.75:
-                    severity = AlertSeverity.MEDIUM
-                else:
-                    severity = AlertSeverity.LOW
-                
-                # Check if alert already exists
-                existing_alert = db.query(InventoryAlert).filter(
-                    InventoryAlert.buyer_user_id == preference.buyer_user_id,
-                    InventoryAlert.crop_id == crop.crop_id,
-                    InventoryAlert.alert_type == "low_stock",
-                    InventoryAlert.status == AlertStatus.ACTIVE
-                ).first()
-                
-                alert_data = {
-                    "current_stock_kg": remaining_kg,
-                    "threshold_kg": preference.min_stock_threshold_kg,
-                    "total_available_kg": total_available,
-                    "reserved_kg": total_reserved,
-                    "sold_kg": total_sold,
-                }
-                
-                # Get notification channels preference
-                notification_channels = {}
-                if preference.notification_channels:
-                    try:
-                        notification_channels = json.loads(preference.notification_channels)
-                    except:
-                        notification_channels = {"in_app": True}
+        threshold = preference.min_stock_threshold_kg
+        if preference.enable_low_stock_alerts and threshold and remaining_kg < threshold:
+            severity = _low_stock_severity(remaining_kg, threshold)
+            message = f"Stock for {crop.name} is below your threshold of {threshold}kg. Current stock: {remaining_kg:.1f}kg."
+            alert_data = {
+                "current_stock_kg": remaining_kg,
+                "threshold_kg": threshold,
+                "total_available_kg": total_available,
+                "reserved_kg": total_reserved,
+                "sold_kg": total_sold,
+            }
+            
+            if key in low_stock_alert_ids:
+                alert_updates.append({
+                    "alert_id": low_stock_alert_ids[key],
+                    "severity": severity,
+                    "message": message,
+                    "alert_data": json.dumps(alert_data),
+                    "updated_at": now,
+                })
+            else:
+                title = f"Low Stock Alert: {crop.name}"
+                new_alerts.append({
+                    "buyer_user_id": preference.buyer_user_id,
+                    "crop_id": crop.crop_id,
+                    "alert_type": "low_stock",
+                    "severity": severity,
+                    "status": AlertStatus.ACTIVE,
+                    "title": title,
+                    "message": message,
+                    "alert_data": json.dumps(alert_data),
+                    "action_url": f"/crops?crop={crop.crop_id}",
+                    "action_text": "View Listings",
+                    "expires_at": now + timedelta(days=7),  # Auto-expire after 7 days
+                })
+                # A duplicate preference updates this alert instead of adding another
+                low_stock_alert_ids[key] = None
                 
-                if existing_alert:
-                    # Update existing alert
-                    existing_alert.severity = severity
-                    existing_alert.message = f"Stock for {crop.name} is below your threshold of {preference.min_stock_threshold_kg}kg. Current stock: {remaining_kg:.1f}kg."
-                    existing_alert.alert_data = json.dumps(alert_data)
-                    existing_alert.updated_at = datetime.utcnow()
-                    alerts_updated += 1
-                else:
-                    # Create new alert
-                    alert = InventoryAlert(
-                        buyer_user_id=preference.buyer_user_id,
-                        crop_id=crop.crop_id,
-                        alert_type="low_stock",
-                        severity=severity,
-                        status=AlertStatus.ACTIVE,
-                        title=f"Low Stock Alert: {crop.name}",
-                        message=f"Stock for {crop.name} is below your threshold of {preference.min_stock_threshold_kg}kg. Current stock: {remaining_kg:.1f}kg.",
-                        alert_data=json.dumps(alert_data),
-                        action_url=f"/crops?crop={crop.crop_id}",
-                        action_text="View Listings",
-                        expires_at=datetime.utcnow() + timedelta(days=7)  # Auto-expire after 7 days
-                    )
-                    db.add(alert)
-                    alerts_created += 1
-                    
-                    # Send notifications if enabled
-                    user = db.query(User).filter(User.user_id == preference.buyer_user_id).first()
-                    if user and (notification_channels.get("email") or notification_channels.get("sms")):
-                        notification_service.send_inventory_alert(
-                            user=user,
-                            alert_title=alert.title,
-                            alert_message=alert.message,
-                            alert_data=alert_data,
-                            notification_channels=notification_channels
-                        )
+                # Queued on whichever channels the buyer enabled
+                notifications.append((preference.buyer_user_id, title, message, alert_data,
+                                      _notification_channels(preference)))
         
-        # Check for harvest window alerts
-        if preference.enable_harvest_alerts:
-            # Find upcoming harvests
-            now = datetime.utcnow()
-            harvest_start = now + timedelta(days=preference.days_before_harvest_alert)
-            harvest_end = now + timedelta(days=preference.days_after_harvest_alert)
-            
-            upcoming_harvests = db.query(ProductionPlan).filter(
-                ProductionPlan.crop_id == crop.crop_id,
-                ProductionPlan.status.in_(["growing", "harvest_ready", "harvesting"]),
-                ProductionPlan.expected_harvest_window_start != None,
-                ProductionPlan.expected_harvest_window_start >= now,
-                ProductionPlan.expected_harvest_window_start <= harvest_end
-            ).all()
-            
-            for harvest in upcoming_harvests:
+        # Check for harvest window alerts (one general alert per buyer and crop)
+        if preference.enable_harvest_alerts and key not in harvest_alert_keys:
+            harvest_end = now + timedelta(days=preference.days_after_harvest_alert or 0)
+            for harvest in harvests_by_crop[crop.crop_id]:
+                if harvest.expected_harvest_window_start > harvest_end:
+                    break
                 days_until = (harvest.expected_harvest_window_start - now).days
+                if days_until > preference.days_before_harvest_alert:
+                    continue
                 
-                # Check if alert already exists for this harvest
-                existing_alert = db.query(InventoryAlert).filter(
-                    InventoryAlert.buyer_user_id == preference.buyer_user_id,
-                    InventoryAlert.crop_id == crop.crop_id,
-                    InventoryAlert.alert_type == "harvest_window",
-                    InventoryAlert.status == AlertStatus.ACTIVE,
-                    InventoryAlert.lot_id == None  # General harvest alert
-                ).first()
-                
-                if not existing_alert and days_until <= preference.days_before_harvest_alert:
-                    alert_data = {
-                        "harvest_date": harvest.expected_harvest_window_start.isoformat(),
-                        "days_until_harvest": days_until,
-                        "expected_yield_kg": harvest.expected_yield_kg,
-                    }
-                    
-                    alert = InventoryAlert(
-                        buyer_user_id=preference.buyer_user_id,
-                        crop_id=crop.crop_id,
-                        alert_type="harvest_window",
-                        severity=AlertSeverity.MEDIUM if days_until <= 3 else AlertSeverity.LOW,
-                        status=AlertStatus.ACTIVE,
-                        title=f"Upcoming Harvest: {crop.name}",
-                        message=f"{crop.name} harvest window starts in {days_until} days. Expected yield: {harvest.expected_yield_kg or 'N/A'}kg.",
-                        alert_data=json.dumps(alert_data),
-                        action_url=f"/crops?crop={crop.crop_id}",
-                        action_text="View Listings",
-                        expires_at=harvest.expected_harvest_window_start + timedelta(days=7)
-                    )
-                    db.add(alert)
-                    alerts_created += 1
+                alert_data = {
+                    "harvest_date": harvest.expected_harvest_window_start.isoformat(),
+                    "days_until_harvest": days_until,
+                    "expected_yield_kg": harvest.expected_yield_kg,
+                }
+                new_alerts.append({
+                    "buyer_user_id": preference.buyer_user_id,
+                    "crop_id": crop.crop_id,
+                    "alert_type": "harvest_window",
+                    "severity": AlertSeverity.MEDIUM if days_until <= 3 else AlertSeverity.LOW,
+                    "status": AlertStatus.ACTIVE,
+                    "title": f"Upcoming Harvest: {crop.name}",
+                    "message": f"{crop.name} harvest window starts in {days_until} days. Expected yield: {harvest.expected_yield_kg or 'N/A'}kg.",
+                    "alert_data": json.dumps(alert_data),
+                    "action_url": f"/crops?crop={crop.crop_id}",
+                    "action_text": "View Listings",
+                    "expires_at": harvest.expected_harvest_window_start + timedelta(days=7),
+                })
+                harvest_alert_keys.add(key)
+                break
+    
+    # Duplicate preferences can queue several updates for one alert, or one for
+    # an alert inserted above (alert_id None); keep the last real one
+    alert_updates = list({row["alert_id"]: row for row in alert_updates if row["alert_id"]}.values())
+    if new_alerts:
+        db.execute(insert(InventoryAlert), new_alerts)
+    if alert_updates:
+        db.execute(update(InventoryAlert), alert_updates)
     
+    # Queue email/SMS in the outbox so they commit (or roll back) with the
+    # alerts; the dispatcher job sends them outside this transaction
+    _queue_notifications(db, notifications)
     db.commit()
     
     return {
-        "alerts_created": alerts_created,
-        "alerts_updated": alerts_updated,
+        "alerts_created": len(new_alerts),
+        "alerts_updated": len(alert_updates),
         "total_processed": len(preferences)
     }
 
 
+# ============= Dirty crop tracking =============
+
+# Columns whose changes can move a crop's stock totals or its harvest alerts
+_ALERT_INPUT_COLUMNS = {
+    Lot: ("available_kg", "reserved_kg", "sold_kg", "current_status", "plan_id"),
+    Listing: ("is_active", "lot_id"),
+    ProductionPlan: ("crop_id", "status", "expected_harvest_window_start", "expected_yield_kg"),
+}
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_dirty_crops(session, flush_context):
+    """Record the crops of changed lots, listings and plans in alert_dirty_crops.
+
+    Runs inside the flushing transaction, so the marks commit or roll back
+    with the change itself. Core UPDATE/INSERT statements bypass this hook;
+    the nightly full scan covers those.
+    """
+    crop_ids, plan_ids, lot_ids = set(), set(), set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        columns = _ALERT_INPUT_COLUMNS.get(type(obj))
+        if columns is None:
+            continue
+        state = inspect(obj)
+        if obj in session.dirty and not any(state.attrs[column].history.has_changes() for column in columns):
+            continue
+        if isinstance(obj, ProductionPlan):
+            crop_ids.add(obj.crop_id)
+            crop_ids.update(state.attrs.crop_id.history.deleted or ())  # moved to another crop
+        elif isinstance(obj, Lot):
+            plan_ids.add(obj.plan_id)
+            plan_ids.update(state.attrs.plan_id.history.deleted or ())  # moved to another plan
+        else:
+            lot_ids.add(obj.lot_id)
+            lot_ids.update(state.attrs.lot_id.history.deleted or ())  # moved to another lot
+    
+    crop_ids.discard(None)
+    plan_ids.discard(None)
+    lot_ids.discard(None)
+    if not (crop_ids or plan_ids or lot_ids):
+        return
+    
+    conn = session.connection()
+    if crop_ids:
+        conn.execute(insert(AlertDirtyCrop), [{"crop_id": crop_id} for crop_id in crop_ids])
+    if plan_ids:
+        conn.execute(insert(AlertDirtyCrop).from_select(
+            ["crop_id"],
+            select(ProductionPlan.crop_id).where(ProductionPlan.plan_id.in_(plan_ids))
+        ))
+    if lot_ids:
+        conn.execute(insert(AlertDirtyCrop).from_select(
+            ["crop_id"],
+            select(ProductionPlan.crop_id).join(Lot, Lot.plan_id == ProductionPlan.plan_id)
+            .where(Lot.lot_id.in_(lot_ids))
+        ))
+
+
+def process_dirty_crops(db: Session, batch_size: int = 50) -> int:
+    """
+    Re-evaluate low-stock and harvest alerts for crops marked dirty since the last run
+    
+    Works through the oldest marks first, batch_size crops per transaction,
+    until none are left.
+    
+    Returns:
+        Number of crops re-evaluated
+    """
+    processed = 0
+    while True:
+        crop_ids = [
+            crop_id for (crop_id,) in db.query(AlertDirtyCrop.crop_id)
+            .group_by(AlertDirtyCrop.crop_id)
+            .order_by(func.min(AlertDirtyCrop.id))
+            .limit(batch_size)
+        ]
+        if not crop_ids:
+            return processed
+        
+        # Every mark this DELETE sees was committed before the evaluation
+        # below starts reading, so its change is included; marks committed
+        # later survive for the next batch
+        db.query(AlertDirtyCrop).filter(
+            AlertDirtyCrop.crop_id.in_(crop_ids)
+        ).delete(synchronize_session=False)
+        generate_inventory_alerts(db, crop_ids=crop_ids)
+        db.commit()
+        processed += len(crop_ids)
+
+
 def record_stock_history(db: Session, crop_id: int = None):
     """
     Record current stock levels as historical snapshot
     
+    One grouped query computes every active crop's totals and prices, and
+    the snapshot rows go in with a single bulk insert.
+    
     Args:
         db: Database session
         crop_id: Optional specific crop ID. If None, records for all crops.
-    """
-    from ..models.crop import Crop
     
-    query = db.query(Crop).filter(Crop.is_active == True)
+    Returns:
+        Number of history rows recorded
+    """
+    total_available = func.sum(Lot.available_kg)
+    query = db.query(
+        ProductionPlan.crop_id,
+        total_available.label('total_available'),
+        func.sum(Lot.reserved_kg).label('total_reserved'),
+        func.sum(Lot.sold_kg).label('total_sold'),
+        func.count(Listing.listing_id).label('listings_count'),
+        func.avg(Listing.sell_price_per_kg).label('avg_price'),
+        func.min(Listing.sell_price_per_kg).label('min_price'),
+        func.max(Listing.sell_price_per_kg).label('max_price')
+    ).select_from(Lot).join(
+        Listing, Listing.lot_id == Lot.lot_id
+    ).join(
+        ProductionPlan, ProductionPlan.plan_id == Lot.plan_id
+    ).join(
+        Crop, Crop.crop_id == ProductionPlan.crop_id
+    ).filter(
+        Crop.is_active == True,
+        Lot.current_status == "available",
+        Listing.is_active == True
+    )
     if crop_id:
-        query = query.filter(Crop.crop_id == crop_id)
-    
-    crops = query.all()
-    
-    for crop in crops:
-        # Get current stock levels
-        stock_query = db.query(
-            func.sum(Lot.available_kg).label('total_available'),
-            func.sum(Lot.reserved_kg).label('total_reserved'),
-            func.sum(Lot.sold_kg).label('total_sold'),
-            func.count(Listing.listing_id).label('listings_count'),
-            func.avg(Listing.sell_price_per_kg).label('avg_price'),
-            func.min(Listing.sell_price_per_kg).label('min_price'),
-            func.max(Listing.sell_price_per_kg).label('max_price')
-        ).join(
-            Listing, Listing.lot_id == Lot.lot_id
-        ).join(
-            ProductionPlan, ProductionPlan.plan_id == Lot.plan_id
-        ).filter(
-            ProductionPlan.crop_id == crop.crop_id,
-            Lot.current_status == "available",
-            Listing.is_active == True
-        )
-        
-        stock_data = stock_query.first()
-        
-        if stock_data and stock_data.total_available:
-            total_available = stock_data.total_available or 0.0
-            total_reserved = stock_data.total_reserved or 0.0
-            total_sold = stock_data.total_sold or 0.0
-            remaining_kg = total_available - total_reserved - total_sold
-            
-            # Create history record
-            history = StockHistory(
-                crop_id=crop.crop_id,
-                total_available_kg=total_available,
-                total_reserved_kg=total_reserved,
-                total_sold_kg=total_sold,
-                remaining_kg=remaining_kg,
-                avg_price_per_kg=stock_data.avg_price,
-                min_price_per_kg=stock_data.min_price,
-                max_price_per_kg=stock_data.max_price,
-                active_listings_count=stock_data.listings_count or 0
-            )
-            db.add(history)
+        query = query.filter(ProductionPlan.crop_id == crop_id)
+    
+    # Crops with no stock on offer get no snapshot
+    rows = query.group_by(ProductionPlan.crop_id).having(total_available != 0).all()
+    
+    snapshots = []
+    for row in rows:
+        total_reserved = row.total_reserved or 0.0
+        total_sold = row.total_sold or 0.0
+        snapshots.append({
+            "crop_id": row.crop_id,
+            "total_available_kg": row.total_available,
+            "total_reserved_kg": total_reserved,
+            "total_sold_kg": total_sold,
+            "remaining_kg": row.total_available - total_reserved - total_sold,
+            "avg_price_per_kg": row.avg_price,
+            "min_price_per_kg": row.min_price,
+            "max_price_per_kg": row.max_price,
+            "active_listings_count": row.listings_count or 0,
+        })
+    if snapshots:
+        db.execute(insert(StockHistory), snapshots)
     
     db.commit()
+    return len(snapshots)
+
+
+def _current_prices_by_crop(db: Session, crop_ids) -> dict:
+    """Average active listing price per crop, in one grouped query"""
+    rows = db.query(
+        ProductionPlan.crop_id,
+        func.avg(Listing.sell_price_per_kg)
+    ).select_from(Listing).join(
+        Lot, Lot.lot_id == Listing.lot_id
+    ).join(
+        ProductionPlan, ProductionPlan.plan_id == Lot.plan_id
+    ).filter(
+        ProductionPlan.crop_id.in_(crop_ids),
+        Listing.is_active == True
+    ).group_by(ProductionPlan.crop_id)
+    return {crop_id: avg_price for crop_id, avg_price in rows}
+
+
+def _previous_prices_by_crop(db: Session, crop_ids, after: datetime, until: datetime) -> dict:
+    """Each crop's latest snapshot price in (after, until], via ROW_NUMBER() per crop"""
+    ranked = select(
+        StockHistory.crop_id,
+        StockHistory.avg_price_per_kg,
+        func.row_number().over(
+            partition_by=StockHistory.crop_id,
+            order_by=(StockHistory.recorded_at.desc(), StockHistory.history_id.desc())
+        ).label("rank")
+    ).where(
+        StockHistory.crop_id.in_(crop_ids),
+        StockHistory.recorded_at > after,
+        StockHistory.recorded_at <= until
+    ).subquery()
+    rows = db.execute(select(ranked.c.crop_id, ranked.c.avg_price_per_kg).where(ranked.c.rank == 1))
+    return {crop_id: avg_price for crop_id, avg_price in rows}
 
 
 def check_price_alerts(db: Session, buyer_user_id: int = None):
     """
     Check for price changes and generate alerts
     
+    Current and previous prices are read once per crop, not per preference,
+    and each preference is compared against its own threshold
+    (price_change_threshold_pct, falling back to
+    settings.PRICE_ALERT_THRESHOLD_PCT). The previous price is the newest
+    snapshot at least PRICE_ALERT_LOOKBACK_HOURS old (and less than twice
+    that), so the move is measured over the same span whatever the snapshot
+    interval.
+    
     Args:
         db: Database session
         buyer_user_id: Optional specific buyer ID
+    
+    Returns:
+        Number of alerts created
     """
-    alerts_created = 0
+    now = datetime.utcnow()
     
     # Get preferences with price alerts enabled
     query = db.query(BuyerInventoryPreference).filter(
@@ -283,90 +509,77 @@ def check_price_alerts(db: Session, buyer_user_id: int = None):
         query = query.filter(BuyerInventoryPreference.buyer_user_id == buyer_user_id)
     
     preferences = query.all()
+    if not preferences:
+        return 0
+    
+    crop_ids = {preference.crop_id for preference in preferences}
+    crops = {crop.crop_id: crop for crop in db.query(Crop).filter(Crop.crop_id.in_(crop_ids))}
+    current_prices = _current_prices_by_crop(db, crop_ids)
+    lookback = timedelta(hours=settings.PRICE_ALERT_LOOKBACK_HOURS)
+    previous_prices = _previous_prices_by_crop(db, crop_ids, now - 2 * lookback, now - lookback)
+    
+    # Buyers who already have an active price alert for a crop
+    alert_query = db.query(
+        InventoryAlert.buyer_user_id,
+        InventoryAlert.crop_id
+    ).filter(
+        InventoryAlert.buyer_user_id.in_({preference.buyer_user_id for preference in preferences}),
+        InventoryAlert.crop_id.in_(crop_ids),
+        InventoryAlert.alert_type == "price_change",
+        InventoryAlert.status == AlertStatus.ACTIVE
+    )
+    alerted = {(alert.buyer_user_id, alert.crop_id) for alert in alert_query}
+    
+    new_alerts = []
+    notifications = []
     
     for preference in preferences:
-        crop = preference.crop
-        if not crop:
+        crop = crops.get(preference.crop_id)
+        key = (preference.buyer_user_id, preference.crop_id)
+        current_price = current_prices.get(preference.crop_id)
+        previous_price = previous_prices.get(preference.crop_id)
+        if not crop or not current_price or not previous_price or key in alerted:
             continue
         
-        # Get current average price
-        price_query = db.query(
-            func.avg(Listing.sell_price_per_kg).label('avg_price')
-        ).join(
-            Lot, Lot.lot_id == Listing.lot_id
-        ).join(
-            ProductionPlan, ProductionPlan.plan_id == Lot.plan_id
-        ).filter(
-            ProductionPlan.crop_id == crop.crop_id,
-            Listing.is_active == True
-        )
+        price_change_pct = ((current_price - previous_price) / previous_price) * 100
+        threshold = preference.price_change_threshold_pct or settings.PRICE_ALERT_THRESHOLD_PCT
+        if abs(price_change_pct) < threshold:
+            continue
         
-        current_price = price_query.scalar()
+        direction = "increased" if price_change_pct > 0 else "decreased"
+        alert_data = {
+            "current_price": current_price,
+            "previous_price": previous_price,
+            "price_change_pct": abs(price_change_pct),
+            "threshold_pct": threshold,
+            "direction": direction
+        }
+        title = f"Price Change Alert: {crop.name}"
+        message = f"Price for {crop.name} has {direction} by {abs(price_change_pct):.1f}%. Current: ${current_price:.2f}/kg, Previous: ${previous_price:.2f}/kg."
+        new_alerts.append({
+            "buyer_user_id": preference.buyer_user_id,
+            "crop_id": crop.crop_id,
+            "alert_type": "price_change",
+            "severity": AlertSeverity.MEDIUM,
+            "status": AlertStatus.ACTIVE,
+            "title": title,
+            "message": message,
+            "alert_data": json.dumps(alert_data),
+            "action_url": f"/crops?crop={crop.crop_id}",
+            "action_text": "View Listings",
+            "expires_at": now + timedelta(days=3),
+        })
+        # A duplicate preference doesn't raise a second alert
+        alerted.add(key)
         
-        if current_price:
-            # Get last recorded price from history (last 24 hours)
-            yesterday = datetime.utcnow() - timedelta(days=1)
-            last_history = db.query(StockHistory).filter(
-                StockHistory.crop_id == crop.crop_id,
-                StockHistory.recorded_at >= yesterday
-            ).order_by(StockHistory.recorded_at.desc()).first()
-            
-            if last_history and last_history.avg_price_per_kg:
-                price_change_pct = ((current_price - last_history.avg_price_per_kg) / last_history.avg_price_per_kg) * 100
-                
-                # Alert if price changed by more than 10%
-                if abs(price_change_pct) >= 10:
-                    # Check if alert already exists
-                    existing_alert = db.query(InventoryAlert).filter(
-                        InventoryAlert.buyer_user_id == preference.buyer_user_id,
-                        InventoryAlert.crop_id == crop.crop_id,
-                        InventoryAlert.alert_type == "price_change",
-                        InventoryAlert.status == AlertStatus.ACTIVE
-                    ).first()
-                    
-                    if not existing_alert:
-                        direction = "increased" if price_change_pct > 0 else "decreased"
-                        alert_data = {
-                            "current_price": current_price,
-                            "previous_price": last_history.avg_price_per_kg,
-                            "price_change_pct": abs(price_change_pct),
-                            "direction": direction
-                        }
-                        
-                        alert = InventoryAlert(
-                            buyer_user_id=preference.buyer_user_id,
-                            crop_id=crop.crop_id,
-                            alert_type="price_change",
-                            severity=AlertSeverity.MEDIUM,
-                            status=AlertStatus.ACTIVE,
-                            title=f"Price Change Alert: {crop.name}",
-                            message=f"Price for {crop.name} has {direction} by {abs(price_change_pct):.1f}%. Current: ${current_price:.2f}/kg, Previous: ${last_history.avg_price_per_kg:.2f}/kg.",
-                            alert_data=json.dumps(alert_data),
-                            action_url=f"/crops?crop={crop.crop_id}",
-                            action_text="View Listings",
-                            expires_at=datetime.utcnow() + timedelta(days=3)
-                        )
-                        db.add(alert)
-                        alerts_created += 1
-                        
-                        # Send notifications
-                        notification_channels = {}
-                        if preference.notification_channels:
-                            try:
-                                notification_channels = json.loads(preference.notification_channels)
-                            except:
-                                notification_channels = {"in_app": True}
-                        
-                        user = db.query(User).filter(User.user_id == preference.buyer_user_id).first()
-                        if user and (notification_channels.get("email") or notification_channels.get("sms")):
-                            notification_service.send_inventory_alert(
-                                user=user,
-                                alert_title=alert.title,
-                                alert_message=alert.message,
-                                alert_data=alert_data,
-                                notification_channels=notification_channels
-                            )
+        notifications.append((preference.buyer_user_id, title, message, alert_data,
+                              _notification_channels(preference)))
+    
+    if new_alerts:
+        db.execute(insert(InventoryAlert), new_alerts)
+    
+    # Queue notifications; delivered after commit by the dispatcher
+    _queue_notifications(db, notifications)
     
     db.commit()
-    return alerts_created
-
+    return len(new_alerts)
@@ -0,0 +1,213 @@
+"""
+Background delivery of the notification outbox
+
+dispatch_notifications() claims due rows, sends them on per-channel thread
+pools (so a slow SMTP server can't starve SMS, and no provider sees more
+than its configured concurrency) paced by per-channel token buckets (SMS and
+WhatsApp rate limits), then records the outcome: sent, retry with
+exponential backoff, or dead-lettered after NOTIFICATION_MAX_ATTEMPTS or a
+permanent error. No database connection is held while sending.
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.metrics import observe_notification
+from ..core.rate_limit import TokenBucket
+from ..models.notification import NotificationChannel, NotificationOutbox, NotificationStatus
+from .notifications import OutboundMessage, PermanentDeliveryError, Transport, get_transports
+
+logger = logging.getLogger(__name__)
+
+outbox_table = NotificationOutbox.__table__
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff before the next attempt after `attempts` failed ones"""
+    seconds = settings.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, settings.NOTIFICATION_RETRY_MAX_SECONDS))
+
+
+class NotificationDispatcher:
+    """Delivers outbox rows through the channel transports on bounded thread pools"""
+
+    def __init__(self, transports: Optional[Dict[NotificationChannel, Transport]] = None,
+                 channel_limits: Optional[Dict[NotificationChannel, int]] = None,
+                 rate_limits: Optional[Dict[NotificationChannel, TokenBucket]] = None):
+        self.transports = transports if transports is not None else get_transports()
+        limits = channel_limits or {
+            NotificationChannel.EMAIL: settings.NOTIFICATION_EMAIL_CONCURRENCY,
+            NotificationChannel.SMS: settings.NOTIFICATION_SMS_CONCURRENCY,
+            NotificationChannel.WHATSAPP: settings.NOTIFICATION_WHATSAPP_CONCURRENCY,
+        }
+        # Paces sends to the provider's rate limit, shared by the channel's workers
+        self.rate_limits = rate_limits if rate_limits is not None else {
+            NotificationChannel.SMS: TokenBucket(settings.SMS_RATE_PER_SECOND, settings.SMS_RATE_BURST),
+            NotificationChannel.WHATSAPP: TokenBucket(settings.WHATSAPP_RATE_PER_SECOND, settings.WHATSAPP_RATE_BURST),
+        }
+        self._limits = {channel: max(limit, 1) for channel, limit in limits.items()}
+        self._pools = {
+            channel: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"notify-{channel.value}")
+            for channel, limit in self._limits.items()
+        }
+
+    def claim(self, db: Session, limit: int) -> List[OutboundMessage]:
+        """Mark up to `limit` due rows as sending and commit; returns their snapshots"""
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=settings.NOTIFICATION_CLAIM_TIMEOUT_SECONDS)
+        # SKIP LOCKED lets several dispatchers share the table on Postgres;
+        # SQLite ignores it and serializes writers anyway
+        ids = db.scalars(
+            select(NotificationOutbox.notification_id).where(or_(
+                and_(NotificationOutbox.status == NotificationStatus.PENDING,
+                     NotificationOutbox.next_attempt_at <= now),
+                and_(NotificationOutbox.status == NotificationStatus.SENDING,
+                     NotificationOutbox.claimed_at < stale),
+            )).order_by(NotificationOutbox.next_attempt_at).limit(limit).with_for_update(skip_locked=True)
+        ).all()
+        if not ids:
+            db.commit()
+            return []
+
+        rows = db.scalars(select(NotificationOutbox).where(NotificationOutbox.notification_id.in_(ids))).all()
+        for row in rows:
+            row.status = NotificationStatus.SENDING
+            row.claimed_at = now
+            row.attempts = (row.attempts or 0) + 1
+        messages = [OutboundMessage.from_row(row) for row in rows]
+        db.commit()
+        return messages
+
+    def _send(self, transport: Transport, messages: List[OutboundMessage]) -> List[Optional[Exception]]:
+        bucket = self.rate_limits.get(messages[0].channel)
+        try:
+            if hasattr(transport, "send_batch"):
+                if bucket is not None:
+                    bucket.acquire(len(messages))
+                return transport.send_batch(messages)
+            errors = []
+            for message in messages:
+                try:
+                    if bucket is not None:
+                        bucket.acquire()
+                    transport.send(message)
+                    errors.append(None)
+                except Exception as e:
+                    errors.append(e)
+            return errors
+        except Exception as e:
+            return [e] * len(messages)
+
+    def send(self, messages: List[OutboundMessage]) -> List[Tuple[OutboundMessage, Optional[Exception]]]:
+        """Send on the channel pools and wait for all of them.
+
+        Transports with send_batch() (pooled SMTP) get one chunk per worker so
+        each chunk rides a single connection; others get one task per message.
+        """
+        by_channel = defaultdict(list)
+        for message in messages:
+            by_channel[message.channel].append(message)
+
+        futures, unroutable = [], []
+        for channel, batch in by_channel.items():
+            transport = self.transports.get(channel)
+            if transport is None or channel not in self._pools:
+                error = PermanentDeliveryError(f"No transport for channel {channel.value}")
+                unroutable.extend((message, error) for message in batch)
+                continue
+            if hasattr(transport, "send_batch"):
+                workers = self._limits[channel]
+                chunks = [batch[i::workers] for i in range(workers) if batch[i::workers]]
+            else:
+                chunks = [[message] for message in batch]
+            for chunk in chunks:
+                futures.append((chunk, self._pools[channel].submit(self._send, transport, chunk)))
+        return unroutable + [pair for chunk, future in futures for pair in zip(chunk, future.result())]
+
+    def record(self, db: Session, results: List[Tuple[OutboundMessage, Optional[Exception]]]) -> Dict[str, int]:
+        """Write each send's outcome back to the outbox and commit
+
+        Each update only applies while the row still carries this send's
+        claim: a send that outlived NOTIFICATION_CLAIM_TIMEOUT_SECONDS may have
+        been reclaimed by another dispatcher, whose bookkeeping wins.
+        """
+        now = datetime.utcnow()
+        counts = {"sent": 0, "retry": 0, "dead": 0}
+        updates = defaultdict(list)
+        for message, error in results:
+            attempt = message.attempt
+            claim = {"b_notification_id": message.notification_id, "b_claimed_at": message.claimed_at}
+            if error is None:
+                outcome = "sent"
+                updates[outcome].append(claim)
+            elif isinstance(error, PermanentDeliveryError) or attempt >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                outcome = "dead"
+                logger.warning(f"Notification {message.notification_id} ({message.channel.value}) "
+                               f"dead-lettered after {attempt} attempts: {error}")
+                updates[outcome].append({**claim, "b_last_error": str(error)[:1000]})
+            else:
+                outcome = "retry"
+                updates[outcome].append({**claim, "b_last_error": str(error)[:1000],
+                                         "b_next_attempt_at": now + retry_delay(attempt)})
+            counts[outcome] += 1
+            observe_notification(message.channel.value, outcome)
+
+        values = {
+            "sent": {"status": NotificationStatus.SENT, "sent_at": now, "last_error": None},
+            "dead": {"status": NotificationStatus.DEAD, "last_error": bindparam("b_last_error")},
+            "retry": {"status": NotificationStatus.PENDING, "last_error": bindparam("b_last_error"),
+                      "next_attempt_at": bindparam("b_next_attempt_at")},
+        }
+        for outcome, params in updates.items():
+            db.execute(
+                update(outbox_table)
+                .where(outbox_table.c.notification_id == bindparam("b_notification_id"),
+                       outbox_table.c.claimed_at == bindparam("b_claimed_at"))
+                .values(claimed_at=None, **values[outcome]),
+                params,
+            )
+        db.commit()
+        return counts
+
+    def dispatch(self, db: Session, batch_size: int = 100) -> Dict[str, int]:
+        """Deliver due rows in batches until none are left; returns outcome counts"""
+        totals = {"sent": 0, "retry": 0, "dead": 0}
+        while True:
+            messages = self.claim(db, batch_size)
+            if not messages:
+                break
+            counts = self.record(db, self.send(messages))
+            for outcome, count in counts.items():
+                totals[outcome] += count
+            if len(messages) < batch_size:
+                break
+        return totals
+
+    def shutdown(self):
+        for pool in self._pools.values():
+            pool.shutdown(wait=True)
+        for transport in self.transports.values():
+            if hasattr(transport, "close"):
+                transport.close()
+
+
+_dispatcher: Optional[NotificationDispatcher] = None
+
+
+def get_dispatcher() -> NotificationDispatcher:
+    """Process-wide dispatcher, so the channel pools persist between scheduler runs"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = NotificationDispatcher()
+    return _dispatcher
+
+
+def dispatch_notifications(db: Session, batch_size: Optional[int] = None) -> Dict[str, int]:
+    """Deliver every due outbox row; returns {"sent": n, "retry": n, "dead": n}"""
+    return get_dispatcher().dispatch(db, batch_size or settings.NOTIFICATION_BATCH_SIZE)
@@ -1,34 +1,404 @@
 """
 Notification service for sending emails and SMS
+
+Alert jobs don't send anything themselves: they bulk insert the rows built
+by inventory_alert_messages() into the notification_outbox table
+(inventory_alerts._queue_notifications) and the dispatcher in
+services/notification_queue.py delivers them through the transports below.
 """
 import smtplib
-import json
 import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional, Dict, List
-from twilio.rest import Client as TwilioClient
-from twilio.base.exceptions import TwilioException
+from typing import Optional, Dict, List, Protocol
 
 from ..core.config import settings
+from ..models.notification import NotificationChannel, NotificationOutbox
 from ..models.user import User
 
 logger = logging.getLogger(__name__)
 
 
+class DeliveryError(Exception):
+    """A send failed in a way that may succeed on retry"""
+
+
+class PermanentDeliveryError(DeliveryError):
+    """A send can never succeed as queued (channel not configured, recipient rejected)"""
+
+
+@dataclass(frozen=True)
+class OutboundMessage:
+    """Plain snapshot of an outbox row, safe to hand to transport threads"""
+    notification_id: Optional[int]
+    channel: NotificationChannel
+    recipient: str
+    body_text: str
+    subject: Optional[str] = None
+    body_html: Optional[str] = None
+    attempt: int = 1  # 1 for the first try
+    claimed_at: Optional[datetime] = None  # the claim this send belongs to
+
+    @classmethod
+    def from_row(cls, row: NotificationOutbox) -> "OutboundMessage":
+        return cls(row.notification_id, row.channel, row.recipient, row.body_text, row.subject, row.body_html,
+                   row.attempts, row.claimed_at)
+
+
+# ============= Transports =============
+
+class Transport(Protocol):
+    """What the dispatcher needs from a channel's transport.
+
+    send() raises DeliveryError (retry later) or PermanentDeliveryError
+    (dead-letter). Transports may also define send_batch(messages) returning
+    one error-or-None per message, to share a connection across a chunk, and
+    close() to release connections.
+    """
+
+    def send(self, message: OutboundMessage) -> None: ...
+
+
+class _SmtpConnection:
+    """A logged-in SMTP session and how much it has been used"""
+
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+
+class SmtpEmailTransport:
+    """Sends email through the configured SMTP server over pooled keep-alive connections.
+
+    Each connection pays for STARTTLS and login once and then carries up to
+    SMTP_MAX_MESSAGES_PER_CONNECTION messages. Idle connections are kept for
+    SMTP_IDLE_TIMEOUT_SECONDS; one that the server has dropped is replaced
+    and the message retried on the new connection.
+    """
+
+    def __init__(self, pool_size: Optional[int] = None, max_messages_per_connection: Optional[int] = None,
+                 idle_timeout: Optional[float] = None):
+        self.pool_size = settings.NOTIFICATION_EMAIL_CONCURRENCY if pool_size is None else pool_size
+        self.max_messages_per_connection = max_messages_per_connection or settings.SMTP_MAX_MESSAGES_PER_CONNECTION
+        self.idle_timeout = settings.SMTP_IDLE_TIMEOUT_SECONDS if idle_timeout is None else idle_timeout
+        self.connections_opened = 0
+        self._idle: List[_SmtpConnection] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> _SmtpConnection:
+        server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS)
+        try:
+            if settings.SMTP_STARTTLS:
+                server.starttls()
+            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return _SmtpConnection(server)
+
+    def _acquire(self) -> _SmtpConnection:
+        """An idle connection that hasn't timed out, or a new one"""
+        expired = []
+        connection = None
+        with self._lock:
+            now = time.monotonic()
+            while self._idle:
+                candidate = self._idle.pop()
+                if now - candidate.last_used < self.idle_timeout:
+                    connection = candidate
+                    break
+                expired.append(candidate)
+        for stale in expired:
+            stale.close()
+        return connection or self._connect()
+
+    def _release(self, connection: _SmtpConnection):
+        if connection.sent < self.max_messages_per_connection:
+            connection.last_used = time.monotonic()
+            with self._lock:
+                if len(self._idle) < self.pool_size:
+                    self._idle.append(connection)
+                    return
+        connection.close()
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    @staticmethod
+    def _mime(message: OutboundMessage) -> MIMEMultipart:
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = message.subject or ""
+        msg['From'] = settings.SMTP_FROM
+        msg['To'] = message.recipient
+        if message.body_text:
+            msg.attach(MIMEText(message.body_text, 'plain'))
+        if message.body_html:
+            msg.attach(MIMEText(message.body_html, 'html'))
+        return msg
+
+    def send_batch(self, messages: List[OutboundMessage]) -> List[Optional[Exception]]:
+        """Send messages over as few connections as possible; returns an error (or None) per message"""
+        if not settings.SMTP_HOST or not settings.SMTP_USER or not settings.SMTP_PASSWORD:
+            return [PermanentDeliveryError("SMTP settings not configured")] * len(messages)
+
+        errors: List[Optional[Exception]] = []
+        connection = None
+        for index, message in enumerate(messages):
+            # A pooled connection may have been dropped by the server while
+            # idle; that gets one retry on a fresh connection
+            for retry_on_fresh in (True, False):
+                if connection is None:
+                    try:
+                        connection = self._acquire()
+                    except (smtplib.SMTPException, OSError) as e:
+                        # Server unreachable or login refused: fail the rest without reconnecting per message
+                        errors.extend([DeliveryError(f"SMTP connect failed: {e}")] * (len(messages) - index))
+                        return errors
+                reused = connection.sent > 0
+                try:
+                    connection.server.send_message(self._mime(message))
+                except smtplib.SMTPRecipientsRefused as e:
+                    errors.append(PermanentDeliveryError(f"Recipient refused: {e}"))
+                    break
+                except smtplib.SMTPResponseException as e:
+                    # 5xx rejects this message; 4xx is a temporary refusal. Either way the session is fine
+                    errors.append((PermanentDeliveryError if e.smtp_code >= 500 else DeliveryError)(str(e)))
+                    break
+                except (smtplib.SMTPException, OSError) as e:
+                    connection.close()
+                    connection = None
+                    if retry_on_fresh and reused:
+                        continue
+                    errors.append(DeliveryError(str(e)))
+                    break
+                connection.sent += 1
+                errors.append(None)
+                if connection.sent >= self.max_messages_per_connection:
+                    connection.close()
+                    connection = None
+                break
+        if connection is not None:
+            self._release(connection)
+        return errors
+
+    def send(self, message: OutboundMessage):
+        error = self.send_batch([message])[0]
+        if error is not None:
+            raise error
+
+
+class TwilioSmsTransport:
+    """Sends SMS through Twilio"""
+
+    def __init__(self):
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """Twilio client, created on first use so importing twilio stays off the boot path"""
+        with self._client_lock:
+            if self._client is None and settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN:
+                from twilio.rest import Client as TwilioClient
+                self._client = TwilioClient(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+        return self._client
+
+    def send(self, message: OutboundMessage):
+        if not settings.TWILIO_PHONE_NUMBER or not self.client:
+            raise PermanentDeliveryError("Twilio not configured")
+
+        from twilio.base.exceptions import TwilioRestException, TwilioException
+
+        try:
+            message_obj = self.client.messages.create(
+                body=message.body_text,
+                from_=settings.TWILIO_PHONE_NUMBER,
+                to=message.recipient
+            )
+        except TwilioRestException as e:
+            # 4xx other than rate limiting means the request itself is bad
+            if e.status and 400 <= e.status < 500 and e.status != 429:
+                raise PermanentDeliveryError(str(e)) from e
+            raise DeliveryError(str(e)) from e
+        except TwilioException as e:
+            raise DeliveryError(str(e)) from e
+        logger.info(f"SMS sent to {message.recipient}. SID: {message_obj.sid}")
+
+
+class HttpGatewayTransport(ABC):
+    """Posts each message as JSON to an HTTP messaging API over a keep-alive client.
+
+    2xx is delivered; 429 and 5xx are retried; any other 4xx means the
+    request itself was rejected and is dead-lettered.
+    """
+
+    name = "HTTP gateway"
+
+    def __init__(self, url: Optional[str], token: Optional[str] = None):
+        self.url = url
+        self.token = token
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """httpx client, created on first use so importing httpx stays off the boot path"""
+        with self._client_lock:
+            if self._client is None:
+                import httpx
+                headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+                self._client = httpx.Client(headers=headers, timeout=settings.NOTIFICATION_HTTP_TIMEOUT_SECONDS)
+        return self._client
+
+    @abstractmethod
+    def payload(self, message: OutboundMessage) -> dict:
+        """JSON body the gateway expects for one message"""
+
+    def send(self, message: OutboundMessage):
+        if not self.url:
+            raise PermanentDeliveryError(f"{self.name} not configured")
+
+        import httpx
+
+        try:
+            response = self.client.post(self.url, json=self.payload(message))
+        except httpx.HTTPError as e:
+            raise DeliveryError(f"{self.name} request failed: {e}") from e
+        if response.status_code == 429 or response.status_code >= 500:
+            raise DeliveryError(f"{self.name} returned {response.status_code}: {response.text[:200]}")
+        if response.status_code >= 400:
+            raise PermanentDeliveryError(f"{self.name} rejected message ({response.status_code}): {response.text[:200]}")
+
+    def close(self):
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+class HttpSmsTransport(HttpGatewayTransport):
+    """SMS through a generic JSON gateway: POST {"to", "from", "body"} to SMS_GATEWAY_URL"""
+
+    name = "SMS gateway"
+
+    def __init__(self):
+        super().__init__(settings.SMS_GATEWAY_URL, settings.SMS_GATEWAY_TOKEN)
+
+    def payload(self, message: OutboundMessage) -> dict:
+        return {"to": message.recipient, "from": settings.TWILIO_PHONE_NUMBER, "body": message.body_text}
+
+
+class WhatsAppTransport(HttpGatewayTransport):
+    """Text messages through the WhatsApp Business Cloud API at WHATSAPP_API_URL"""
+
+    name = "WhatsApp API"
+
+    def __init__(self):
+        super().__init__(settings.WHATSAPP_API_URL, settings.WHATSAPP_ACCESS_TOKEN)
+
+    def payload(self, message: OutboundMessage) -> dict:
+        return {
+            "messaging_product": "whatsapp",
+            "to": message.recipient.lstrip("+"),
+            "type": "text",
+            "text": {"body": message.body_text},
+        }
+
+
+class StubTransport:
+    """Offline transport for development and tests: logs and records messages.
+
+    fail_with, when set, is raised for every send (e.g. DeliveryError("down"))
+    until it is cleared; delay simulates a slow provider.
+    """
+
+    def __init__(self, fail_with: Optional[Exception] = None, delay: float = 0.0):
+        self.sent: List[OutboundMessage] = []
+        self.fail_with = fail_with
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def send(self, message: OutboundMessage):
+        if self.delay:
+            threading.Event().wait(self.delay)
+        if self.fail_with is not None:
+            raise self.fail_with
+        with self._lock:
+            self.sent.append(message)
+        logger.info(f"[stub {message.channel.value}] to {message.recipient}: {message.subject or message.body_text}")
+
+
+_transports: Optional[Dict[NotificationChannel, "Transport"]] = None
+
+
+def get_transports() -> Dict[NotificationChannel, Transport]:
+    """Transport per channel for this process, chosen by NOTIFICATION_TRANSPORT and SMS_PROVIDER"""
+    global _transports
+    if _transports is None:
+        if settings.NOTIFICATION_TRANSPORT == "stub":
+            _transports = {channel: StubTransport() for channel in NotificationChannel}
+        else:
+            _transports = {
+                NotificationChannel.EMAIL: SmtpEmailTransport(),
+                NotificationChannel.SMS: HttpSmsTransport() if settings.SMS_PROVIDER == "http" else TwilioSmsTransport(),
+                NotificationChannel.WHATSAPP: WhatsAppTransport(),
+            }
+    return _transports
+
+
+# ============= Service =============
+
 class NotificationService:
-    """Service for sending notifications via email and SMS"""
+    """Service for sending notifications via email, SMS and WhatsApp"""
     
-    def __init__(self):
-        self.twilio_client = None
-        if settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN:
-            try:
-                self.twilio_client = TwilioClient(
-                    settings.TWILIO_ACCOUNT_SID,
-                    settings.TWILIO_AUTH_TOKEN
-                )
-            except Exception as e:
-                logger.warning(f"Failed to initialize Twilio client: {e}")
+    def send_now(self, messages: List[OutboundMessage]) -> List[Dict]:
+        """
+        Send messages immediately, bypassing the outbox
+        
+        Messages go through the dispatcher's channel pools, so they run in
+        parallel within each channel's concurrency limit and are paced by
+        its rate limit.
+        
+        Returns:
+            list: {"to", "channel", "sent", "error"} per message, in input order
+        """
+        from .notification_queue import get_dispatcher
+        
+        errors = {id(message): error for message, error in get_dispatcher().send(messages)}
+        results = []
+        for message in messages:
+            error = errors[id(message)]
+            if isinstance(error, DeliveryError):
+                logger.warning(f"{message.channel.value} to {message.recipient} not sent: {error}")
+            elif error is not None:
+                logger.error(f"Unexpected error sending {message.channel.value} to {message.recipient}: {error}")
+            results.append({"to": message.recipient, "channel": message.channel.value,
+                            "sent": error is None, "error": None if error is None else str(error)})
+        return results
+    
+    def _send_now(self, message: OutboundMessage) -> bool:
+        return self.send_now([message])[0]["sent"]
     
     def send_email(
         self,
@@ -38,7 +408,7 @@ class NotificationService:
         body_text: Optional[str] = None
     ) -> bool:
         """
-        Send email notification
+        Send an email immediately, bypassing the outbox
         
         Args:
             to_email: Recipient email address
@@ -49,44 +419,9 @@ class NotificationService:
         Returns:
             bool: True if sent successfully, False otherwise
         """
-        # For now, we'll use a simple SMTP approach
-        # In production, use a service like SendGrid, AWS SES, etc.
-        
-        # Check if email settings are configured
-        smtp_host = getattr(settings, 'SMTP_HOST', None)
-        smtp_port = getattr(settings, 'SMTP_PORT', 587)
-        smtp_user = getattr(settings, 'SMTP_USER', None)
-        smtp_password = getattr(settings, 'SMTP_PASSWORD', None)
-        smtp_from = getattr(settings, 'SMTP_FROM', 'noreply@mundamarket.co.zw')
-        
-        if not smtp_host or not smtp_user or not smtp_password:
-            logger.warning("SMTP settings not configured. Email not sent.")
-            return False
-        
-        try:
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = smtp_from
-            msg['To'] = to_email
-            
-            if body_text:
-                part1 = MIMEText(body_text, 'plain')
-                msg.attach(part1)
-            
-            part2 = MIMEText(body_html, 'html')
-            msg.attach(part2)
-            
-            with smtplib.SMTP(smtp_host, smtp_port) as server:
-                server.starttls()
-                server.login(smtp_user, smtp_password)
-                server.send_message(msg)
-            
-            logger.info(f"Email sent successfully to {to_email}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send email to {to_email}: {e}")
-            return False
+        return self._send_now(OutboundMessage(
+            None, NotificationChannel.EMAIL, to_email, body_text or "", subject, body_html
+        ))
     
     def send_sms(
         self,
@@ -94,7 +429,7 @@ class NotificationService:
         message: str
     ) -> bool:
         """
-        Send SMS notification via Twilio
+        Send an SMS immediately, bypassing the outbox
         
         Args:
             to_phone: Recipient phone number (E.164 format)
@@ -103,36 +438,35 @@ class NotificationService:
         Returns:
             bool: True if sent successfully, False otherwise
         """
-        if not self.twilio_client or not settings.TWILIO_PHONE_NUMBER:
-            logger.warning("Twilio not configured. SMS not sent.")
-            return False
+        return self._send_now(OutboundMessage(None, NotificationChannel.SMS, to_phone, message))
+    
+    def send_sms_batch(
+        self,
+        messages: List[tuple],
+        channel: NotificationChannel = NotificationChannel.SMS
+    ) -> List[Dict]:
+        """
+        Send many SMS (or WhatsApp) messages in parallel under the channel's limits
         
-        try:
-            message_obj = self.twilio_client.messages.create(
-                body=message,
-                from_=settings.TWILIO_PHONE_NUMBER,
-                to=to_phone
-            )
-            logger.info(f"SMS sent successfully to {to_phone}. SID: {message_obj.sid}")
-            return True
-            
-        except TwilioException as e:
-            logger.error(f"Failed to send SMS to {to_phone}: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"Unexpected error sending SMS to {to_phone}: {e}")
-            return False
+        Args:
+            messages: (to_phone, text) pairs
+            channel: NotificationChannel.SMS or NotificationChannel.WHATSAPP
+        
+        Returns:
+            list: {"to", "channel", "sent", "error"} per message, in input order
+        """
+        return self.send_now([OutboundMessage(None, channel, to_phone, text) for to_phone, text in messages])
     
-    def send_inventory_alert(
+    def inventory_alert_messages(
         self,
         user: User,
         alert_title: str,
         alert_message: str,
         alert_data: Optional[Dict] = None,
         notification_channels: Optional[Dict] = None
-    ) -> Dict[str, bool]:
+    ) -> List[dict]:
         """
-        Send inventory alert notification via configured channels
+        Outbox rows (as insert dicts) for an inventory alert on the user's enabled channels
         
         Args:
             user: User to notify
@@ -140,19 +474,14 @@ class NotificationService:
             alert_message: Alert message
             alert_data: Additional alert data
             notification_channels: Channel preferences (from BuyerInventoryPreference)
-        
-        Returns:
-            dict: Results for each channel {"email": True/False, "sms": True/False}
         """
-        results = {"email": False, "sms": False}
-        
         # Default to in_app only if no preferences set
         if notification_channels is None:
             notification_channels = {"in_app": True}
         
-        # Prepare message content
-        email_subject = f"Munda Market Alert: {alert_title}"
-        email_body_html = f"""
+        rows = []
+        if notification_channels.get("email", False) and user.email:
+            email_body_html = f"""
         <html>
           <body>
             <h2>{alert_title}</h2>
@@ -163,30 +492,36 @@ class NotificationService:
           </body>
         </html>
         """
+            rows.append({
+                "user_id": user.user_id,
+                "channel": NotificationChannel.EMAIL,
+                "recipient": user.email,
+                "subject": f"Munda Market Alert: {alert_title}",
+                "body_text": alert_message,
+                "body_html": email_body_html,
+            })
         
-        sms_message = f"{alert_title}: {alert_message}"
-        if alert_data and 'current_stock_kg' in alert_data:
-            sms_message += f" Stock: {alert_data['current_stock_kg']}kg"
-        
-        # Send email if enabled
-        if notification_channels.get("email", False) and user.email:
-            results["email"] = self.send_email(
-                to_email=user.email,
-                subject=email_subject,
-                body_html=email_body_html,
-                body_text=alert_message
-            )
-        
-        # Send SMS if enabled
         if notification_channels.get("sms", False) and user.phone:
-            results["sms"] = self.send_sms(
-                to_phone=user.phone,
-                message=sms_message
-            )
+            sms_message = f"{alert_title}: {alert_message}"
+            if alert_data and 'current_stock_kg' in alert_data:
+                sms_message += f" Stock: {alert_data['current_stock_kg']}kg"
+            rows.append({
+                "user_id": user.user_id,
+                "channel": NotificationChannel.SMS,
+                "recipient": user.phone,
+                "body_text": sms_message,
+            })
         
-        return results
+        if notification_channels.get("whatsapp", False) and user.phone:
+            rows.append({
+                "user_id": user.user_id,
+                "channel": NotificationChannel.WHATSAPP,
+                "recipient": user.phone,
+                "body_text": f"*{alert_title}*\n{alert_message}",
+            })
+        
+        return rows
 
 
 # Global notification service instance
 notification_service = NotificationService()
-
@@ -1,78 +1,319 @@
 """
 Scheduler service for background tasks using APScheduler
+
+Each process that calls start_scheduler() registers the jobs, but with
+SCHEDULER_LEADER_ELECTION on (the default) its scheduler stays paused until
+it wins the scheduler lock (core/leader.py), so N uvicorn workers still run
+each job once.
+
+Every run is recorded in job_runs (start, end, rows, error) for the admin
+console, and runs that would overlap a still-running one are skipped and
+counted rather than stacked up.
 """
 import logging
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-from apscheduler.triggers.interval import IntervalTrigger
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Callable, NamedTuple, Optional, Union
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
 
-from ..core.database import SessionLocal
-from .inventory_alerts import generate_inventory_alerts, record_stock_history, check_price_alerts
+from ..core.config import settings
+from ..core.database import SessionLocal, engine
+from ..core.leader import LeaderElector, scheduler_lock
+from ..core.metrics import observe_job, observe_job_skipped, observe_stock_drift
+from ..models.job_run import JobRun, JobRunStatus
+from .alert_partitions import generate_inventory_alerts_partitioned
+from .idempotency import expire_idempotency_keys
+from .inventory_alerts import (
+    check_price_alerts,
+    generate_inventory_alerts,
+    process_dirty_crops,
+    record_stock_history,
+)
+from .notification_queue import dispatch_notifications
+from .stock_history import expire_stock_history, roll_up_stock_history
+from .stock_ledger import reconcile_stock_balances
 
 logger = logging.getLogger(__name__)
 
-scheduler = BackgroundScheduler()
+# Created by start_scheduler() so APScheduler is only imported where jobs run
+scheduler = None
+elector = None
 
 
-def run_alert_generation():
-    """Scheduled task to generate inventory alerts"""
+class JobResult(NamedTuple):
+    """What a job reports: rows it wrote and, where it knows, the inputs it examined"""
+    rows_written: int
+    rows_scanned: Optional[int] = None
+
+
+WORKER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _record_run(job_id: str, **values) -> Optional[int]:
+    """Insert a job_runs row on its own session; a failure here never stops the job"""
     db = SessionLocal()
     try:
-        logger.info("Running scheduled alert generation...")
-        result = generate_inventory_alerts(db)
-        logger.info(f"Alert generation completed: {result['alerts_created']} created, {result['alerts_updated']} updated")
+        run_id = db.execute(insert(JobRun).values(job_id=job_id, worker=WORKER, **values)
+                            .returning(JobRun.run_id)).scalar_one()
+        db.commit()
+        return run_id
     except Exception as e:
-        logger.error(f"Error in alert generation: {e}")
+        logger.warning(f"Could not record run of {job_id}: {e}")
+        db.rollback()
+        return None
     finally:
         db.close()
 
 
-def run_stock_history_recording():
-    """Scheduled task to record stock history"""
+def _finish_run(run_id: Optional[int], job_id: str, **values):
+    """Close a job_runs row and drop this job's runs past retention"""
+    if run_id is None:
+        return
     db = SessionLocal()
     try:
-        logger.info("Recording stock history...")
-        record_stock_history(db)
-        logger.info("Stock history recorded successfully")
+        db.execute(update(JobRun).where(JobRun.run_id == run_id).values(**values))
+        db.execute(delete(JobRun).where(
+            JobRun.job_id == job_id,
+            JobRun.started_at < datetime.utcnow() - timedelta(days=settings.JOB_RUN_RETENTION_DAYS)
+        ))
+        db.commit()
     except Exception as e:
-        logger.error(f"Error recording stock history: {e}")
+        logger.warning(f"Could not record end of {job_id} run {run_id}: {e}")
+        db.rollback()
     finally:
         db.close()
 
 
-def run_price_alerts():
-    """Scheduled task to check for price changes"""
+def _run_job(job_id: str, func: Callable[[Session], Union[JobResult, int, None]]) -> int:
+    """Run a job with its own session and record its duration, outcome and row counts.
+
+    func(db) returns a JobResult (a bare row count is taken as rows written). Errors are
+    logged rather than raised into APScheduler. Skipped if this process has
+    just lost the scheduler lock.
+    """
+    if elector is not None and not elector.confirm():
+        logger.info(f"Skipping {job_id}: this process is no longer the scheduler leader")
+        observe_job_skipped(job_id, "not_leader")
+        return 0
+    started_at = datetime.utcnow()
+    run_id = _record_run(job_id, status=JobRunStatus.RUNNING, started_at=started_at)
     db = SessionLocal()
+    started = time.perf_counter()
+    result = JobResult(0)
+    error = None
     try:
-        logger.info("Checking for price alerts...")
-        alerts_created = check_price_alerts(db)
-        logger.info(f"Price alerts check completed: {alerts_created} alerts created")
+        result = func(db)
+        if not isinstance(result, JobResult):
+            result = JobResult(result or 0)
     except Exception as e:
-        logger.error(f"Error checking price alerts: {e}")
+        error = f"{type(e).__name__}: {e}"
+        logger.error(f"Error in scheduled job {job_id}: {e}")
+        db.rollback()
     finally:
         db.close()
+        duration = time.perf_counter() - started
+        observe_job(job_id, duration, result.rows_written, error is None, time.time())
+        _finish_run(
+            run_id, job_id,
+            status=JobRunStatus.ERROR if error else JobRunStatus.SUCCESS,
+            finished_at=datetime.utcnow(),
+            duration_ms=duration * 1000,
+            rows_scanned=result.rows_scanned,
+            rows_written=result.rows_written,
+            error=error,
+        )
+    logger.debug(f"{job_id} finished in {duration * 1000:.0f} ms ({result.rows_written} rows)")
+    return result.rows_written
+
+
+def _on_job_skipped(event):
+    """APScheduler listener: a run was dropped because the previous one was still going, or it fired too late"""
+    from apscheduler.events import EVENT_JOB_MAX_INSTANCES
+
+    reason = "overlap" if event.code == EVENT_JOB_MAX_INSTANCES else "missed"
+    logger.warning(f"Skipped a run of {event.job_id} ({reason})")
+    observe_job_skipped(event.job_id, reason)
+    now = datetime.utcnow()
+    # Kept in job_runs too, so the admin console sees skips from every process
+    _record_run(event.job_id, status=JobRunStatus.SKIPPED, started_at=now, finished_at=now,
+                duration_ms=0.0, error=f"Skipped: {reason}")
+
+
+def _generate_alerts(db) -> JobResult:
+    logger.info("Running scheduled alert generation...")
+    if settings.ALERT_PARTITIONS > 1:
+        result = generate_inventory_alerts_partitioned(db)
+    else:
+        result = generate_inventory_alerts(db)
+    logger.info(f"Alert generation completed: {result['alerts_created']} created, {result['alerts_updated']} updated")
+    return JobResult(result['alerts_created'] + result['alerts_updated'], result['total_processed'])
+
+
+def _process_dirty_crops(db) -> JobResult:
+    crops = process_dirty_crops(db, batch_size=settings.ALERT_DIRTY_CROP_BATCH_SIZE)
+    if crops:
+        logger.info(f"Re-evaluated alerts for {crops} changed crops")
+    return JobResult(crops, crops)
+
+
+def _record_stock_history(db) -> JobResult:
+    logger.info("Recording stock history...")
+    rows = record_stock_history(db)
+    logger.info(f"Stock history recorded successfully ({rows} crops)")
+    return JobResult(rows)
+
+
+def _roll_up_stock_history(db) -> JobResult:
+    built = roll_up_stock_history(db)
+    expired = expire_stock_history(db)
+    logger.info(f"Stock history rollups built {built}, expired {expired}")
+    return JobResult(sum(built.values()))
+
+
+def _check_price_alerts(db) -> JobResult:
+    logger.info("Checking for price alerts...")
+    alerts_created = check_price_alerts(db)
+    logger.info(f"Price alerts check completed: {alerts_created} alerts created")
+    return JobResult(alerts_created)
+
+
+def _dispatch_notifications(db) -> JobResult:
+    counts = dispatch_notifications(db)
+    if any(counts.values()):
+        logger.info(f"Notifications: {counts['sent']} sent, {counts['retry']} to retry, {counts['dead']} dead-lettered")
+    return JobResult(counts['sent'], sum(counts.values()))
+
+
+def _reconcile_stock_ledger(db) -> JobResult:
+    result = reconcile_stock_balances(db, fix=settings.STOCK_RECONCILE_FIX)
+    observe_stock_drift(result['stocks_drifted'], result['drift_kg'])
+    logger.info(f"Stock ledger reconciled: {result['stocks_drifted']} of {result['stocks_checked']} balances drifted, "
+                f"{result['stocks_fixed']} rebuilt")
+    return JobResult(result['stocks_fixed'], result['stocks_checked'])
+
+
+def _expire_idempotency_keys(db) -> JobResult:
+    return JobResult(expire_idempotency_keys(db))
+
+
+def run_alert_generation():
+    """Scheduled task to generate inventory alerts"""
+    _run_job('generate_alerts', _generate_alerts)
+
+
+def run_dirty_crop_alerts():
+    """Scheduled task to re-evaluate alerts for crops whose stock changed"""
+    _run_job('evaluate_dirty_crops', _process_dirty_crops)
+
+
+def run_stock_history_recording():
+    """Scheduled task to record stock history"""
+    _run_job('record_stock_history', _record_stock_history)
+
+
+def run_stock_history_rollup():
+    """Scheduled task to roll up stock history and apply retention"""
+    _run_job('rollup_stock_history', _roll_up_stock_history)
+
+
+def run_price_alerts():
+    """Scheduled task to check for price changes"""
+    _run_job('check_price_alerts', _check_price_alerts)
+
+
+def run_notification_dispatch():
+    """Scheduled task to deliver queued email/SMS notifications"""
+    _run_job('dispatch_notifications', _dispatch_notifications)
+
+
+def run_stock_reconciliation():
+    """Scheduled task to check stock balances against the movement ledger"""
+    _run_job('reconcile_stock_ledger', _reconcile_stock_ledger)
+
+
+def run_idempotency_key_expiry():
+    """Scheduled task to delete expired Idempotency-Key responses"""
+    _run_job('expire_idempotency_keys', _expire_idempotency_keys)
 
 
 def start_scheduler():
     """Start the background scheduler"""
-    # Generate alerts every hour
+    global scheduler, elector
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.triggers.cron import CronTrigger
+    from apscheduler.triggers.interval import IntervalTrigger
+    
+    from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+    
+    if scheduler is None:
+        # One instance of each job at a time; runs missed while it was busy
+        # (or while this process was on standby) collapse into one
+        scheduler = BackgroundScheduler(job_defaults={
+            'max_instances': 1,
+            'coalesce': True,
+            'misfire_grace_time': settings.SCHEDULER_MISFIRE_GRACE_SECONDS,
+        })
+        scheduler.add_listener(_on_job_skipped, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+    
+    # Re-evaluate alerts for crops whose lots, listings or plans changed
+    scheduler.add_job(
+        run_dirty_crop_alerts,
+        trigger=IntervalTrigger(seconds=settings.ALERT_DIRTY_CROP_INTERVAL_SECONDS),
+        id='evaluate_dirty_crops',
+        name='Evaluate Alerts for Changed Crops',
+        replace_existing=True
+    )
+    
+    # Full scan of every preference nightly, to reconcile anything the dirty
+    # crop tracking missed and to pick up harvest windows as days pass
     scheduler.add_job(
         run_alert_generation,
-        trigger=IntervalTrigger(hours=1),
+        trigger=CronTrigger(hour=settings.ALERT_RECONCILE_HOUR),
         id='generate_alerts',
-        name='Generate Inventory Alerts',
+        name='Reconcile Inventory Alerts',
         replace_existing=True
     )
     
-    # Record stock history every 6 hours
+    # Snapshot stock levels and prices for the history charts
     scheduler.add_job(
         run_stock_history_recording,
-        trigger=IntervalTrigger(hours=6),
+        trigger=IntervalTrigger(minutes=settings.STOCK_HISTORY_INTERVAL_MINUTES),
         id='record_stock_history',
         name='Record Stock History',
         replace_existing=True
     )
     
+    # Fold completed hours/days/weeks into rollups, then expire old rows
+    scheduler.add_job(
+        run_stock_history_rollup,
+        trigger=CronTrigger(minute=5),
+        id='rollup_stock_history',
+        name='Roll Up Stock History',
+        replace_existing=True
+    )
+    
+    # Rebuild stock balances that drifted from their movements
+    scheduler.add_job(
+        run_stock_reconciliation,
+        trigger=CronTrigger(hour=settings.STOCK_RECONCILE_HOUR),
+        id='reconcile_stock_ledger',
+        name='Reconcile Stock Ledger',
+        replace_existing=True
+    )
+    
+    # Drop stored Idempotency-Key responses past their TTL
+    scheduler.add_job(
+        run_idempotency_key_expiry,
+        trigger=IntervalTrigger(hours=1),
+        id='expire_idempotency_keys',
+        name='Expire Idempotency Keys',
+        replace_existing=True
+    )
+    
     # Check price alerts every 4 hours
     scheduler.add_job(
         run_price_alerts,
@@ -82,13 +323,40 @@ def start_scheduler():
         replace_existing=True
     )
     
-    scheduler.start()
-    logger.info("Background scheduler started")
+    # Deliver queued notifications; overlapping runs are skipped (max_instances)
+    scheduler.add_job(
+        run_notification_dispatch,
+        trigger=IntervalTrigger(seconds=settings.NOTIFICATION_DISPATCH_INTERVAL_SECONDS),
+        id='dispatch_notifications',
+        name='Dispatch Notifications',
+        replace_existing=True
+    )
+    
+    if not settings.SCHEDULER_LEADER_ELECTION:
+        scheduler.start()
+        logger.info("Background scheduler started")
+        return
+    
+    # Paused until this process holds the scheduler lock
+    scheduler.start(paused=True)
+    elector = LeaderElector(
+        scheduler_lock(engine),
+        on_elected=scheduler.resume,
+        on_demoted=scheduler.pause,
+        interval=settings.SCHEDULER_LEADER_POLL_SECONDS
+    )
+    elector.start()
+    logger.info(f"Background scheduler started ({'leader' if elector.is_leader else 'standby'})")
 
 
 def stop_scheduler():
-    """Stop the background scheduler"""
-    if scheduler.running:
+    """Stop the background scheduler and hand the scheduler lock to another process"""
+    global elector
+    if scheduler is not None and scheduler.running:
+        # Waits for running jobs, so the next leader can't overlap them
         scheduler.shutdown()
         logger.info("Background scheduler stopped")
+    if elector is not None:
+        elector.stop()
+        elector = None
 
@@ -0,0 +1,164 @@
+"""
+Stock history rollups and retention
+
+roll_up_stock_history() folds completed hours of raw StockHistory snapshots
+into hourly StockHistoryRollup rows, completed days of those into daily
+rows and completed weeks into weekly rows. expire_stock_history() then
+deletes raw snapshots and rollups older than their retention, but only once
+they have been folded into the next tier. history_resolution() picks the
+tier the history endpoint reads for a given window.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.stock_history import StockHistory, StockHistoryRollup
+
+HOUR = "hour"
+DAY = "day"
+WEEK = "week"
+RAW = "raw"
+
+PERIODS = {HOUR: timedelta(hours=1), DAY: timedelta(days=1), WEEK: timedelta(weeks=1)}
+# Each tier is built from the one before it
+SOURCES = {HOUR: RAW, DAY: HOUR, WEEK: DAY}
+
+# The endpoint uses the finest tier that keeps a chart under this many points
+MAX_CHART_POINTS = 400
+
+_METRICS = ("total_available_kg", "total_reserved_kg", "total_sold_kg", "remaining_kg",
+            "avg_price_per_kg", "active_listings_count")
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_start(value: datetime, resolution: str) -> datetime:
+    """Start of the hour, day or (Monday-based) week containing value"""
+    value = _naive_utc(value).replace(minute=0, second=0, microsecond=0)
+    if resolution == HOUR:
+        return value
+    value = value.replace(hour=0)
+    if resolution == DAY:
+        return value
+    return value - timedelta(days=value.weekday())
+
+
+def retention_days() -> Dict[str, Optional[int]]:
+    """How long each tier is kept; weekly rollups are kept forever"""
+    return {
+        RAW: settings.STOCK_HISTORY_RAW_RETENTION_DAYS,
+        HOUR: settings.STOCK_HISTORY_HOURLY_RETENTION_DAYS,
+        DAY: settings.STOCK_HISTORY_DAILY_RETENTION_DAYS,
+        WEEK: None,
+    }
+
+
+def history_resolution(days: int) -> str:
+    """Finest tier whose retention covers `days` and whose chart stays under MAX_CHART_POINTS"""
+    window = timedelta(days=days)
+    periods = {RAW: timedelta(minutes=max(settings.STOCK_HISTORY_INTERVAL_MINUTES, 1)), **PERIODS}
+    for resolution, keep in retention_days().items():
+        if keep is not None and days > keep:
+            continue
+        if window / periods[resolution] <= MAX_CHART_POINTS:
+            return resolution
+    return WEEK
+
+
+def _source(resolution: str):
+    """(timestamp column, rows query) for the tier a rollup is built from"""
+    source = SOURCES[resolution]
+    if source == RAW:
+        return StockHistory.recorded_at, select(StockHistory)
+    return StockHistoryRollup.bucket_start, select(StockHistoryRollup).where(
+        StockHistoryRollup.resolution == source)
+
+
+def _rolled_until(db: Session, resolution: str) -> Optional[datetime]:
+    """End of the newest bucket already built for a tier"""
+    last = db.scalar(select(func.max(StockHistoryRollup.bucket_start)).where(
+        StockHistoryRollup.resolution == resolution))
+    return _naive_utc(last) + PERIODS[resolution] if last else None
+
+
+def _roll_up(db: Session, resolution: str, now: datetime) -> int:
+    """Build every completed, not yet built bucket of one tier; returns rows inserted"""
+    column, rows_query = _source(resolution)
+    period = PERIODS[resolution]
+    end = bucket_start(now, resolution)  # the current bucket is still filling
+    start = _rolled_until(db, resolution)
+    if start is None:
+        first = db.scalar(rows_query.with_only_columns(func.min(column)))
+        if first is None:
+            return 0
+        start = bucket_start(first, resolution)
+
+    inserted = 0
+    # Bounded chunks, so a first run over a long backlog doesn't load it all at once
+    chunk = period * 200
+    while start < end:
+        stop = min(start + chunk, end)
+        groups = defaultdict(list)
+        for row in db.scalars(rows_query.where(column >= start, column < stop)):
+            groups[(row.crop_id, bucket_start(getattr(row, column.key), resolution))].append(row)
+
+        rollups = []
+        for (crop_id, bucket), rows in groups.items():
+            weights = [getattr(row, "sample_count", 1) or 1 for row in rows]
+            total = sum(weights)
+            rollup = {"crop_id": crop_id, "resolution": resolution, "bucket_start": bucket, "sample_count": total}
+            for metric in _METRICS:
+                pairs = [(getattr(row, metric), w) for row, w in zip(rows, weights) if getattr(row, metric) is not None]
+                rollup[metric] = sum(v * w for v, w in pairs) / sum(w for _, w in pairs) if pairs else None
+            mins = [row.min_price_per_kg for row in rows if row.min_price_per_kg is not None]
+            maxes = [row.max_price_per_kg for row in rows if row.max_price_per_kg is not None]
+            rollup["min_price_per_kg"] = min(mins) if mins else None
+            rollup["max_price_per_kg"] = max(maxes) if maxes else None
+            rollups.append(rollup)
+        if rollups:
+            db.execute(insert(StockHistoryRollup), rollups)
+            inserted += len(rollups)
+        start = stop
+    return inserted
+
+
+def roll_up_stock_history(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Build completed hourly, then daily, then weekly buckets; returns rows inserted per tier"""
+    now = _naive_utc(now or datetime.utcnow())
+    counts = {}
+    for resolution in (HOUR, DAY, WEEK):
+        counts[resolution] = _roll_up(db, resolution, now)
+    db.commit()
+    return counts
+
+
+def expire_stock_history(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Delete raw snapshots and rollups past retention that the next tier already covers"""
+    now = _naive_utc(now or datetime.utcnow())
+    deleted = {}
+    next_tier = {RAW: HOUR, HOUR: DAY, DAY: WEEK}
+    for tier, keep in retention_days().items():
+        if keep is None:
+            continue
+        # Never delete what hasn't been folded into the next tier yet
+        covered = _rolled_until(db, next_tier[tier])
+        if covered is None:
+            deleted[tier] = 0
+            continue
+        cutoff = min(now - timedelta(days=keep), covered)
+        if tier == RAW:
+            statement = delete(StockHistory).where(StockHistory.recorded_at < cutoff)
+        else:
+            statement = delete(StockHistoryRollup).where(
+                StockHistoryRollup.resolution == tier, StockHistoryRollup.bucket_start < cutoff)
+        deleted[tier] = db.execute(statement).rowcount
+    db.commit()
+    return deleted
@@ -0,0 +1,292 @@
+"""
+Bulk stock movement ingestion for POS and ERP feeds
+
+A feed is JSON lines (one movement object per line) or CSV with a header
+row, using the fields of MovementRow. Rows are parsed as the request body
+streams in and applied in chunks: each chunk resolves its crops and the
+buyer's active stocks in one query each, adds the summed quantity change
+per stock with stock_ledger.apply_stock_deltas(), bulk-inserts the
+movements and commits. Bad rows are rejected individually and never block
+the rest of the feed.
+"""
+import codecs
+import csv
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.buyer_stock import BuyerStock, StockMovement, StockMovementType
+from ..models.crop import Crop
+from .stock_ledger import apply_stock_deltas, signed_quantity
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("ndjson", "csv")
+
+
+class MovementRow(BaseModel):
+    crop_id: int
+    movement_type: StockMovementType
+    quantity_kg: float = Field(..., gt=0)
+    unit_cost_usd: Optional[float] = Field(None, ge=0)
+    movement_date: Optional[datetime] = None
+    notes: Optional[str] = Field(None, max_length=500)
+
+    @field_validator("movement_date")
+    @classmethod
+    def naive_utc(cls, v):
+        # Stored like every other timestamp here: naive UTC
+        if v is not None and v.tzinfo is not None:
+            v = v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+
+# (row number, status, stock_id, error)
+RowResult = Tuple[int, str, Optional[int], Optional[str]]
+ParsedRow = Tuple[int, Union[MovementRow, str]]
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc']) or 'row'}: {e['msg']}" for e in error.errors())
+
+
+class MovementFeedParser:
+    """
+    Incremental parser for a JSON lines or CSV feed
+
+    feed() takes raw body chunks as they arrive and returns the rows
+    completed so far as (row number, MovementRow or error message); rows are
+    numbered from 1, not counting blank lines or the CSV header. Quoted CSV
+    fields can't contain line breaks.
+    """
+
+    def __init__(self, fmt: str):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        self.fmt = fmt
+        self.header: Optional[List[str]] = None
+        self.rows = 0
+        self._pending = b""
+
+    def feed(self, data: bytes) -> List[ParsedRow]:
+        if self.rows == 0 and self.header is None and not self._pending:
+            data = data.removeprefix(codecs.BOM_UTF8)
+        lines = (self._pending + data).split(b"\n")
+        self._pending = lines.pop()
+        return self._parse(lines)
+
+    def close(self) -> List[ParsedRow]:
+        lines, self._pending = [self._pending], b""
+        return self._parse(lines)
+
+    def _parse(self, raw_lines: List[bytes]) -> List[ParsedRow]:
+        lines = []
+        for raw in raw_lines:
+            line = raw.decode("utf-8", errors="replace").strip()
+            if line:
+                lines.append(line)
+        if self.fmt == "csv":
+            records = csv.reader(lines)
+            if self.header is None and lines:
+                self.header = [name.strip() for name in next(records, [])]
+            return [self._validate(self._csv_record(values)) for values in records]
+        return [self._validate(self._json_record(line)) for line in lines]
+
+    def _csv_record(self, values: List[str]) -> Union[dict, str]:
+        if len(values) != len(self.header):
+            return f"Expected {len(self.header)} columns, got {len(values)}"
+        return {name: value.strip() for name, value in zip(self.header, values) if value.strip() != ""}
+
+    @staticmethod
+    def _json_record(line: str) -> Union[dict, str]:
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            return f"Invalid JSON: {e}"
+        return record if isinstance(record, dict) else "Expected a JSON object"
+
+    def _validate(self, record: Union[dict, str]) -> ParsedRow:
+        self.rows += 1
+        if isinstance(record, str):
+            return self.rows, record
+        try:
+            return self.rows, MovementRow.model_validate(record)
+        except ValidationError as e:
+            return self.rows, _validation_message(e)
+
+
+def apply_movement_chunk(db: Session, buyer_user_id: int, rows: List[Tuple[int, MovementRow]],
+                         known_crops: Optional[Set[int]] = None) -> List[RowResult]:
+    """
+    Apply one chunk of validated movements for a buyer and commit it
+
+    Args:
+        rows: (row number, movement) pairs
+        known_crops: crop ids already checked by earlier chunks of the same
+            feed; updated in place
+
+    Returns:
+        list: (row number, "applied" or "rejected", stock_id, error) per row
+    """
+    if not rows:
+        return []
+    known_crops = known_crops if known_crops is not None else set()
+    unchecked = {row.crop_id for _, row in rows} - known_crops
+    if unchecked:
+        known_crops.update(db.scalars(select(Crop.crop_id).where(Crop.crop_id.in_(unchecked))))
+
+    results: List[RowResult] = []
+    accepted = []
+    for row_number, row in rows:
+        if row.crop_id in known_crops:
+            accepted.append((row_number, row))
+        else:
+            results.append((row_number, "rejected", None, "Crop not found"))
+    if not accepted:
+        return results
+
+    crop_ids = {row.crop_id for _, row in accepted}
+    stocks: Dict[int, BuyerStock] = {}
+    for stock in db.scalars(
+        select(BuyerStock)
+        .where(
+            BuyerStock.buyer_user_id == buyer_user_id,
+            BuyerStock.crop_id.in_(crop_ids),
+            BuyerStock.is_active == True,
+        )
+        .order_by(BuyerStock.stock_id)
+    ):
+        stocks.setdefault(stock.crop_id, stock)
+
+    new_stocks = []
+    for crop_id in crop_ids - stocks.keys():
+        stocks[crop_id] = BuyerStock(buyer_user_id=buyer_user_id, crop_id=crop_id, current_quantity_kg=0.0,
+                                     reserved_quantity_kg=0.0, is_active=True)
+        new_stocks.append(stocks[crop_id])
+    if new_stocks:
+        db.add_all(new_stocks)
+        db.flush()
+
+    now = datetime.utcnow()
+    deltas: Dict[int, float] = defaultdict(float)
+    purchased: Dict[int, datetime] = {}
+    movement_rows = []
+    for row_number, row in accepted:
+        stock = stocks[row.crop_id]
+        quantity = signed_quantity(row.movement_type, row.quantity_kg)
+        deltas[stock.stock_id] += quantity
+        movement_date = row.movement_date or now
+        if row.movement_type == StockMovementType.PURCHASE:
+            if row.unit_cost_usd:
+                stock.unit_cost_usd = row.unit_cost_usd
+            purchased[row.crop_id] = max(movement_date, purchased.get(row.crop_id, movement_date))
+        movement_rows.append({
+            "stock_id": stock.stock_id,
+            "buyer_user_id": buyer_user_id,
+            "crop_id": row.crop_id,
+            "movement_type": row.movement_type,
+            "quantity_kg": quantity,
+            "unit_cost_usd": row.unit_cost_usd,
+            "total_cost_usd": row.unit_cost_usd * row.quantity_kg if row.unit_cost_usd else None,
+            "notes": row.notes,
+            "movement_date": movement_date,
+        })
+        results.append((row_number, "applied", stock.stock_id, None))
+
+    for crop_id, purchase_date in purchased.items():
+        stocks[crop_id].purchase_date = purchase_date
+    # One atomic quantity = quantity + delta per stock, safe against concurrent writers
+    apply_stock_deltas(db, deltas)
+    db.execute(insert(StockMovement), movement_rows)
+    db.commit()
+    logger.debug(f"Ingested {len(movement_rows)} movements for buyer {buyer_user_id} "
+                 f"across {len(deltas)} crops ({len(new_stocks)} new stock records)")
+    return results
+
+
+class IngestLimitExceeded(ValueError):
+    """The feed has more rows than STOCK_INGEST_MAX_ROWS"""
+
+
+class StockMovementIngest:
+    """
+    One feed being ingested for a buyer
+
+    Call feed() with each body chunk and finish() at the end of the body.
+    Every chunk_size valid rows are applied and committed; rows applied
+    before an error (or IngestLimitExceeded) stay applied.
+    """
+
+    def __init__(self, buyer_user_id: int, fmt: str, chunk_size: Optional[int] = None,
+                 max_rows: Optional[int] = None):
+        self.buyer_user_id = buyer_user_id
+        self.parser = MovementFeedParser(fmt)
+        self.chunk_size = chunk_size or settings.STOCK_INGEST_CHUNK_SIZE
+        self.max_rows = max_rows or settings.STOCK_INGEST_MAX_ROWS
+        self.known_crops: Set[int] = set()
+        self.results: List[RowResult] = []
+        self.batch: List[Tuple[int, MovementRow]] = []
+
+    def feed(self, db: Session, data: bytes):
+        self._take(db, self.parser.feed(data))
+
+    def finish(self, db: Session) -> dict:
+        """Apply the remaining rows and build the response"""
+        self._take(db, self.parser.close())
+        self._apply(db)
+        return self.summary(db)
+
+    def _take(self, db: Session, parsed: List[ParsedRow]):
+        if self.parser.rows > self.max_rows:
+            raise IngestLimitExceeded(f"Feed exceeds {self.max_rows} rows")
+        for row_number, row in parsed:
+            if isinstance(row, str):
+                self.results.append((row_number, "rejected", None, row))
+            else:
+                self.batch.append((row_number, row))
+        if len(self.batch) >= self.chunk_size:
+            self._apply(db)
+
+    def _apply(self, db: Session):
+        self.results.extend(apply_movement_chunk(db, self.buyer_user_id, self.batch, self.known_crops))
+        self.batch = []
+
+    @property
+    def applied(self) -> int:
+        return sum(1 for _, status, _, _ in self.results if status == "applied")
+
+    def summary(self, db: Session) -> dict:
+        """Counts, per-row results in row order and the new balances of the stocks touched"""
+        self.results.sort()
+        stock_ids = {stock_id for _, _, stock_id, _ in self.results if stock_id is not None}
+        stocks = db.execute(
+            select(BuyerStock.stock_id, BuyerStock.crop_id, BuyerStock.current_quantity_kg)
+            .where(BuyerStock.stock_id.in_(stock_ids))
+            .order_by(BuyerStock.crop_id)
+        ).all() if stock_ids else []
+        applied = self.applied
+        return {
+            "rows": len(self.results),
+            "applied": applied,
+            "rejected": len(self.results) - applied,
+            "stocks": [{"stock_id": stock_id, "crop_id": crop_id, "new_quantity_kg": quantity}
+                       for stock_id, crop_id, quantity in stocks],
+            "results": [{"row": row, "status": status, "stock_id": stock_id, "error": error}
+                        for row, status, stock_id, error in self.results],
+        }
+
+
+def ingest_stock_movements(db: Session, buyer_user_id: int, chunks: Iterable[bytes], fmt: str,
+                           chunk_size: Optional[int] = None) -> dict:
+    """Ingest a whole feed from an iterable of byte chunks (the API streams the request body instead)"""
+    ingest = StockMovementIngest(buyer_user_id, fmt, chunk_size=chunk_size)
+    for data in chunks:
+        ingest.feed(db, data)
+    return ingest.finish(db)
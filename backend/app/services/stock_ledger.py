@@ -0,0 +1,157 @@
+"""
+Stock balance updates and ledger reconciliation
+
+StockMovement rows are the ledger: their signed quantity_kg sums to the
+stock's current_quantity_kg. Writers change a balance only through
+apply_stock_delta()/apply_stock_deltas(), which add the delta in a single
+UPDATE (quantity = quantity + :delta) instead of reading the quantity,
+changing it in Python and writing it back, so concurrent movements on the
+same stock can't overwrite each other. The value, active and expired flags
+are derived in the same statement.
+
+reconcile_stock_balances() (nightly job) compares every balance with its
+ledger sum, reports the drift and rebuilds the drifted balances.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import and_, bindparam, case, func, select, update
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.buyer_stock import BuyerStock, StockMovement, StockMovementType
+
+logger = logging.getLogger(__name__)
+
+stock_table = BuyerStock.__table__
+
+# Movement types that take stock away; stored with a negative quantity
+OUTBOUND_TYPES = {StockMovementType.CONSUMPTION, StockMovementType.WASTE, StockMovementType.RETURN}
+
+
+def signed_quantity(movement_type: StockMovementType, quantity_kg: float) -> float:
+    return -abs(quantity_kg) if movement_type in OUTBOUND_TYPES else quantity_kg
+
+
+def _delta_values(delta, now: datetime) -> dict:
+    quantity = stock_table.c.current_quantity_kg + delta
+    return {
+        "current_quantity_kg": quantity,
+        "total_value_usd": case(
+            (stock_table.c.unit_cost_usd.is_not(None), quantity * stock_table.c.unit_cost_usd),
+            else_=stock_table.c.total_value_usd,
+        ),
+        # Emptied stock is closed; the next movement for the crop opens a new row
+        "is_active": case((quantity <= 0, False), else_=stock_table.c.is_active),
+        "is_expired": case(
+            (and_(quantity <= 0, stock_table.c.expiry_date < now), True),
+            else_=stock_table.c.is_expired,
+        ),
+        "last_movement_date": now,
+    }
+
+
+def apply_stock_delta(db: Session, stock: BuyerStock, delta: float) -> float:
+    """
+    Add delta kg to one stock's balance atomically and return the new balance
+
+    Pending ORM changes are flushed first so the derived value uses the
+    stock's current unit cost; the balance attributes of `stock` are expired
+    and reload on next access.
+    """
+    db.flush()
+    now = datetime.utcnow()
+    quantity = db.execute(
+        update(stock_table)
+        .where(stock_table.c.stock_id == stock.stock_id)
+        .values(**_delta_values(delta, now))
+        .returning(stock_table.c.current_quantity_kg)
+    ).scalar_one()
+    db.expire(stock, ["current_quantity_kg", "total_value_usd", "is_active", "is_expired", "last_movement_date"])
+    return quantity
+
+
+def apply_stock_deltas(db: Session, deltas: Dict[int, float]):
+    """Add each stock_id's delta to its balance atomically, in one executemany"""
+    if not deltas:
+        return
+    db.flush()
+    now = datetime.utcnow()
+    db.execute(
+        update(stock_table)
+        .where(stock_table.c.stock_id == bindparam("b_stock_id"))
+        .values(**_delta_values(bindparam("b_delta"), now)),
+        [{"b_stock_id": stock_id, "b_delta": delta} for stock_id, delta in deltas.items()],
+    )
+    for stock in db.identity_map.values():
+        if isinstance(stock, BuyerStock) and stock.stock_id in deltas:
+            db.expire(stock, ["current_quantity_kg", "total_value_usd", "is_active", "is_expired",
+                              "last_movement_date"])
+
+
+def ledger_drift(db: Session, tolerance_kg: Optional[float] = None) -> list:
+    """(stock_id, balance, ledger sum) for every stock whose balance differs from its movements"""
+    tolerance_kg = settings.STOCK_LEDGER_TOLERANCE_KG if tolerance_kg is None else tolerance_kg
+    ledger = (
+        select(StockMovement.stock_id, func.sum(StockMovement.quantity_kg).label("total"))
+        .group_by(StockMovement.stock_id)
+        .subquery()
+    )
+    ledger_total = func.coalesce(ledger.c.total, 0.0)
+    return db.execute(
+        select(BuyerStock.stock_id, BuyerStock.current_quantity_kg, ledger_total)
+        .outerjoin(ledger, ledger.c.stock_id == BuyerStock.stock_id)
+        .where(func.abs(BuyerStock.current_quantity_kg - ledger_total) > tolerance_kg)
+        .order_by(BuyerStock.stock_id)
+    ).all()
+
+
+def reconcile_stock_balances(db: Session, fix: bool = True, tolerance_kg: Optional[float] = None) -> dict:
+    """
+    Compare every stock balance with the sum of its movements
+
+    With fix, drifted balances (and their value) are rebuilt from the ledger
+    in one UPDATE that re-sums the movements, so a movement committed between
+    the check and the fix is still counted.
+
+    Returns:
+        dict: stocks_checked, stocks_drifted, drift_kg (sum of |balance - ledger|),
+        stocks_fixed and up to 20 "examples" of (stock_id, balance, ledger)
+    """
+    checked = db.scalar(select(func.count()).select_from(BuyerStock))
+    drifted = ledger_drift(db, tolerance_kg)
+    drift_kg = sum(abs(balance - total) for _, balance, total in drifted)
+    for stock_id, balance, total in drifted[:20]:
+        logger.warning(f"Stock {stock_id} balance {balance:.3f} kg, ledger {total:.3f} kg")
+
+    fixed = 0
+    if fix and drifted:
+        ledger_total = (
+            select(func.coalesce(func.sum(StockMovement.quantity_kg), 0.0))
+            .where(StockMovement.stock_id == stock_table.c.stock_id)
+            .scalar_subquery()
+        )
+        fixed = db.execute(
+            update(stock_table)
+            .where(stock_table.c.stock_id.in_([stock_id for stock_id, _, _ in drifted]))
+            .values(
+                current_quantity_kg=ledger_total,
+                total_value_usd=case(
+                    (stock_table.c.unit_cost_usd.is_not(None), ledger_total * stock_table.c.unit_cost_usd),
+                    else_=stock_table.c.total_value_usd,
+                ),
+            )
+        ).rowcount
+    db.commit()
+
+    if drifted:
+        logger.warning(f"Stock ledger drift: {len(drifted)} of {checked} balances off by {drift_kg:.3f} kg in total"
+                       + (f", {fixed} rebuilt" if fix else ""))
+    return {
+        "stocks_checked": checked,
+        "stocks_drifted": len(drifted),
+        "drift_kg": drift_kg,
+        "stocks_fixed": fixed,
+        "examples": [tuple(row) for row in drifted[:20]],
+    }
@@ -1,115 +1,159 @@
 """
 Service to sync buyer stock when orders are delivered
 """
-from typing import Optional
+from collections import defaultdict
+from typing import List, Optional
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from ..models.order import Order, OrderItem, OrderStatus
 from ..models.buyer_stock import BuyerStock, StockMovement, StockMovementType
 from ..models.crop import Crop
 from ..models.buyer import Buyer
+from ..models.pricing import Listing
+from ..models.production import Lot, ProductionPlan
+from .stock_ledger import apply_stock_delta, apply_stock_deltas
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def sync_stock_from_order(db: Session, order: Order):
+def sync_stock_from_orders(db: Session, orders: List[Order], commit: bool = True) -> int:
     """
-    Sync buyer stock when an order is delivered.
-    Creates stock records and purchase movements.
+    Sync buyer stock for a batch of delivered orders.
+    Creates or tops up stock records and bulk-inserts purchase movements.
+
+    Buyers, item crops and active stocks are each loaded in one query, and
+    all new stock rows share a single flush. With commit=False the caller
+    owns the transaction (e.g. to commit status changes in the same one).
+
+    Returns:
+        int: Number of purchase movements recorded
     """
+    if not orders:
+        return 0
     try:
-        # Get buyer
-        buyer_profile = db.query(Buyer).filter(Buyer.buyer_id == order.buyer_id).first()
-        if not buyer_profile:
-            logger.warning(f"Buyer profile not found for order {order.order_id}")
-            return
-        
-        buyer_user_id = buyer_profile.user_id
-        
-        # Process each order item
-        for item in order.order_items:
-            # Get crop from listing
-            listing = item.listing
-            if not listing:
-                continue
-            
-            crop_id = listing.crop_id
-            
-            # Get crop to get shelf life
-            crop = db.query(Crop).filter(Crop.crop_id == crop_id).first()
-            if not crop:
+        order_ids = [order.order_id for order in orders]
+        buyer_users = dict(db.execute(
+            select(Buyer.buyer_id, Buyer.user_id)
+            .where(Buyer.buyer_id.in_({order.buyer_id for order in orders}))
+        ).all())
+
+        # Crop comes from listing -> lot -> production plan
+        items_by_order = defaultdict(list)
+        for item, crop_id, perishability_days in db.execute(
+            select(OrderItem, ProductionPlan.crop_id, Crop.perishability_days)
+            .join(Listing, Listing.listing_id == OrderItem.listing_id)
+            .join(Lot, Lot.lot_id == Listing.lot_id)
+            .join(ProductionPlan, ProductionPlan.plan_id == Lot.plan_id)
+            .join(Crop, Crop.crop_id == ProductionPlan.crop_id)
+            .where(OrderItem.order_id.in_(order_ids))
+            .order_by(OrderItem.order_item_id)
+        ).all():
+            items_by_order[item.order_id].append((item, crop_id, perishability_days))
+
+        buyer_user_ids = set()
+        crop_ids = set()
+        for order in orders:
+            if order.buyer_id not in buyer_users:
+                logger.warning(f"Buyer profile not found for order {order.order_id}")
                 continue
-            
-            # Get or create stock record
-            stock = db.query(BuyerStock).filter(
-                BuyerStock.buyer_user_id == buyer_user_id,
-                BuyerStock.crop_id == crop_id,
-                BuyerStock.is_active == True
-            ).first()
-            
-            if not stock:
-                stock = BuyerStock(
-                    buyer_user_id=buyer_user_id,
-                    crop_id=crop_id,
-                    current_quantity_kg=0.0,
-                    reserved_quantity_kg=0.0,
-                    unit_cost_usd=item.unit_price,
-                    is_active=True
+            buyer_user_ids.add(buyer_users[order.buyer_id])
+            crop_ids.update(crop_id for _, crop_id, _ in items_by_order[order.order_id])
+
+        stocks = {}
+        if buyer_user_ids and crop_ids:
+            for stock in db.scalars(
+                select(BuyerStock)
+                .where(
+                    BuyerStock.is_active == True,
+                    BuyerStock.buyer_user_id.in_(buyer_user_ids),
+                    BuyerStock.crop_id.in_(crop_ids),
                 )
-                db.add(stock)
-                db.flush()
-            
-            # Calculate expiry date if crop has perishability info
-            purchase_date = order.actual_delivery_date or datetime.utcnow()
-            expiry_date = None
-            shelf_life_days = None
-            
-            if crop.perishability_days:
-                shelf_life_days = crop.perishability_days
-                expiry_date = purchase_date + timedelta(days=crop.perishability_days)
-                stock.shelf_life_days = shelf_life_days
-                stock.expiry_date = expiry_date
-            
-            # Update stock quantity
-            delivered_qty = item.delivered_kg if item.delivered_kg > 0 else item.qty_kg
-            stock.current_quantity_kg += delivered_qty
-            
-            # Update stock value
-            if stock.unit_cost_usd:
-                stock.total_value_usd = stock.current_quantity_kg * stock.unit_cost_usd
-            
-            stock.purchase_date = purchase_date
-            stock.supplier_order_id = order.order_id
-            stock.last_movement_date = datetime.utcnow()
-            
-            # Create purchase movement
-            movement = StockMovement(
-                stock_id=stock.stock_id,
-                buyer_user_id=buyer_user_id,
-                crop_id=crop_id,
-                movement_type=StockMovementType.PURCHASE,
-                quantity_kg=delivered_qty,
-                unit_cost_usd=item.unit_price,
-                total_cost_usd=item.unit_price * delivered_qty,
-                order_id=order.order_id,
-                order_item_id=item.order_item_id,
-                notes=f"Stock received from order {order.order_number}",
-                movement_date=purchase_date
-            )
-            
-            db.add(movement)
-            
-            logger.info(f"Stock synced for buyer {buyer_user_id}, crop {crop_id}, qty {delivered_qty}kg")
-        
-        db.commit()
-        
+                .order_by(BuyerStock.stock_id)
+            ):
+                stocks.setdefault((stock.buyer_user_id, stock.crop_id), stock)
+
+        # Create missing stock records up front so one flush assigns all their ids
+        new_stocks = []
+        for order in orders:
+            buyer_user_id = buyer_users.get(order.buyer_id)
+            if buyer_user_id is None:
+                continue
+            for item, crop_id, _ in items_by_order[order.order_id]:
+                if (buyer_user_id, crop_id) not in stocks:
+                    stock = BuyerStock(
+                        buyer_user_id=buyer_user_id,
+                        crop_id=crop_id,
+                        current_quantity_kg=0.0,
+                        reserved_quantity_kg=0.0,
+                        unit_cost_usd=item.unit_price,
+                        is_active=True
+                    )
+                    stocks[(buyer_user_id, crop_id)] = stock
+                    new_stocks.append(stock)
+        if new_stocks:
+            db.add_all(new_stocks)
+            db.flush()
+
+        now = datetime.utcnow()
+        deltas = defaultdict(float)
+        movement_rows = []
+        for order in orders:
+            buyer_user_id = buyer_users.get(order.buyer_id)
+            if buyer_user_id is None:
+                continue
+            purchase_date = order.actual_delivery_date or now
+            for item, crop_id, perishability_days in items_by_order[order.order_id]:
+                stock = stocks[(buyer_user_id, crop_id)]
+
+                # Calculate expiry date if crop has perishability info
+                if perishability_days:
+                    stock.shelf_life_days = perishability_days
+                    stock.expiry_date = purchase_date + timedelta(days=perishability_days)
+
+                delivered_qty = item.delivered_kg if item.delivered_kg and item.delivered_kg > 0 else item.qty_kg
+                deltas[stock.stock_id] += delivered_qty
+                stock.purchase_date = purchase_date
+                stock.supplier_order_id = order.order_id
+
+                movement_rows.append({
+                    "stock_id": stock.stock_id,
+                    "buyer_user_id": buyer_user_id,
+                    "crop_id": crop_id,
+                    "movement_type": StockMovementType.PURCHASE,
+                    "quantity_kg": delivered_qty,
+                    "unit_cost_usd": item.unit_price,
+                    "total_cost_usd": item.unit_price * delivered_qty,
+                    "order_id": order.order_id,
+                    "order_item_id": item.order_item_id,
+                    "notes": f"Stock received from order {order.order_number}",
+                    "movement_date": purchase_date,
+                })
+
+        apply_stock_deltas(db, deltas)
+        if movement_rows:
+            db.execute(insert(StockMovement), movement_rows)
+        if commit:
+            db.commit()
+        logger.info(f"Stock synced for {len(orders)} orders: {len(movement_rows)} purchase movements, "
+                    f"{len(new_stocks)} new stock records")
+        return len(movement_rows)
+
     except Exception as e:
-        logger.error(f"Error syncing stock from order {order.order_id}: {e}")
+        logger.error(f"Error syncing stock from orders {[order.order_id for order in orders]}: {e}")
         db.rollback()
         raise
 
 
+def sync_stock_from_order(db: Session, order: Order):
+    """
+    Sync buyer stock when an order is delivered.
+    Creates stock records and purchase movements.
+    """
+    sync_stock_from_orders(db, [order])
+
+
 def record_consumption(
     db: Session,
     buyer_user_id: int,
@@ -131,20 +175,8 @@ def record_consumption(
             logger.warning(f"Stock not found for buyer {buyer_user_id}, crop {crop_id}")
             return
         
-        # Update stock quantity
-        stock.current_quantity_kg = max(0, stock.current_quantity_kg - quantity_kg)
-        
-        # Update stock value
-        if stock.unit_cost_usd:
-            stock.total_value_usd = stock.current_quantity_kg * stock.unit_cost_usd
-        
-        # Mark as inactive if empty
-        if stock.current_quantity_kg <= 0:
-            stock.is_active = False
-            if stock.expiry_date and stock.expiry_date < datetime.utcnow():
-                stock.is_expired = True
-        
-        stock.last_movement_date = datetime.utcnow()
+        # Update quantity, value and active/expired flags in one UPDATE
+        apply_stock_delta(db, stock, -abs(quantity_kg))
         
         # Create consumption movement
         movement = StockMovement(
@@ -191,20 +223,10 @@ def record_waste(
             logger.warning(f"Stock not found for buyer {buyer_user_id}, crop {crop_id}")
             return
         
-        # Update stock quantity
-        stock.current_quantity_kg = max(0, stock.current_quantity_kg - quantity_kg)
-        
-        # Update stock value
-        if stock.unit_cost_usd:
-            stock.total_value_usd = stock.current_quantity_kg * stock.unit_cost_usd
-        
-        # Mark as inactive if empty
-        if stock.current_quantity_kg <= 0:
-            stock.is_active = False
+        # Update quantity, value and active flag in one UPDATE; emptied by waste means expired
+        if apply_stock_delta(db, stock, -abs(quantity_kg)) <= 0:
             stock.is_expired = True
         
-        stock.last_movement_date = datetime.utcnow()
-        
         # Create waste movement
         movement = StockMovement(
             stock_id=stock.stock_id,
@@ -0,0 +1,48 @@
+"""
+Standalone background job runner
+
+    python -m app.worker
+
+Runs the scheduler (alerts, stock history, price alerts, notification
+dispatch) outside the web server; start the API with RUN_SCHEDULER=false
+when using it. Leader election still applies, so running a second worker
+gives a warm standby rather than duplicate jobs.
+"""
+import argparse
+import logging
+import signal
+import sys
+import threading
+
+from .core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the background job scheduler")
+    parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=getattr(logging, settings.LOG_LEVEL.upper()),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    from .services.scheduler import start_scheduler, stop_scheduler
+
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopping.set())
+
+    logger.info(f"Starting {settings.PROJECT_NAME} worker")
+    start_scheduler()
+    try:
+        # Short waits so signals are handled promptly on every platform
+        while not stopping.wait(1):
+            pass
+    finally:
+        stop_scheduler()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
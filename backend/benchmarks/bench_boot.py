@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark
+
+Starts fresh interpreters and measures (a) how long `import app.main` takes
+and (b) how long the startup event takes in each BOOT_MODE, against a
+temporary SQLite database. With --importtime it also lists the slowest
+modules from `python -X importtime`, which is how optional dependencies
+(twilio, apscheduler, reportlab) were spotted on the boot path.
+
+Usage (from backend/):
+    python -m benchmarks.bench_boot
+    python -m benchmarks.bench_boot --runs 10 --importtime
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Run in a child interpreter so every measurement is a cold import
+CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+asyncio.run(app.main.startup_event())
+ready = time.perf_counter()
+asyncio.run(app.main.shutdown_event())
+heavy = [name for name in ("twilio", "apscheduler", "reportlab", "alembic") if name in sys.modules]
+print(json.dumps({"import": imported - started, "startup": ready - imported, "loaded": heavy}))
+"""
+
+
+def run_child(boot_mode: str, database_url: str) -> dict:
+    env = dict(os.environ, BOOT_MODE=boot_mode, DATABASE_URL=database_url,
+               RUN_SCHEDULER="false", LOG_LEVEL="warning", DEBUG="false")
+    output = subprocess.run([sys.executable, "-c", CHILD], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(top: int) -> list:
+    """(cumulative µs, module) for the slowest imports under `import app.main`"""
+    env = dict(os.environ, DATABASE_URL="sqlite://", LOG_LEVEL="warning", DEBUG="false")
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=BACKEND_DIR,
+                            env=env, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), module.strip()))
+    # Top-level packages only; submodules are already in their package's cost
+    rows = [(us, module) for us, module in rows if "." not in module]
+    return sorted(rows, reverse=True)[:top]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts per boot mode")
+    parser.add_argument("--importtime", action="store_true", help="Show the slowest top-level package imports")
+    parser.add_argument("--top", type=int, default=15, help="Rows to show with --importtime")
+    args = parser.parse_args()
+
+    database_url = f"sqlite:///{tempfile.mktemp(suffix='.db', prefix='munda_boot_')}"
+    # Prime the database so "full" measures the steady-state check, not first creation
+    run_child("full", database_url)
+
+    print(f"{'mode':<6} {'import ms':>10} {'startup ms':>11} {'total ms':>9}   optional modules loaded")
+    for mode in ("full", "fast"):
+        results = [run_child(mode, database_url) for _ in range(args.runs)]
+        import_ms = statistics.median(r["import"] for r in results) * 1000
+        startup_ms = statistics.median(r["startup"] for r in results) * 1000
+        loaded = ", ".join(results[-1]["loaded"]) or "-"
+        print(f"{mode:<6} {import_ms:>10.1f} {startup_ms:>11.1f} {import_ms + startup_ms:>9.1f}   {loaded}")
+
+    if args.importtime:
+        print(f"\n{'cumulative ms':>14}  module")
+        for us, module in slowest_imports(args.top):
+            print(f"{us / 1000:>14.1f}  {module}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Login-storm benchmark
+
+Fires bursts of concurrent POST /api/v1/auth/login requests (each one a
+bcrypt verify) while a probe keeps requesting a cheap endpoint, and reports
+the probe's latency when idle and during the storm. With bcrypt running in
+the hash thread pool the probe should barely move. --inline runs bcrypt on
+the event loop the way login used to, for comparison.
+
+Usage (from backend/):
+    python -m benchmarks.bench_login_storm
+    python -m benchmarks.bench_login_storm --inline
+    python -m benchmarks.bench_login_storm --logins 200 --concurrency 12 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=100, help="Logins in the storm")
+    # login uses a sync Session on the event loop; keep this under
+    # DB_POOL_SIZE + DB_MAX_OVERFLOW or checkouts block the loop
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent in-flight logins")
+    parser.add_argument("--users", type=int, default=50, help="Distinct accounts to log in as")
+    parser.add_argument("--rounds", type=int, default=None, help="BCRYPT_ROUNDS (default: settings)")
+    parser.add_argument("--probe", default="/health", help="Endpoint whose latency is watched")
+    parser.add_argument("--probe-interval-ms", type=float, default=10.0, help="Pause between probe requests")
+    parser.add_argument("--inline", action="store_true", help="Run bcrypt on the event loop (old behaviour)")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mktemp(suffix='.db', prefix='munda_login_')}"
+os.environ.setdefault("DEBUG", "false")
+os.environ.setdefault("DB_N_PLUS_ONE_THRESHOLD", "0")
+if ARGS.rounds:
+    os.environ["BCRYPT_ROUNDS"] = str(ARGS.rounds)
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import logging  # noqa: E402
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.core import auth  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import SessionLocal, create_tables  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.user import User, UserRole, UserStatus  # noqa: E402
+
+PASSWORD = "storm-password"
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def seed_users(count: int):
+    hashed = auth.get_password_hash(PASSWORD)
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"name": f"Storm Buyer {i}", "phone": f"+26377{i:07d}", "hashed_password": hashed,
+             "role": UserRole.BUYER, "status": UserStatus.ACTIVE, "is_verified": True}
+            for i in range(count)
+        ])
+        db.commit()
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, interval: float) -> list:
+    """Request the probe endpoint every interval seconds.
+
+    Latency is measured from when the request was due, so time spent waiting
+    for a blocked event loop to wake the probe counts against it.
+    """
+    latencies = []
+    while not stop.is_set():
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        response = await client.get(ARGS.probe)
+        latencies.append(time.perf_counter() - due)
+        response.raise_for_status()
+    return latencies
+
+
+async def storm(client: httpx.AsyncClient) -> float:
+    remaining = ARGS.logins
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            phone = f"+26377{remaining % ARGS.users:07d}"
+            response = await client.post("/api/v1/auth/login", json={"username": phone, "password": PASSWORD})
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(ARGS.concurrency)))
+    return time.perf_counter() - started
+
+
+def summarize(label: str, latencies: list):
+    latencies = sorted(latencies)
+    print(f"{label:<14} {len(latencies):>7} {percentile(latencies, 50) * 1000:>9.1f} "
+          f"{percentile(latencies, 95) * 1000:>9.1f} {latencies[-1] * 1000:>9.1f}")
+
+
+async def main() -> int:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("app.core.auth").setLevel(logging.WARNING)
+    create_tables()
+    seed_users(ARGS.users)
+
+    if ARGS.inline:
+        async def run_inline(func, *args, db=None):
+            return func(*args)
+        auth._run_hash_work = run_inline
+
+    mode = "inline on the event loop" if ARGS.inline else f"thread pool ({settings.PASSWORD_HASH_THREADS} threads)"
+    print(f"bcrypt cost {settings.BCRYPT_ROUNDS}, hashing {mode}; "
+          f"{ARGS.logins} logins at concurrency {ARGS.concurrency}, probing {ARGS.probe}")
+
+    interval = ARGS.probe_interval_ms / 1000
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost", timeout=300) as client:
+        stop = asyncio.Event()
+        idle_probe = asyncio.create_task(probe(client, stop, interval))
+        await asyncio.sleep(1.0)
+        stop.set()
+        idle = await idle_probe
+
+        stop = asyncio.Event()
+        storm_probe = asyncio.create_task(probe(client, stop, interval))
+        elapsed = await storm(client)
+        stop.set()
+        during = await storm_probe
+
+    print(f"\nstorm: {ARGS.logins / elapsed:.1f} logins/s over {elapsed:.2f}s")
+    print(f"\n{'probe':<14} {'samples':>7} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    summarize("idle", idle)
+    summarize("during storm", during)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Per-request middleware overhead: BaseHTTPMiddleware stack vs pure ASGI
+
+Builds three copies of a trivial FastAPI app and drives them directly
+through the ASGI interface, so no HTTP client or socket is involved:
+
+  none    - no middleware (floor)
+  before  - CustomCORSMiddleware (BaseHTTPMiddleware, re.match per call)
+            + @app.middleware("http") timer, as previously in app/main.py
+  after   - CORSTimingMiddleware from app/core/middleware.py
+
+Usage (from backend/):
+    python -m benchmarks.bench_middleware
+    python -m benchmarks.bench_middleware --requests 50000
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi import FastAPI, Request  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from app.core.middleware import CORSTimingMiddleware, OriginMatcher  # noqa: E402
+
+ORIGINS = [
+    "http://localhost:3000",
+    "http://localhost:3001",
+    "https://munda-market-admin.vercel.app",
+    "https://admin.mundamarket.co.zw",
+    "https://buy.mundamarket.co.zw",
+]
+# Mix of exact matches, pattern matches and no Origin header
+REQUEST_ORIGINS = [
+    b"https://buy.mundamarket.co.zw",
+    b"https://munda-market-buyer-git-feature-x.vercel.app",
+    None,
+    b"http://localhost:3001",
+]
+
+
+def _build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def build_baseline() -> FastAPI:
+    """The middleware stack as it was before the pure ASGI rewrite"""
+    app = _build_app()
+
+    def is_origin_allowed(origin):
+        if not origin:
+            return False
+        if origin in ORIGINS:
+            return True
+        if re.match(r"https://.*\.vercel\.app", origin):
+            return True
+        return False
+
+    class CustomCORSMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            origin = request.headers.get("origin")
+            is_allowed = is_origin_allowed(origin) if origin else False
+            response = await call_next(request)
+            if is_allowed and origin:
+                response.headers["Access-Control-Allow-Origin"] = origin
+                response.headers["Access-Control-Allow-Credentials"] = "true"
+                response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, PATCH, OPTIONS"
+                response.headers["Access-Control-Allow-Headers"] = "*"
+                response.headers["Access-Control-Expose-Headers"] = "*"
+            return response
+
+    app.add_middleware(CustomCORSMiddleware)
+
+    @app.middleware("http")
+    async def add_process_time_header(request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        response.headers["X-Process-Time"] = str(time.time() - start_time)
+        return response
+
+    return app
+
+
+def build_asgi() -> FastAPI:
+    app = _build_app()
+    app.add_middleware(
+        CORSTimingMiddleware,
+        origin_matcher=OriginMatcher(ORIGINS, pattern=r"https://[^/]+\.vercel\.app"),
+    )
+    return app
+
+
+async def call(app, origin):
+    headers = [(b"host", b"localhost")]
+    if origin:
+        headers.append((b"origin", origin))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/ping", "raw_path": b"/ping",
+        "root_path": "", "query_string": b"", "headers": headers,
+        "client": ("127.0.0.1", 1234), "server": ("localhost", 80),
+    }
+
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Client stays connected; listeners are cancelled once the response is sent
+        await asyncio.Event().wait()
+
+    status = None
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    assert status == 200, status
+
+
+async def measure(app, total: int) -> list:
+    # Warm up routing, pydantic serializers and the origin cache
+    for i in range(200):
+        await call(app, REQUEST_ORIGINS[i % len(REQUEST_ORIGINS)])
+    samples = []
+    for i in range(total):
+        started = time.perf_counter()
+        await call(app, REQUEST_ORIGINS[i % len(REQUEST_ORIGINS)])
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def main(total: int):
+    results = {}
+    for label, app in (("none", _build_app()), ("before", build_baseline()), ("after", build_asgi())):
+        samples = await measure(app, total)
+        results[label] = statistics.median(samples) * 1e6
+        print(f"{label:<7} median {results[label]:>8.1f} us/request   mean {statistics.mean(samples) * 1e6:>8.1f} us")
+
+    floor = results["none"]
+    print(f"\nmiddleware overhead: before {results['before'] - floor:.1f} us, after {results['after'] - floor:.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000, help="Requests per middleware stack")
+    asyncio.run(main(parser.parse_args().requests))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Email delivery benchmark
+
+Queues an alert fan-out of N emails in the notification outbox and drains it
+through the dispatcher against a local stand-in SMTP server
+(benchmarks/smtp_standin.py) whose --handshake-ms delay models the
+STARTTLS + login cost of a real provider. Compares a new connection per
+message (the old send_email behaviour) with the pooled keep-alive transport.
+
+Usage (from backend/):
+    python -m benchmarks.bench_smtp
+    python -m benchmarks.bench_smtp --messages 1000 --handshake-ms 80 --concurrency 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--handshake-ms", type=float, default=50.0,
+                        help="Per-connection setup latency of the stand-in server")
+    parser.add_argument("--concurrency", type=int, default=4, help="Email workers for the pooled runs")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.smtp_standin import SmtpStandIn  # noqa: E402
+
+SERVER = SmtpStandIn(handshake_delay=ARGS.handshake_ms / 1000).__enter__()
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mktemp(suffix='.db', prefix='munda_smtp_')}"
+os.environ.setdefault("DEBUG", "false")
+os.environ.setdefault("DB_N_PLUS_ONE_THRESHOLD", "0")
+os.environ.update(SMTP_HOST="127.0.0.1", SMTP_PORT=str(SERVER.port), SMTP_USER="bench",
+                  SMTP_PASSWORD="bench", SMTP_STARTTLS="false")
+
+from sqlalchemy import delete, insert  # noqa: E402
+
+from app.core.database import SessionLocal, create_tables  # noqa: E402
+from app.models import NotificationChannel, NotificationOutbox  # noqa: E402
+from app.services.notification_queue import NotificationDispatcher  # noqa: E402
+from app.services.notifications import SmtpEmailTransport  # noqa: E402
+
+
+def timed_run(label: str, transport: SmtpEmailTransport, workers: int):
+    with SessionLocal() as db:
+        db.execute(delete(NotificationOutbox))
+        db.execute(insert(NotificationOutbox), [
+            {"channel": NotificationChannel.EMAIL, "recipient": f"buyer{i}@example.com",
+             "subject": "Munda Market Alert: Low Stock Alert: Tomatoes",
+             "body_text": "Tomatoes stock is below your threshold.", "body_html": "<p>Tomatoes stock is low.</p>"}
+            for i in range(ARGS.messages)
+        ])
+        db.commit()
+
+        dispatcher = NotificationDispatcher({NotificationChannel.EMAIL: transport},
+                                            {NotificationChannel.EMAIL: workers})
+        connections, messages = SERVER.connections, SERVER.messages
+        started = time.perf_counter()
+        counts = dispatcher.dispatch(db, batch_size=ARGS.messages)
+        elapsed = time.perf_counter() - started
+        dispatcher.shutdown()
+    print(f"{label:<28} {elapsed * 1000:>10.1f} {ARGS.messages / elapsed:>10.1f} "
+          f"{SERVER.connections - connections:>12} {SERVER.messages - messages:>9} {counts['sent']:>6}")
+
+
+def main() -> int:
+    create_tables()
+    print(f"{ARGS.messages} emails, {ARGS.handshake_ms:.0f} ms connection setup\n")
+    print(f"{'run':<28} {'ms':>10} {'msg/s':>10} {'connections':>12} {'received':>9} {'sent':>6}")
+    timed_run("connection per message", SmtpEmailTransport(pool_size=0, max_messages_per_connection=1), 1)
+    timed_run("pooled, 1 worker", SmtpEmailTransport(pool_size=1), 1)
+    timed_run(f"pooled, {ARGS.concurrency} workers",
+              SmtpEmailTransport(pool_size=ARGS.concurrency), ARGS.concurrency)
+    SERVER.__exit__(None, None, None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""
+Synthetic marketplace data for benchmarks
+
+Builds on the reference data from app/utils/seed_data.py (grade schemas,
+crops, admin user) and bulk-inserts farmers, farms, production plans,
+lots, listings, buyers, orders, buyer stock, stock movements, inventory
+preferences and alerts at a configurable scale. Rows go in with
+executemany INSERT ... RETURNING in chunks, never one ORM object per row.
+
+    from benchmarks.seed import SCALES, seed_marketplace
+    with SessionLocal() as db:
+        result = seed_marketplace(db, SCALES["small"])
+"""
+import contextlib
+import io
+import random
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Buyer, BuyerInventoryPreference, BuyerStock, Crop, Farm, InventoryAlert, Listing, Lot, Order,
+    OrderItem, ProductionPlan, StockMovement, User,
+)
+from app.models.buyer import BuyerStatus
+from app.models.buyer_inventory import AlertSeverity, AlertStatus
+from app.models.buyer_stock import StockMovementType
+from app.models.order import OrderStatus
+from app.models.production import LotStatus, ProductionStatus
+from app.models.user import UserRole, UserStatus
+from app.utils.seed_data import create_admin_user, create_crops, create_grade_schemas
+
+CHUNK_SIZE = 5000
+DISTRICTS = [("Harare", "Harare"), ("Bulawayo", "Bulawayo"), ("Mutare", "Manicaland"),
+             ("Gweru", "Midlands"), ("Masvingo", "Masvingo"), ("Chinhoyi", "Mashonaland West")]
+
+
+@dataclass(frozen=True)
+class SeedScale:
+    farmers: int
+    buyers: int
+    crops: int
+    plans_per_farmer: int
+    lots_per_plan: int
+    orders: int
+    items_per_order: int
+    stocks_per_buyer: int
+    movements_per_stock: int
+    preferences_per_buyer: int
+    alerts_per_buyer: int
+
+
+SCALES: Dict[str, SeedScale] = {
+    "tiny": SeedScale(farmers=10, buyers=5, crops=10, plans_per_farmer=2, lots_per_plan=2, orders=100,
+                      items_per_order=2, stocks_per_buyer=5, movements_per_stock=10,
+                      preferences_per_buyer=5, alerts_per_buyer=5),
+    "small": SeedScale(farmers=100, buyers=50, crops=30, plans_per_farmer=3, lots_per_plan=2, orders=2000,
+                       items_per_order=3, stocks_per_buyer=20, movements_per_stock=20,
+                       preferences_per_buyer=15, alerts_per_buyer=20),
+    "medium": SeedScale(farmers=1000, buyers=300, crops=60, plans_per_farmer=3, lots_per_plan=3, orders=20000,
+                        items_per_order=3, stocks_per_buyer=40, movements_per_stock=40,
+                        preferences_per_buyer=30, alerts_per_buyer=50),
+    "large": SeedScale(farmers=5000, buyers=1000, crops=100, plans_per_farmer=4, lots_per_plan=3, orders=100000,
+                       items_per_order=4, stocks_per_buyer=60, movements_per_stock=60,
+                       preferences_per_buyer=40, alerts_per_buyer=100),
+}
+
+
+@dataclass
+class SeedResult:
+    scale: dict
+    staff_user_id: int
+    buyer_user_id: int
+    row_counts: Dict[str, int]
+
+
+def _bulk_insert(db: Session, model, rows: List[dict], pk) -> List[int]:
+    """INSERT rows in chunks and return their primary keys in input order"""
+    ids: List[int] = []
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[start:start + CHUNK_SIZE]
+        stmt = insert(model).returning(pk, sort_by_parameter_order=True)
+        ids.extend(db.scalars(stmt, chunk).all())
+    return ids
+
+
+def _ensure_crops(db: Session, count: int, rng: random.Random) -> List[dict]:
+    """Reference crops from seed_data plus synthetic ones up to count"""
+    existing = db.execute(select(Crop.crop_id, Crop.base_price_usd_per_kg, Crop.perishability_days)).all()
+    missing = count - len(existing)
+    if missing > 0:
+        _bulk_insert(db, Crop, [
+            {
+                "name": f"bench-crop-{i}",
+                "category": rng.choice(["vegetable", "fruit", "grain"]),
+                "unit": "kg",
+                "perishability_days": rng.randint(3, 60),
+                "base_price_usd_per_kg": round(rng.uniform(0.3, 4.0), 2),
+                "is_active": True,
+            }
+            for i in range(missing)
+        ], Crop.crop_id)
+        existing = db.execute(select(Crop.crop_id, Crop.base_price_usd_per_kg, Crop.perishability_days)).all()
+    return [
+        {"crop_id": crop_id, "price": price or 1.0, "shelf_life": shelf_life or 14}
+        for crop_id, price, shelf_life in existing[:count]
+    ]
+
+
+def seed_marketplace(db: Session, scale: SeedScale, random_seed: int = 42) -> SeedResult:
+    """Populate an empty database with a synthetic marketplace of the given scale"""
+    rng = random.Random(random_seed)
+    now = datetime.utcnow()
+    counts: Dict[str, int] = {}
+
+    # Reference data; the seed_data helpers print progress, keep benchmark output clean
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_grade_schemas(db)
+        create_crops(db)
+        create_admin_user(db)
+    staff_user_id = db.scalar(select(User.user_id).where(User.role == UserRole.ADMIN))
+    crops = _ensure_crops(db, scale.crops, rng)
+    counts["crops"] = len(crops)
+
+    # Farmers, farms, production plans, lots and listings
+    farmer_ids = _bulk_insert(db, User, [
+        {"role": UserRole.FARMER, "name": f"Farmer {i}", "phone": f"+26377{i:07d}",
+         "hashed_password": "!", "status": UserStatus.ACTIVE, "is_verified": True}
+        for i in range(scale.farmers)
+    ], User.user_id)
+    farm_ids = _bulk_insert(db, Farm, [
+        {"user_id": user_id, "name": f"Farm {i}", "geohash": f"kv{i:06d}",
+         "district": DISTRICTS[i % len(DISTRICTS)][0], "province": DISTRICTS[i % len(DISTRICTS)][1],
+         "verification_status": "verified"}
+        for i, user_id in enumerate(farmer_ids)
+    ], Farm.farm_id)
+
+    plan_rows = []
+    for farm_id in farm_ids:
+        for _ in range(scale.plans_per_farmer):
+            crop = rng.choice(crops)
+            harvest_start = now + timedelta(days=rng.randint(-30, 60))
+            plan_rows.append({
+                "farm_id": farm_id, "crop_id": crop["crop_id"], "hectares": round(rng.uniform(0.5, 20), 1),
+                "expected_harvest_window_start": harvest_start,
+                "expected_harvest_window_end": harvest_start + timedelta(days=14),
+                "expected_yield_kg": rng.randint(1000, 50000), "target_price_per_kg": crop["price"],
+                "status": rng.choice([ProductionStatus.GROWING, ProductionStatus.HARVEST_READY,
+                                      ProductionStatus.HARVESTING, ProductionStatus.PLANNED]),
+            })
+    plan_ids = _bulk_insert(db, ProductionPlan, plan_rows, ProductionPlan.plan_id)
+
+    lot_rows = []
+    lot_prices = []
+    for plan_id, plan in zip(plan_ids, plan_rows):
+        for _ in range(scale.lots_per_plan):
+            lot_rows.append({
+                "plan_id": plan_id, "lot_number": f"LOT-{len(lot_rows):08d}", "grade": rng.choice("ABC"),
+                "available_kg": float(rng.randint(200, 5000)), "reserved_kg": float(rng.randint(0, 100)),
+                "sold_kg": float(rng.randint(0, 100)), "min_order_kg": 10.0,
+                "harvest_date": now - timedelta(days=rng.randint(0, 10)),
+                "current_status": LotStatus.AVAILABLE if rng.random() < 0.8 else LotStatus.SOLD,
+            })
+            lot_prices.append(plan["target_price_per_kg"])
+    lot_ids = _bulk_insert(db, Lot, lot_rows, Lot.lot_id)
+
+    listing_rows = []
+    for lot_id, lot, base in zip(lot_ids, lot_rows, lot_prices):
+        listing_rows.append({
+            "lot_id": lot_id, "base_price_per_kg": base, "sell_price_per_kg": round(base * 1.2, 2),
+            "markup_amount_per_kg": round(base * 0.2, 2), "visible_from": now - timedelta(days=5),
+            "is_active": lot["current_status"] == LotStatus.AVAILABLE,
+        })
+    listing_ids = _bulk_insert(db, Listing, listing_rows, Listing.listing_id)
+    counts.update(farmers=len(farmer_ids), production_plans=len(plan_ids), lots=len(lot_ids),
+                  listings=len(listing_ids))
+
+    # Buyers
+    buyer_user_ids = _bulk_insert(db, User, [
+        {"role": UserRole.BUYER, "name": f"Buyer {i}", "phone": f"+26371{i:07d}",
+         "hashed_password": "!", "status": UserStatus.ACTIVE, "is_verified": True}
+        for i in range(scale.buyers)
+    ], User.user_id)
+    buyer_ids = _bulk_insert(db, Buyer, [
+        {"user_id": user_id, "company_name": f"Buyer Co {i}", "status": BuyerStatus.ACTIVE, "is_verified": True}
+        for i, user_id in enumerate(buyer_user_ids)
+    ], Buyer.buyer_id)
+    counts["buyers"] = len(buyer_ids)
+
+    # Orders and order items
+    order_statuses = list(OrderStatus)
+    order_rows = []
+    for i in range(scale.orders):
+        district, province = DISTRICTS[i % len(DISTRICTS)]
+        created = now - timedelta(days=rng.randint(0, 180), minutes=rng.randint(0, 1440))
+        total = round(rng.uniform(20, 2000), 2)
+        order_rows.append({
+            "order_number": f"ORD-{i:09d}", "buyer_id": rng.choice(buyer_ids), "subtotal": total, "total": total,
+            "status": rng.choice(order_statuses), "delivery_address_line1": "1 Main St",
+            "delivery_city": district, "delivery_district": district, "delivery_province": province,
+            "created_at": created,
+        })
+    order_ids = _bulk_insert(db, Order, order_rows, Order.order_id)
+
+    item_rows = []
+    for order_id in order_ids:
+        for _ in range(scale.items_per_order):
+            qty = float(rng.randint(10, 500))
+            price = round(rng.uniform(0.5, 5.0), 2)
+            item_rows.append({"order_id": order_id, "listing_id": rng.choice(listing_ids), "qty_kg": qty,
+                              "unit_price": price, "line_total": round(qty * price, 2)})
+    _bulk_insert(db, OrderItem, item_rows, OrderItem.order_item_id)
+    counts.update(orders=len(order_ids), order_items=len(item_rows))
+
+    # Buyer stock, movements, inventory preferences and alerts
+    stock_rows = []
+    preference_rows = []
+    alert_rows = []
+    for user_id in buyer_user_ids:
+        for crop in rng.sample(crops, min(scale.stocks_per_buyer, len(crops))):
+            qty = float(rng.randint(0, 800))
+            unit_cost = round(crop["price"] * rng.uniform(0.8, 1.2), 2)
+            stock_rows.append({
+                "buyer_user_id": user_id, "crop_id": crop["crop_id"], "current_quantity_kg": qty,
+                "reserved_quantity_kg": 0.0, "unit_cost_usd": unit_cost, "total_value_usd": round(qty * unit_cost, 2),
+                "purchase_date": now - timedelta(days=rng.randint(0, 20)),
+                "expiry_date": now + timedelta(days=rng.randint(-3, crop["shelf_life"])),
+                "shelf_life_days": crop["shelf_life"], "reorder_point_kg": float(rng.randint(50, 300)),
+                "lead_time_days": 3, "is_active": True,
+            })
+        for crop in rng.sample(crops, min(scale.preferences_per_buyer, len(crops))):
+            preference_rows.append({
+                "buyer_user_id": user_id, "crop_id": crop["crop_id"],
+                "min_stock_threshold_kg": float(rng.randint(100, 2000)),
+                "enable_low_stock_alerts": True, "enable_harvest_alerts": True,
+                "enable_price_alerts": rng.random() < 0.3, "is_favorite": rng.random() < 0.2,
+            })
+        for _ in range(scale.alerts_per_buyer):
+            crop = rng.choice(crops)
+            alert_rows.append({
+                "buyer_user_id": user_id, "crop_id": crop["crop_id"],
+                "alert_type": rng.choice(["low_stock", "harvest_window", "price_change"]),
+                "severity": rng.choice(list(AlertSeverity)),
+                "status": AlertStatus.ACTIVE if rng.random() < 0.6 else AlertStatus.RESOLVED,
+                "title": "Benchmark alert", "message": "Synthetic alert", "alert_data": "{}",
+                "created_at": now - timedelta(days=rng.randint(0, 60)),
+            })
+    stock_ids = _bulk_insert(db, BuyerStock, stock_rows, BuyerStock.stock_id)
+    _bulk_insert(db, BuyerInventoryPreference, preference_rows, BuyerInventoryPreference.preference_id)
+    _bulk_insert(db, InventoryAlert, alert_rows, InventoryAlert.alert_id)
+
+    movement_types = [StockMovementType.CONSUMPTION] * 6 + [StockMovementType.PURCHASE] * 3 + [StockMovementType.WASTE]
+    movement_rows = []
+    for stock_id, stock in zip(stock_ids, stock_rows):
+        for _ in range(scale.movements_per_stock):
+            movement_type = rng.choice(movement_types)
+            qty = float(rng.randint(5, 80))
+            movement_rows.append({
+                "stock_id": stock_id, "buyer_user_id": stock["buyer_user_id"], "crop_id": stock["crop_id"],
+                "movement_type": movement_type,
+                "quantity_kg": qty if movement_type == StockMovementType.PURCHASE else -qty,
+                "unit_cost_usd": stock["unit_cost_usd"],
+                "movement_date": now - timedelta(days=rng.randint(0, 60), minutes=rng.randint(0, 1440)),
+            })
+    _bulk_insert(db, StockMovement, movement_rows, StockMovement.movement_id)
+    counts.update(buyer_stock=len(stock_ids), stock_movements=len(movement_rows),
+                  inventory_preferences=len(preference_rows), inventory_alerts=len(alert_rows))
+
+    db.commit()
+    return SeedResult(scale=asdict(scale), staff_user_id=staff_user_id,
+                      buyer_user_id=buyer_user_ids[0], row_counts=counts)
@@ -0,0 +1,108 @@
+"""
+Minimal local SMTP server for benchmarks and tests (an aiosmtpd-style sink)
+
+Speaks just enough ESMTP for smtplib: EHLO/HELO, AUTH PLAIN/LOGIN (any
+credentials), MAIL, RCPT, DATA, RSET, NOOP and QUIT. No STARTTLS, so
+clients run with SMTP_STARTTLS=false; `handshake_delay` stands in for the
+TLS handshake and login round trips a real provider costs per connection.
+
+    with SmtpStandIn(handshake_delay=0.05) as server:
+        ...  # SMTP_HOST=127.0.0.1, SMTP_PORT=server.port
+        print(server.connections, server.messages)
+"""
+import socket
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server.standin
+        server._opened(self.connection)
+        try:
+            time.sleep(server.handshake_delay)
+            self.reply("220 standin ESMTP")
+            while True:
+                raw = self.rfile.readline()
+                if not raw:
+                    return
+                command = raw.decode(errors="replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+                if verb == "EHLO":
+                    self.wfile.write(b"250-standin\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+                elif verb == "AUTH":
+                    if command.upper().startswith("AUTH LOGIN"):
+                        self.reply("334 VXNlcm5hbWU6")
+                        self.rfile.readline()
+                        self.reply("334 UGFzc3dvcmQ6")
+                        self.rfile.readline()
+                    self.reply("235 2.7.0 Authentication successful")
+                elif verb == "DATA":
+                    self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    while self.rfile.readline() not in (b".\r\n", b""):
+                        pass
+                    server._received()
+                    self.reply("250 2.0.0 Ok: queued")
+                elif verb == "QUIT":
+                    self.reply("221 2.0.0 Bye")
+                    return
+                else:  # HELO, MAIL, RCPT, RSET, NOOP
+                    self.reply("250 2.0.0 Ok")
+        except OSError:
+            pass
+        finally:
+            server._closed(self.connection)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SmtpStandIn:
+    """Threaded SMTP sink on 127.0.0.1 that counts connections and messages"""
+
+    def __init__(self, handshake_delay: float = 0.0, port: int = 0):
+        self.handshake_delay = handshake_delay
+        self.connections = 0
+        self.messages = 0
+        self._open = set()
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", port), _Handler)
+        self._server.standin = self
+        self.port = self._server.server_address[1]
+
+    def _opened(self, sock):
+        with self._lock:
+            self.connections += 1
+            self._open.add(sock)
+
+    def _closed(self, sock):
+        with self._lock:
+            self._open.discard(sock)
+
+    def _received(self):
+        with self._lock:
+            self.messages += 1
+
+    def drop_connections(self):
+        """Close every client connection, like a server timing out idle sessions"""
+        with self._lock:
+            open_sockets = list(self._open)
+        for sock in open_sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,135 @@
+"""
+Local stand-in for the SMS gateway and the WhatsApp Cloud API.
+
+Accepts JSON POSTs on any path, logs them and answers like a provider:
+202 with a message id, 429 when more than --rate-limit requests arrive in
+a second, and 503 for a --fail-rate fraction of requests.
+
+Usage (from backend/):
+  python scripts/sms_gateway_stub.py --port 8025 --latency-ms 150 --rate-limit 10
+
+then run the API or scheduler with:
+  SMS_PROVIDER=http
+  SMS_GATEWAY_URL=http://127.0.0.1:8025/sms
+  WHATSAPP_API_URL=http://127.0.0.1:8025/whatsapp/messages
+
+Tests and benchmarks can run it in-process:
+  with GatewayStub(latency=0.05) as gateway:
+      ...  # gateway.url("/sms"), gateway.received
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like a real provider
+
+    def do_POST(self):
+        gateway = self.server.gateway
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with gateway._lock:
+            gateway._active += 1
+            gateway.peak_concurrency = max(gateway.peak_concurrency, gateway._active)
+        try:
+            time.sleep(gateway.latency)
+            status, reply = gateway._handle(self.path, self.headers.get("Authorization"), body)
+        finally:
+            with gateway._lock:
+                gateway._active -= 1
+        payload = json.dumps(reply).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.gateway.verbose:
+            super().log_message(format, *args)
+
+
+class GatewayStub:
+    """Threaded HTTP messaging gateway on 127.0.0.1 that records what it receives"""
+
+    def __init__(self, port: int = 0, latency: float = 0.0, rate_limit: int = 0, fail_rate: float = 0.0,
+                 verbose: bool = False):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.fail_rate = fail_rate
+        self.verbose = verbose
+        self.received = []  # (path, authorization header, json body)
+        self.rejected = 0
+        self.peak_concurrency = 0
+        self._active = 0
+        self._window = (0, 0)  # (second, requests in it)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.gateway = self
+        self.port = self._server.server_address[1]
+
+    def url(self, path: str = "/sms") -> str:
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def _handle(self, path: str, authorization, body: bytes):
+        try:
+            message = json.loads(body or b"{}")
+        except ValueError:
+            return 400, {"error": "invalid JSON"}
+        if not message.get("to"):
+            return 400, {"error": "missing 'to'"}
+
+        with self._lock:
+            second = int(time.monotonic())
+            window_second, count = self._window
+            count = count + 1 if window_second == second else 1
+            self._window = (second, count)
+            if self.rate_limit and count > self.rate_limit:
+                self.rejected += 1
+                return 429, {"error": "rate limit exceeded"}
+            if self.fail_rate and random.random() < self.fail_rate:
+                self.rejected += 1
+                return 503, {"error": "temporarily unavailable"}
+            self.received.append((path, authorization, message))
+
+        if self.verbose:
+            print(f"{path} -> {message.get('to')}: {json.dumps(message)[:120]}")
+        message_id = f"stub-{uuid.uuid4().hex[:12]}"
+        if "messaging_product" in message:
+            return 200, {"messaging_product": "whatsapp", "messages": [{"id": message_id}]}
+        return 202, {"id": message_id, "status": "queued"}
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SMS/WhatsApp gateway stand-in")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="Delay before each reply")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests per second before answering 429 (0: none)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    gateway = GatewayStub(args.port, args.latency_ms / 1000, args.rate_limit, args.fail_rate, verbose=True)
+    print(f"SMS gateway stub listening on {gateway.url('/sms')} (WhatsApp: {gateway.url('/whatsapp/messages')})")
+    try:
+        gateway._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gateway._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Tests for partitioned alert generation in services/alert_partitions.py
+"""
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core.database import Base  # noqa: E402
+from app.models import BuyerInventoryPreference, InventoryAlert, NotificationOutbox  # noqa: E402
+from app.services.alert_partitions import buyer_partitions, generate_inventory_alerts_partitioned  # noqa: E402
+from app.services.inventory_alerts import generate_inventory_alerts  # noqa: E402
+from benchmarks.seed import SCALES, seed_marketplace  # noqa: E402
+
+
+def seeded_engine(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        seed_marketplace(db, SCALES["tiny"])
+        db.execute(update(BuyerInventoryPreference).values(min_stock_threshold_kg=1e9))
+        db.commit()
+    return engine
+
+
+def alert_rows(db):
+    return sorted(db.execute(select(
+        InventoryAlert.buyer_user_id, InventoryAlert.crop_id, InventoryAlert.alert_type,
+        InventoryAlert.severity, InventoryAlert.status, InventoryAlert.message,
+    )).all())
+
+
+@pytest.fixture()
+def engines(tmp_path):
+    partitioned, single = seeded_engine(tmp_path / "partitioned.db"), seeded_engine(tmp_path / "single.db")
+    yield partitioned, single
+    partitioned.dispose()
+    single.dispose()
+
+
+def test_partitions_cover_every_buyer_once(engines):
+    engine, _ = engines
+    with Session(engine) as db:
+        buyers = set(db.scalars(select(BuyerInventoryPreference.buyer_user_id).where(
+            BuyerInventoryPreference.enable_low_stock_alerts == True)))
+        ranges = buyer_partitions(db, 3)
+    assert len(ranges) == 3
+    assert all(first <= last < next_first for (first, last), (next_first, _) in zip(ranges, ranges[1:]))
+    covered = [buyer for buyer in buyers if any(first <= buyer <= last for first, last in ranges)]
+    assert sorted(covered) == sorted(buyers)
+
+
+def test_partitioned_run_matches_a_single_pass_and_is_idempotent(engines):
+    partitioned, single = engines
+    with Session(partitioned) as db:
+        result = generate_inventory_alerts_partitioned(db, partitions=3, workers=2)
+    with Session(single) as db:
+        expected = generate_inventory_alerts(db)
+
+    assert {key: result[key] for key in expected} == expected
+    assert len(result["partitions"]) == 3
+    assert all(part["seconds"] > 0 and part["attempts"] == 1 for part in result["partitions"])
+    with Session(partitioned) as db, Session(single) as other:
+        assert alert_rows(db) == alert_rows(other)
+        outbox = db.scalar(select(func.count()).select_from(NotificationOutbox))
+
+    # A second run only refreshes what the first created
+    with Session(partitioned) as db:
+        again = generate_inventory_alerts_partitioned(db, partitions=3, workers=2)
+        assert again["alerts_created"] == 0
+        assert db.scalar(select(func.count()).select_from(NotificationOutbox)) == outbox
+
+
+def test_failed_partitions_are_retried_without_duplicates(engines, tmp_path):
+    engine, single = engines
+    with Session(engine) as db:
+        # Workers can't open this database, so every partition fails there and is retried here
+        result = generate_inventory_alerts_partitioned(
+            db, partitions=2, workers=1, database_url=f"sqlite:///{tmp_path / 'missing' / 'nowhere.db'}")
+    assert [part["attempts"] for part in result["partitions"]] == [2, 2]
+    with Session(single) as db:
+        expected = generate_inventory_alerts(db)
+    assert result["alerts_created"] == expected["alerts_created"]
+    with Session(engine) as db, Session(single) as other:
+        assert alert_rows(db) == alert_rows(other)
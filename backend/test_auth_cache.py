@@ -0,0 +1,102 @@
+"""
+Tests for the verified-token and principal caches in app/core/auth.py
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core.auth import clear_auth_caches, create_access_token, get_current_user  # noqa: E402
+from app.core.database import Base  # noqa: E402
+from app.core.query_stats import track_queries  # noqa: E402
+from app.models.user import User, UserRole, UserStatus  # noqa: E402
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'auth.db'}")
+    Base.metadata.create_all(engine)
+    clear_auth_caches()
+    yield engine
+    clear_auth_caches()
+    engine.dispose()
+
+
+@pytest.fixture()
+def user_id(engine):
+    with Session(engine) as db:
+        user = User(name="Buyer", phone="+263770000001", hashed_password="x",
+                    role=UserRole.BUYER, status=UserStatus.ACTIVE)
+        db.add(user)
+        db.commit()
+        return user.user_id
+
+
+def authenticate(engine, token: str) -> tuple:
+    """Run get_current_user in a fresh session; returns (user name, queries issued)"""
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    with Session(engine) as db, track_queries() as stats:
+        user = asyncio.run(get_current_user(credentials=credentials, db=db))
+        return user.name, stats.count
+
+
+def bearer(user_id: int) -> str:
+    return create_access_token({"sub": str(user_id), "role": UserRole.BUYER.value})
+
+
+def test_repeat_requests_skip_the_database(engine, user_id):
+    token = bearer(user_id)
+    assert authenticate(engine, token) == ("Buyer", 1)
+    assert authenticate(engine, token) == ("Buyer", 0)
+
+
+def test_cached_principal_is_attached_to_the_request_session(engine, user_id):
+    token = bearer(user_id)
+    authenticate(engine, token)
+
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    with Session(engine) as db:
+        user = asyncio.run(get_current_user(credentials=credentials, db=db))
+        user.name = "Renamed"
+        db.commit()
+
+    # The commit evicted the cached copy, so the next request sees the change
+    assert authenticate(engine, token) == ("Renamed", 1)
+
+
+def test_suspension_takes_effect_immediately(engine, user_id):
+    token = bearer(user_id)
+    authenticate(engine, token)
+
+    with Session(engine) as db:
+        db.get(User, user_id).status = UserStatus.SUSPENDED
+        db.commit()
+
+    with pytest.raises(HTTPException) as excinfo:
+        authenticate(engine, token)
+    assert excinfo.value.status_code == 401
+
+
+def test_rolled_back_changes_keep_the_cache(engine, user_id):
+    token = bearer(user_id)
+    authenticate(engine, token)
+
+    with Session(engine) as db:
+        db.get(User, user_id).status = UserStatus.SUSPENDED
+        db.flush()
+        db.rollback()
+
+    assert authenticate(engine, token) == ("Buyer", 0)
+
+
+def test_invalid_tokens_are_rejected(engine, user_id):
+    with pytest.raises(HTTPException) as excinfo:
+        authenticate(engine, bearer(user_id) + "x")
+    assert excinfo.value.status_code == 401
@@ -0,0 +1,104 @@
+"""
+Tests for event-driven alert evaluation (alert_dirty_crops) in services/inventory_alerts.py
+"""
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core.database import Base  # noqa: E402
+from app.models import (  # noqa: E402
+    AlertDirtyCrop, BuyerInventoryPreference, InventoryAlert, Listing, Lot, ProductionPlan,
+)
+from app.services.inventory_alerts import process_dirty_crops  # noqa: E402
+from benchmarks.seed import SCALES, seed_marketplace  # noqa: E402
+
+
+@pytest.fixture()
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dirty.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed_marketplace(session, SCALES["tiny"])
+        session.execute(update(BuyerInventoryPreference).values(min_stock_threshold_kg=1e9))
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def dirty_crops(db) -> set:
+    return set(db.scalars(select(AlertDirtyCrop.crop_id)))
+
+
+def active_lot_with_crop(db):
+    return db.execute(
+        select(Lot, ProductionPlan.crop_id)
+        .join(Listing, Listing.lot_id == Lot.lot_id)
+        .join(ProductionPlan, ProductionPlan.plan_id == Lot.plan_id)
+        .where(Listing.is_active == True)
+        .limit(1)
+    ).one()
+
+
+def test_stock_changes_mark_the_crop(db):
+    lot, crop_id = active_lot_with_crop(db)
+    lot.reserved_kg += 10
+    db.commit()
+    assert dirty_crops(db) == {crop_id}
+
+
+def test_listing_changes_mark_the_crop(db):
+    lot, crop_id = active_lot_with_crop(db)
+    listing = db.scalars(select(Listing).where(Listing.lot_id == lot.lot_id)).first()
+    listing.is_active = False
+    db.commit()
+    assert dirty_crops(db) == {crop_id}
+
+
+def test_moving_stock_marks_the_old_and_new_crop(db):
+    lot, crop_id = active_lot_with_crop(db)
+    other_plan = db.scalars(select(ProductionPlan).where(ProductionPlan.crop_id != crop_id)).first()
+    lot.plan_id = other_plan.plan_id
+    db.commit()
+    assert dirty_crops(db) == {crop_id, other_plan.crop_id}
+
+    db.query(AlertDirtyCrop).delete()
+    db.commit()
+    back_lot = db.scalars(select(Lot).join(ProductionPlan).where(ProductionPlan.crop_id == crop_id)).first()
+    listing = db.scalars(select(Listing).where(Listing.lot_id == lot.lot_id)).first()
+    listing.lot_id = back_lot.lot_id
+    db.commit()
+    assert dirty_crops(db) == {crop_id, other_plan.crop_id}
+
+
+def test_irrelevant_changes_and_rollbacks_mark_nothing(db):
+    lot, _ = active_lot_with_crop(db)
+    lot.description = "Freshly graded"
+    db.commit()
+    assert dirty_crops(db) == set()
+
+    lot.sold_kg += 5
+    db.flush()
+    db.rollback()
+    assert dirty_crops(db) == set()
+
+
+def test_processing_evaluates_only_dirty_crops(db):
+    lot, crop_id = active_lot_with_crop(db)
+    lot.available_kg += 1
+    db.commit()
+
+    assert process_dirty_crops(db, batch_size=1) == 1
+    assert dirty_crops(db) == set()
+
+    alert_crops = set(db.scalars(
+        select(InventoryAlert.crop_id).where(InventoryAlert.alert_type == "low_stock",
+                                             InventoryAlert.title.like("Low Stock Alert:%"))
+    ))
+    assert alert_crops == {crop_id}
+    assert db.scalar(select(func.count()).select_from(AlertDirtyCrop)) == 0
+    assert process_dirty_crops(db) == 0
@@ -0,0 +1,231 @@
+"""
+Tests for Idempotency-Key handling in services/idempotency.py on POST
+/orders/ and POST /buyer-inventory/stock/movements, including concurrent
+duplicate submissions
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.api.v1.endpoints import orders  # noqa: E402
+from app.api.v1.endpoints.buyer_inventory import StockMovementCreate, create_stock_movement  # noqa: E402
+from app.core.database import Base, create_sync_engine  # noqa: E402
+from app.models import Buyer, Crop, IdempotencyKey, StockMovement  # noqa: E402
+from app.models.buyer_stock import StockMovementType  # noqa: E402
+from app.services import idempotency  # noqa: E402
+from app.services.idempotency import REPLAY_HEADER, expire_idempotency_keys  # noqa: E402
+from benchmarks.seed import SCALES, seed_marketplace  # noqa: E402
+
+ORDER = orders.OrderIn(items=[orders.OrderItemIn(id="1", name="Tomatoes", price=1.2, qtyKg=50)],
+                       delivery_district="Harare")
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = create_sync_engine(f"sqlite:///{tmp_path / 'idempotency.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture()
+def orders_file(tmp_path, monkeypatch):
+    path = tmp_path / "orders.json"
+    monkeypatch.setattr(orders, "ORDERS_FILE", str(path))
+    return path
+
+
+def submit(sessions, key, order=ORDER, caller_id=None):
+    with sessions() as db:
+        return asyncio.run(orders.submit_order(order, idempotency_key=key, caller_id=caller_id, db=db))
+
+
+def body(response):
+    return json.loads(response.body) if isinstance(response, JSONResponse) else response
+
+
+def run_concurrently(count, call):
+    barrier = threading.Barrier(count)
+    outcomes = [None] * count
+
+    def worker(index):
+        barrier.wait()
+        try:
+            outcomes[index] = call()
+        except HTTPException as e:
+            outcomes[index] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_concurrent_duplicate_orders_run_once(engine, orders_file, monkeypatch):
+    sessions = sessionmaker(bind=engine)
+    preview = orders.preview_order
+
+    async def slow_preview(order):
+        time.sleep(0.2)  # keep the first request in progress while the duplicates arrive
+        return await preview(order)
+
+    monkeypatch.setattr(orders, "preview_order", slow_preview)
+    outcomes = run_concurrently(8, lambda: submit(sessions, "order-abc"))
+
+    assert len(json.loads(orders_file.read_text())) == 1
+    [first] = [o for o in outcomes if isinstance(o, dict)]
+    rejected = [o for o in outcomes if isinstance(o, HTTPException)]
+    assert all(e.status_code == 409 for e in rejected)
+    assert all(body(o) == first for o in outcomes if isinstance(o, JSONResponse))
+
+    # A retry after the first finished gets its response replayed
+    replay = submit(sessions, "order-abc")
+    assert isinstance(replay, JSONResponse) and replay.headers[REPLAY_HEADER] == "true"
+    assert body(replay) == first
+    assert len(json.loads(orders_file.read_text())) == 1
+
+    # No key: runs every time
+    submit(sessions, None)
+    submit(sessions, None)
+    assert len(json.loads(orders_file.read_text())) == 3
+
+
+def test_keys_are_scoped_to_the_caller(engine, orders_file):
+    sessions = sessionmaker(bind=engine)
+    changed = orders.OrderIn(items=[orders.OrderItemIn(id="1", name="Tomatoes", price=1.2, qtyKg=60)])
+
+    # Signed-in callers: another user's identical key is a separate request,
+    # and reusing your own key with a different body is rejected
+    first = submit(sessions, "order-1", caller_id=1)
+    assert isinstance(submit(sessions, "order-1", caller_id=2), dict)
+    assert body(submit(sessions, "order-1", caller_id=1)) == first
+    with pytest.raises(HTTPException) as error:
+        submit(sessions, "order-1", changed, caller_id=1)
+    assert error.value.status_code == 422
+    assert len(json.loads(orders_file.read_text())) == 2
+
+    # Anonymous callers: the same key with a different body is another client's order
+    submit(sessions, "order-1")
+    assert isinstance(submit(sessions, "order-1", changed), dict)
+    assert len(json.loads(orders_file.read_text())) == 4
+
+
+def test_failed_request_releases_its_key(engine, orders_file, monkeypatch):
+    sessions = sessionmaker(bind=engine)
+
+    async def broken_preview(order):
+        raise RuntimeError("pricing unavailable")
+
+    monkeypatch.setattr(orders, "preview_order", broken_preview)
+    with pytest.raises(RuntimeError):
+        submit(sessions, "order-retry")
+    monkeypatch.undo()
+    monkeypatch.setattr(orders, "ORDERS_FILE", str(orders_file))
+
+    assert isinstance(submit(sessions, "order-retry"), dict)
+    assert len(json.loads(orders_file.read_text())) == 1
+
+
+def test_expired_and_abandoned_keys_are_reclaimed(engine, orders_file):
+    sessions = sessionmaker(bind=engine)
+    submit(sessions, "order-old")
+    submit(sessions, "order-crashed")
+    with Session(engine) as db:
+        past = datetime.utcnow() - timedelta(hours=1)
+        db.execute(update(IdempotencyKey).where(IdempotencyKey.key == "order-old").values(expires_at=past))
+        # As if the process died mid-request
+        db.execute(update(IdempotencyKey).where(IdempotencyKey.key == "order-crashed")
+                   .values(status="IN_PROGRESS", locked_at=past))
+        db.commit()
+
+    assert isinstance(submit(sessions, "order-old"), dict)
+    assert isinstance(submit(sessions, "order-crashed"), dict)
+    assert len(json.loads(orders_file.read_text())) == 4
+
+    with Session(engine) as db:
+        db.execute(update(IdempotencyKey).values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.commit()
+        assert expire_idempotency_keys(db) == 2
+        assert db.scalar(select(func.count()).select_from(IdempotencyKey)) == 0
+
+
+def test_concurrent_duplicate_stock_movements_record_once(engine):
+    with Session(engine) as db:
+        seeded = seed_marketplace(db, SCALES["tiny"])
+        crop_id = db.scalar(select(Crop.crop_id).order_by(Crop.crop_id))
+        other_buyer_id = db.scalar(select(Buyer.user_id).where(Buyer.user_id != seeded.buyer_user_id))
+    sessions = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    buyer, other_buyer = SimpleNamespace(user_id=seeded.buyer_user_id), SimpleNamespace(user_id=other_buyer_id)
+    movement = StockMovementCreate(crop_id=crop_id, movement_type=StockMovementType.CONSUMPTION, quantity_kg=3.0,
+                                   notes="POS sale 42")
+
+    def record(user=buyer):
+        with sessions() as db:
+            return asyncio.run(create_stock_movement(movement, idempotency_key="sale-42", db=db, current_user=user))
+
+    outcomes = run_concurrently(6, record)
+    outcomes.append(record())
+
+    with Session(engine) as db:
+        recorded = db.scalars(select(StockMovement.movement_id).where(StockMovement.notes == "POS sale 42")).all()
+    assert len(recorded) == 1
+    responses = [body(o) for o in outcomes if not isinstance(o, HTTPException)]
+    assert {r["movement_id"] for r in responses} == set(recorded)
+    assert all(o.status_code == 409 for o in outcomes if isinstance(o, HTTPException))
+
+    # Keys are per caller: another user's identical key is a separate request
+    assert isinstance(record(other_buyer), dict)
+
+
+@pytest.mark.parametrize("failed_stores", [1, 2])
+def test_claim_is_kept_when_the_response_cannot_be_stored(engine, monkeypatch, failed_stores):
+    with Session(engine) as db:
+        seeded = seed_marketplace(db, SCALES["tiny"])
+        crop_id = db.scalar(select(Crop.crop_id).order_by(Crop.crop_id))
+    sessions = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    buyer = SimpleNamespace(user_id=seeded.buyer_user_id)
+    movement = StockMovementCreate(crop_id=crop_id, movement_type=StockMovementType.WASTE, quantity_kg=1.0,
+                                   notes="Spoiled crate")
+    store = idempotency.IdempotentRequest._store
+    calls = []
+
+    def flaky_store(self, status_code, body_json):
+        calls.append(body_json)
+        if len(calls) <= failed_stores:
+            raise RuntimeError("database went away")
+        return store(self, status_code, body_json)
+
+    def record():
+        with sessions() as db:
+            return asyncio.run(create_stock_movement(movement, idempotency_key="waste-7", db=db, current_user=buyer))
+
+    monkeypatch.setattr(idempotency.IdempotentRequest, "_store", flaky_store)
+    assert isinstance(record(), dict)
+    monkeypatch.undo()
+
+    # The movement was committed, so a retry must not record it again
+    if failed_stores == 1:
+        replay = record()
+        assert replay.headers[REPLAY_HEADER] == "true" and "detail" in body(replay)
+    else:
+        with pytest.raises(HTTPException) as error:
+            record()
+        assert error.value.status_code == 409
+    with Session(engine) as db:
+        assert db.scalar(select(func.count()).select_from(StockMovement)
+                         .where(StockMovement.notes == "Spoiled crate")) == 1
@@ -0,0 +1,125 @@
+"""
+Tests for job run recording and overlap protection in services/scheduler.py
+and the job endpoints in endpoints/system.py
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core import metrics  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import Base  # noqa: E402
+from app.models import JobRun, JobRunStatus  # noqa: E402
+from app.services import scheduler  # noqa: E402
+
+
+@pytest.fixture()
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(scheduler, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(scheduler, "elector", None)
+    yield engine
+    engine.dispose()
+
+
+def runs(engine, job_id):
+    with Session(engine) as db:
+        return db.scalars(select(JobRun).where(JobRun.job_id == job_id).order_by(JobRun.run_id)).all()
+
+
+def test_runs_are_recorded_with_rows_and_errors(engine):
+    assert scheduler._run_job("test_ok", lambda db: scheduler.JobResult(3, rows_scanned=10)) == 3
+    assert scheduler._run_job("test_count", lambda db: 2) == 2
+
+    def fail(db):
+        raise RuntimeError("boom")
+
+    assert scheduler._run_job("test_fail", fail) == 0
+
+    [ok] = runs(engine, "test_ok")
+    assert (ok.status, ok.rows_written, ok.rows_scanned, ok.error) == (JobRunStatus.SUCCESS, 3, 10, None)
+    assert ok.finished_at >= ok.started_at and ok.duration_ms >= 0
+    assert ok.worker == scheduler.WORKER
+    assert runs(engine, "test_count")[0].rows_scanned is None
+    [failed] = runs(engine, "test_fail")
+    assert failed.status == JobRunStatus.ERROR and failed.error == "RuntimeError: boom"
+
+
+def test_a_run_in_progress_shows_as_running(engine):
+    seen = []
+
+    def job(db):
+        seen.extend(run.status for run in runs(engine, "test_slow"))
+        return 1
+
+    scheduler._run_job("test_slow", job)
+    assert seen == [JobRunStatus.RUNNING]
+    assert runs(engine, "test_slow")[0].status == JobRunStatus.SUCCESS
+
+
+def test_overlapping_runs_are_skipped_and_counted(engine, monkeypatch):
+    from apscheduler.triggers.interval import IntervalTrigger
+
+    monkeypatch.setattr(settings, "SCHEDULER_LEADER_ELECTION", False)
+    monkeypatch.setattr(scheduler, "scheduler", None)
+    release = threading.Event()
+    active, peak = [0], [0]
+
+    def slow(db):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        release.wait(5)
+        active[0] -= 1
+        return 0
+
+    skipped_before = metrics.job_skipped_total._values.get(("test_overlap", "overlap"), 0)
+    scheduler.start_scheduler()
+    try:
+        scheduler.scheduler.add_job(lambda: scheduler._run_job("test_overlap", slow),
+                                    trigger=IntervalTrigger(seconds=0.1), id="test_overlap")
+        time.sleep(0.6)
+    finally:
+        release.set()
+        scheduler.stop_scheduler()
+
+    assert peak[0] == 1
+    assert metrics.job_skipped_total._values.get(("test_overlap", "overlap"), 0) > skipped_before
+    statuses = {run.status for run in runs(engine, "test_overlap")}
+    assert statuses == {JobRunStatus.SUCCESS, JobRunStatus.SKIPPED}
+
+
+def test_job_summary_endpoint(engine, tmp_path):
+    from apscheduler.events import EVENT_JOB_MAX_INSTANCES
+    from app.api.v1.endpoints.system import get_job_runs, get_job_summaries
+
+    scheduler._run_job("reconcile", lambda db: scheduler.JobResult(4, 8))
+    scheduler._run_job("reconcile", lambda db: 6)
+    scheduler._on_job_skipped(SimpleNamespace(code=EVENT_JOB_MAX_INSTANCES, job_id="reconcile"))
+
+    async def fetch():
+        async_engine = create_async_engine(str(engine.url).replace("sqlite://", "sqlite+aiosqlite://"))
+        async with AsyncSession(async_engine) as db:
+            summaries = await get_job_summaries(hours=24, db=db, current_user=None)
+            skipped = await get_job_runs(job_id="reconcile", status=JobRunStatus.SKIPPED, limit=10,
+                                         db=db, current_user=None)
+        await async_engine.dispose()
+        return summaries, skipped
+
+    summaries, skipped = asyncio.run(fetch())
+    [summary] = summaries
+    assert (summary.job_id, summary.runs, summary.errors, summary.skipped, summary.rows_written) == (
+        "reconcile", 2, 0, 1, 10)
+    assert summary.last_run.status == JobRunStatus.SKIPPED
+    assert summary.last_success_at is not None
+    assert [run.error for run in skipped] == ["Skipped: overlap"]
@@ -0,0 +1,292 @@
+"""
+Tests for the notification outbox and its dispatcher (services/notification_queue.py)
+"""
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import Base  # noqa: E402
+from app.models import BuyerInventoryPreference, NotificationChannel, NotificationOutbox, NotificationStatus, User  # noqa: E402
+from app.services.inventory_alerts import generate_inventory_alerts  # noqa: E402
+from app.core.rate_limit import TokenBucket  # noqa: E402
+from app.services import notification_queue  # noqa: E402
+from app.services.notification_queue import NotificationDispatcher, retry_delay  # noqa: E402
+from app.services.notifications import (  # noqa: E402
+    DeliveryError, HttpGatewayTransport, HttpSmsTransport, OutboundMessage, PermanentDeliveryError,
+    SmtpEmailTransport, StubTransport, WhatsAppTransport, notification_service,
+)
+from benchmarks.seed import SCALES, seed_marketplace  # noqa: E402
+from benchmarks.smtp_standin import SmtpStandIn  # noqa: E402
+from scripts.sms_gateway_stub import GatewayStub  # noqa: E402
+
+
+@pytest.fixture()
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed_marketplace(session, SCALES["tiny"])
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture()
+def transports():
+    return {NotificationChannel.EMAIL: StubTransport(), NotificationChannel.SMS: StubTransport()}
+
+
+def queue(db, count=1, channel=NotificationChannel.EMAIL):
+    db.add_all(
+        NotificationOutbox(channel=channel, recipient=f"buyer{i}@example.com", subject="Low stock", body_text="Low")
+        for i in range(count)
+    )
+    db.commit()
+
+
+def statuses(db) -> list:
+    return list(db.scalars(select(NotificationOutbox.status).order_by(NotificationOutbox.notification_id)))
+
+
+def test_alert_generation_queues_instead_of_sending(db, transports):
+    preference = db.scalars(select(BuyerInventoryPreference)).first()
+    preference.min_stock_threshold_kg = 1e9
+    preference.notification_channels = json.dumps({"email": True, "sms": True})
+    db.commit()
+    user = db.get(User, preference.buyer_user_id)
+
+    generate_inventory_alerts(db, buyer_user_id=preference.buyer_user_id)
+
+    rows = db.scalars(select(NotificationOutbox)).all()
+    expected = {NotificationChannel.SMS} | ({NotificationChannel.EMAIL} if user.email else set())
+    assert {row.channel for row in rows} == expected
+    assert all(row.status == NotificationStatus.PENDING and row.user_id == user.user_id for row in rows)
+
+    counts = NotificationDispatcher(transports).dispatch(db)
+    assert counts == {"sent": len(rows), "retry": 0, "dead": 0}
+    assert [m.recipient for m in transports[NotificationChannel.SMS].sent] == [user.phone]
+    assert set(statuses(db)) == {NotificationStatus.SENT}
+
+
+def test_whatsapp_only_buyers_are_notified(db):
+    preference = db.scalars(select(BuyerInventoryPreference)).first()
+    preference.min_stock_threshold_kg = 1e9
+    preference.notification_channels = json.dumps({"in_app": True, "whatsapp": True})
+    db.commit()
+    user = db.get(User, preference.buyer_user_id)
+
+    generate_inventory_alerts(db, buyer_user_id=preference.buyer_user_id)
+
+    rows = db.scalars(select(NotificationOutbox)).all()
+    assert rows and {(row.channel, row.recipient) for row in rows} == {(NotificationChannel.WHATSAPP, user.phone)}
+
+    whatsapp = StubTransport()
+    assert NotificationDispatcher({NotificationChannel.WHATSAPP: whatsapp}).dispatch(db)["sent"] == len(rows)
+    assert [m.recipient for m in whatsapp.sent] == [user.phone] * len(rows)
+
+
+def test_failed_sends_back_off_then_dead_letter(db, transports, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_MAX_ATTEMPTS", 2)
+    transports[NotificationChannel.EMAIL].fail_with = DeliveryError("connection reset")
+    dispatcher = NotificationDispatcher(transports)
+    queue(db)
+
+    assert dispatcher.dispatch(db) == {"sent": 0, "retry": 1, "dead": 0}
+    row = db.scalars(select(NotificationOutbox)).one()
+    assert (row.status, row.attempts, row.last_error) == (NotificationStatus.PENDING, 1, "connection reset")
+    assert row.next_attempt_at > datetime.utcnow() + retry_delay(1) - timedelta(seconds=5)
+
+    # Not due yet
+    assert dispatcher.dispatch(db) == {"sent": 0, "retry": 0, "dead": 0}
+
+    db.execute(update(NotificationOutbox).values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.commit()
+    assert dispatcher.dispatch(db) == {"sent": 0, "retry": 0, "dead": 1}
+    assert statuses(db) == [NotificationStatus.DEAD]
+
+
+def test_permanent_errors_dead_letter_immediately(db, transports):
+    transports[NotificationChannel.SMS].fail_with = PermanentDeliveryError("Twilio not configured")
+    queue(db, channel=NotificationChannel.SMS)
+    queue(db, channel=NotificationChannel.EMAIL)
+
+    assert NotificationDispatcher(transports).dispatch(db) == {"sent": 1, "retry": 0, "dead": 1}
+    assert statuses(db) == [NotificationStatus.DEAD, NotificationStatus.SENT]
+
+
+def test_stale_claims_are_retried(db, transports, monkeypatch):
+    queue(db)
+    db.execute(update(NotificationOutbox).values(
+        status=NotificationStatus.SENDING, attempts=1,
+        claimed_at=datetime.utcnow() - timedelta(seconds=settings.NOTIFICATION_CLAIM_TIMEOUT_SECONDS + 1)))
+    db.commit()
+
+    assert NotificationDispatcher(transports).dispatch(db)["sent"] == 1
+    assert db.scalar(select(NotificationOutbox.attempts)) == 2
+
+
+def test_a_reclaimed_send_cannot_record_its_outcome(db, transports):
+    queue(db)
+    first, second = NotificationDispatcher(transports), NotificationDispatcher(transports)
+    slow = first.claim(db, 10)
+    # The first send outlives the claim timeout and another dispatcher takes the row over
+    db.execute(update(NotificationOutbox).values(
+        claimed_at=datetime.utcnow() - timedelta(seconds=settings.NOTIFICATION_CLAIM_TIMEOUT_SECONDS + 1)))
+    db.commit()
+    reclaimed = second.claim(db, 10)
+    assert [m.notification_id for m in reclaimed] == [m.notification_id for m in slow]
+
+    first.record(db, [(message, DeliveryError("timed out")) for message in slow])
+    row = db.scalars(select(NotificationOutbox)).one()
+    assert (row.status, row.attempts, row.last_error) == (NotificationStatus.SENDING, 2, None)
+
+    second.record(db, [(message, None) for message in reclaimed])
+    db.refresh(row)
+    assert (row.status, row.claimed_at) == (NotificationStatus.SENT, None)
+
+
+def test_channel_concurrency_is_bounded(db):
+    class Probe(StubTransport):
+        def __init__(self):
+            super().__init__()
+            self.active = self.peak = 0
+            self.guard = threading.Lock()
+
+        def send(self, message):
+            with self.guard:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            time.sleep(0.02)
+            with self.guard:
+                self.active -= 1
+            super().send(message)
+
+    email, sms = Probe(), Probe()
+    dispatcher = NotificationDispatcher(
+        {NotificationChannel.EMAIL: email, NotificationChannel.SMS: sms},
+        {NotificationChannel.EMAIL: 3, NotificationChannel.SMS: 1},
+    )
+    queue(db, 12, NotificationChannel.EMAIL)
+    queue(db, 4, NotificationChannel.SMS)
+
+    assert dispatcher.dispatch(db, batch_size=100)["sent"] == 16
+    assert (email.peak, sms.peak) == (3, 1)
+    dispatcher.shutdown()
+
+
+@pytest.fixture()
+def smtp_server(monkeypatch):
+    with SmtpStandIn() as server:
+        for name, value in (("SMTP_HOST", "127.0.0.1"), ("SMTP_PORT", server.port), ("SMTP_USER", "user"),
+                            ("SMTP_PASSWORD", "secret"), ("SMTP_STARTTLS", False)):
+            monkeypatch.setattr(settings, name, value)
+        yield server
+
+
+def email(i: int) -> OutboundMessage:
+    return OutboundMessage(i, NotificationChannel.EMAIL, f"buyer{i}@example.com", "Low stock", "Alert")
+
+
+def test_smtp_connections_are_reused(smtp_server):
+    transport = SmtpEmailTransport(pool_size=1, max_messages_per_connection=8)
+    assert transport.send_batch([email(i) for i in range(5)]) == [None] * 5
+    transport.send(email(5))
+    assert (smtp_server.connections, smtp_server.messages) == (1, 6)
+
+    # Retired after max_messages_per_connection
+    assert transport.send_batch([email(i) for i in range(4)]) == [None] * 4
+    assert smtp_server.connections == 2
+    transport.close()
+
+
+def test_smtp_reconnects_when_the_server_drops_an_idle_connection(smtp_server):
+    transport = SmtpEmailTransport(pool_size=1)
+    transport.send(email(1))
+    smtp_server.drop_connections()
+    time.sleep(0.05)
+
+    transport.send(email(2))
+    assert (smtp_server.connections, smtp_server.messages) == (2, 2)
+    transport.close()
+
+
+def test_smtp_unreachable_fails_the_batch_for_retry(smtp_server, monkeypatch):
+    monkeypatch.setattr(settings, "SMTP_PORT", 1)
+    errors = SmtpEmailTransport().send_batch([email(1), email(2)])
+    assert all(type(error) is DeliveryError for error in errors) and len(errors) == 2
+
+
+def test_token_bucket_paces_after_the_burst():
+    now = [0.0]
+    slept = []
+    bucket = TokenBucket(rate=10, capacity=2, timer=lambda: now[0], sleep=slept.append)
+
+    assert bucket.reserve() == 0 and bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)  # queued behind the previous caller
+    assert bucket.reserve(timeout=0.1) is None
+    now[0] = 1.0
+    assert bucket.acquire() and slept == []
+    assert TokenBucket(rate=0).reserve(100) == 0
+
+
+@pytest.fixture()
+def gateway(monkeypatch):
+    with GatewayStub(latency=0.05) as stub:
+        monkeypatch.setattr(settings, "SMS_GATEWAY_URL", stub.url("/sms"))
+        monkeypatch.setattr(settings, "SMS_GATEWAY_TOKEN", "gateway-token")
+        monkeypatch.setattr(settings, "WHATSAPP_API_URL", stub.url("/v18.0/123/messages"))
+        monkeypatch.setattr(settings, "WHATSAPP_ACCESS_TOKEN", "wa-token")
+        yield stub
+
+
+def test_sms_and_whatsapp_batches_run_in_parallel_and_report_per_message(gateway, monkeypatch):
+    sms, whatsapp = HttpSmsTransport(), WhatsAppTransport()
+    dispatcher = NotificationDispatcher(
+        {NotificationChannel.SMS: sms, NotificationChannel.WHATSAPP: whatsapp},
+        {NotificationChannel.SMS: 4, NotificationChannel.WHATSAPP: 2},
+        {NotificationChannel.SMS: TokenBucket(rate=1000, capacity=100)},
+    )
+    monkeypatch.setattr(notification_queue, "_dispatcher", dispatcher)
+
+    results = notification_service.send_sms_batch([(f"+26377000{i:04d}", f"Hello {i}") for i in range(8)] + [("", "x")])
+    assert [r["sent"] for r in results] == [True] * 8 + [False]
+    assert "400" in results[-1]["error"]
+    assert gateway.peak_concurrency == 4
+
+    result, = notification_service.send_sms_batch([("+263770000001", "Stock low")], NotificationChannel.WHATSAPP)
+    assert result == {"to": "+263770000001", "channel": "whatsapp", "sent": True, "error": None}
+    path, authorization, body = gateway.received[-1]
+    assert (path, authorization, body["to"], body["text"]) == (
+        "/v18.0/123/messages", "Bearer wa-token", "263770000001", {"body": "Stock low"})
+    dispatcher.shutdown()
+
+
+def test_gateway_transports_must_define_their_payload():
+    class NoPayload(HttpGatewayTransport):
+        name = "Incomplete gateway"
+
+    with pytest.raises(TypeError):
+        NoPayload("http://gateway.invalid/messages")
+
+
+def test_gateway_rate_limit_responses_are_retried(gateway, db):
+    gateway.rate_limit = 1
+    transports = {NotificationChannel.SMS: HttpSmsTransport()}
+    # No client-side pacing, so the provider's 429 comes back
+    dispatcher = NotificationDispatcher(transports, {NotificationChannel.SMS: 2}, {})
+    queue(db, 3, NotificationChannel.SMS)
+
+    counts = dispatcher.dispatch(db)
+    assert counts["sent"] >= 1 and counts["retry"] >= 1 and counts["dead"] == 0
+    dispatcher.shutdown()
@@ -0,0 +1,73 @@
+"""
+Tests for threaded bcrypt and rehash-on-login in app/core/auth.py
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+from passlib.context import CryptContext
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core import auth  # noqa: E402
+from app.core.database import Base  # noqa: E402
+from app.models.user import User, UserRole, UserStatus  # noqa: E402
+
+PASSWORD = "correct horse"
+
+
+def context(rounds: int) -> CryptContext:
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+@pytest.fixture()
+def db(tmp_path, monkeypatch):
+    # Low costs keep the test fast; only the difference between them matters
+    monkeypatch.setattr(auth, "pwd_context", context(5))
+    engine = create_engine(f"sqlite:///{tmp_path / 'hashing.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(name="Farmer", phone="+263770000002", hashed_password=context(4).hash(PASSWORD),
+                         role=UserRole.FARMER, status=UserStatus.ACTIVE))
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def test_login_rehashes_at_the_configured_cost(db):
+    user = asyncio.run(auth.authenticate_user(db, "+263770000002", PASSWORD))
+    assert user is not None
+    db.commit()
+
+    stored = db.query(User.hashed_password).scalar()
+    assert stored.startswith("$2b$05$")
+    assert auth.verify_password(PASSWORD, stored)
+
+
+def test_wrong_password_leaves_the_hash_alone(db):
+    before = db.query(User.hashed_password).scalar()
+    assert asyncio.run(auth.authenticate_user(db, "+263770000002", "wrong")) is None
+    db.commit()
+    assert db.query(User.hashed_password).scalar() == before
+
+
+def test_async_helpers_match_the_sync_ones():
+    hashed = asyncio.run(auth.get_password_hash_async(PASSWORD))
+    assert auth.verify_password(PASSWORD, hashed)
+    assert asyncio.run(auth.verify_password_async(PASSWORD, hashed))
+    assert not asyncio.run(auth.verify_password_async("wrong", hashed))
+
+
+def test_login_leaves_the_callers_transaction_alone(db):
+    other = User(name="Buyer", phone="+263770000003", hashed_password="x", role=UserRole.BUYER,
+                 status=UserStatus.ACTIVE)
+    db.add(other)
+    db.flush()
+    assert asyncio.run(auth.authenticate_user(db, "+263770000002", PASSWORD)) is not None
+    assert "name" in other.__dict__  # not expired by a commit
+
+    db.rollback()
+    assert db.query(User).filter(User.phone == "+263770000003").first() is None
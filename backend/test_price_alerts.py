@@ -0,0 +1,96 @@
+"""
+Tests for check_price_alerts in services/inventory_alerts.py
+"""
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core.database import Base  # noqa: E402
+from app.models import (  # noqa: E402
+    BuyerInventoryPreference, InventoryAlert, Listing, Lot, NotificationOutbox, ProductionPlan, StockHistory, User,
+)
+from app.services.inventory_alerts import check_price_alerts  # noqa: E402
+from benchmarks.seed import SCALES, seed_marketplace  # noqa: E402
+
+
+@pytest.fixture()
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'prices.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed_marketplace(session, SCALES["tiny"])
+        for model in (BuyerInventoryPreference, InventoryAlert, NotificationOutbox):
+            session.execute(delete(model))
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def listed_crop(db):
+    """(crop_id, current average listing price) for a crop with active listings"""
+    return db.execute(
+        select(ProductionPlan.crop_id, func.avg(Listing.sell_price_per_kg))
+        .join(Lot, Lot.plan_id == ProductionPlan.plan_id)
+        .join(Listing, Listing.lot_id == Lot.lot_id)
+        .where(Listing.is_active == True)
+        .group_by(ProductionPlan.crop_id)
+        .limit(1)
+    ).one()
+
+
+def test_each_preference_uses_its_own_threshold(db):
+    crop_id, price = listed_crop(db)
+    now = datetime.utcnow()
+    # The reference is the newest snapshot 24-48 hours old: price is up 15% on it
+    db.execute(insert(StockHistory), [
+        {"crop_id": crop_id, "total_available_kg": 1.0, "total_reserved_kg": 0.0, "total_sold_kg": 0.0,
+         "remaining_kg": 1.0, "avg_price_per_kg": previous, "recorded_at": now - timedelta(hours=hours)}
+        for previous, hours in ((price, 1), (price, 3), (price / 1.15, 25), (price / 2, 30), (price / 3, 50))
+    ])
+    buyer_ids = db.scalars(select(User.user_id).limit(3)).all()
+    db.add_all([
+        BuyerInventoryPreference(buyer_user_id=buyer_ids[0], crop_id=crop_id, enable_price_alerts=True,
+                                 notification_channels=json.dumps({"email": True})),
+        BuyerInventoryPreference(buyer_user_id=buyer_ids[1], crop_id=crop_id, enable_price_alerts=True,
+                                 price_change_threshold_pct=20),
+        BuyerInventoryPreference(buyer_user_id=buyer_ids[2], crop_id=crop_id, enable_price_alerts=True,
+                                 price_change_threshold_pct=5),
+    ])
+    db.commit()
+
+    assert check_price_alerts(db) == 2
+    alerts = db.scalars(select(InventoryAlert).order_by(InventoryAlert.buyer_user_id)).all()
+    assert [alert.buyer_user_id for alert in alerts] == [buyer_ids[0], buyer_ids[2]]
+    assert json.loads(alerts[0].alert_data)["price_change_pct"] == pytest.approx(15)
+    assert json.loads(alerts[0].alert_data)["direction"] == "increased"
+
+    # Active alerts aren't raised again
+    assert check_price_alerts(db) == 0
+    email = db.scalar(select(User.email).where(User.user_id == buyer_ids[0]))
+    outbox = db.scalars(select(NotificationOutbox.recipient)).all()
+    assert outbox == ([email] if email else [])
+
+
+def test_a_steady_climb_alerts_with_hourly_snapshots(db):
+    crop_id, price = listed_crop(db)
+    now = datetime.utcnow()
+    # Up 0.5% an hour: each hourly snapshot is close to the next, but the day's move is ~12.7%
+    db.execute(insert(StockHistory), [
+        {"crop_id": crop_id, "total_available_kg": 1.0, "total_reserved_kg": 0.0, "total_sold_kg": 0.0,
+         "remaining_kg": 1.0, "avg_price_per_kg": price / 1.005 ** hours, "recorded_at": now - timedelta(hours=hours)}
+        for hours in range(1, 31)
+    ])
+    buyer_id = db.scalar(select(User.user_id).limit(1))
+    db.add(BuyerInventoryPreference(buyer_user_id=buyer_id, crop_id=crop_id, enable_price_alerts=True))
+    db.commit()
+
+    assert check_price_alerts(db) == 1
+    change = json.loads(db.scalar(select(InventoryAlert.alert_data)))["price_change_pct"]
+    assert change == pytest.approx((1.005 ** 24 - 1) * 100)
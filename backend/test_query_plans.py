@@ -0,0 +1,154 @@
+"""
+Query plan regression tests for the composite indexes added in
+alembic/versions/3f9a2c1d7b40_add_composite_indexes_for_hot_filters.py
+
+Runs the real queries from services/inventory_alerts.py,
+endpoints/buyer_inventory.py and endpoints/orders.py against a seeded
+SQLite database, captures the SQL they emit and checks that
+EXPLAIN QUERY PLAN picks the composite index for each hot filter.
+"""
+import asyncio
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core.database import Base  # noqa: E402
+from app.models import BuyerInventoryPreference, Crop, StockHistory, User  # noqa: E402
+from app.models.buyer_stock import StockMovementType  # noqa: E402
+from benchmarks.seed import SCALES, seed_marketplace  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def databases(tmp_path_factory):
+    path = tmp_path_factory.mktemp("plans") / "plans.db"
+    engine = create_engine(f"sqlite:///{path}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as db:
+        seeded = seed_marketplace(db, SCALES["tiny"])
+        # Force every code path that looks up existing alerts: thresholds no
+        # stock can meet, price alerts on, and a price history far from today
+        db.execute(update(BuyerInventoryPreference).values(
+            min_stock_threshold_kg=1e9, enable_price_alerts=True))
+        crop_ids = [crop_id for (crop_id,) in db.query(Crop.crop_id)]
+        db.execute(insert(StockHistory), [
+            {"crop_id": crop_id, "total_available_kg": 1.0, "total_reserved_kg": 0.0, "total_sold_kg": 0.0,
+             "remaining_kg": 1.0, "avg_price_per_kg": 0.01, "recorded_at": datetime.utcnow()}
+            for crop_id in crop_ids
+        ])
+        db.commit()
+        buyer = db.get(User, seeded.buyer_user_id)
+        db.expunge(buyer)
+
+    yield engine, async_engine, buyer
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+
+@contextmanager
+def captured_selects(*engines):
+    """Collect (statement, parameters) for every SELECT run on the engines"""
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", listener)
+
+
+def query_plan(engine, statement, parameters) -> str:
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return " | ".join(row[-1] for row in rows)
+
+
+def assert_index_used(engine, statements, marker: str, index_name: str):
+    matching = [(s, p) for s, p in statements if marker in s]
+    assert matching, f"no captured query contains {marker!r}"
+    for statement, parameters in matching:
+        plan = query_plan(engine, statement, parameters)
+        assert index_name in plan, f"{index_name} not used:\n{statement}\nplan: {plan}"
+
+
+def test_alert_generation_uses_composite_indexes(databases):
+    from app.services.inventory_alerts import generate_inventory_alerts
+
+    engine, _, _ = databases
+    with captured_selects(engine) as statements, Session(engine) as db:
+        generate_inventory_alerts(db)
+
+    # Set-based: preferences, crops, stock, alerts, harvests - however many preferences
+    assert len(statements) <= 5
+    assert_index_used(engine, statements, "lots.current_status = ", "idx_lots_plan_status")
+    assert_index_used(engine, statements, "listings.is_active = ", "idx_listings_lot_active")
+    assert_index_used(engine, statements, "production_plans.status IN",
+                      "idx_production_plans_crop_status_harvest")
+
+
+def test_price_alerts_use_composite_indexes(databases):
+    from app.services.inventory_alerts import check_price_alerts
+
+    engine, _, _ = databases
+    with captured_selects(engine) as statements, Session(engine) as db:
+        check_price_alerts(db)
+
+    # Preferences, crops, current prices, previous prices, alerts, users
+    assert len(statements) <= 6
+    assert_index_used(engine, statements, "listings.is_active = ", "idx_listings_lot_active")
+    assert_index_used(engine, statements, "inventory_alerts.alert_type = ",
+                      "idx_inventory_alerts_buyer_crop_type_status")
+
+
+def test_buyer_inventory_movement_queries_use_composite_index(databases):
+    from app.api.v1.endpoints.buyer_inventory import (
+        calculate_reorder_point, get_sales_intensity_analysis, get_stock_movements,
+    )
+
+    engine, async_engine, buyer = databases
+
+    async def run_endpoints():
+        with Session(engine) as db:
+            await get_sales_intensity_analysis(days=30, db=db, current_user=buyer)
+            crop_id = db.query(StockHistory.crop_id).first()[0]
+            await calculate_reorder_point(crop_id=crop_id, lead_time_days=None, safety_stock_days=None,
+                                          db=db, current_user=buyer)
+        async with AsyncSession(async_engine) as db:
+            await get_stock_movements(crop_id=crop_id, movement_type=StockMovementType.CONSUMPTION,
+                                      days=30, db=db, current_user=buyer)
+
+    with captured_selects(engine, async_engine.sync_engine) as statements:
+        asyncio.run(run_endpoints())
+
+    assert_index_used(engine, statements, "stock_movements.movement_type = ",
+                      "idx_stock_movements_buyer_crop_type_date")
+
+
+def test_order_listing_by_status_uses_composite_index(databases):
+    from app.api.v1.endpoints.orders import list_orders
+
+    engine, async_engine, buyer = databases
+
+    async def run_endpoint():
+        async with AsyncSession(async_engine) as db:
+            await list_orders(db=db, current_user=buyer, status="delivered", limit=100)
+
+    with captured_selects(async_engine.sync_engine) as statements:
+        asyncio.run(run_endpoint())
+
+    assert_index_used(engine, statements, "orders.status = ", "idx_orders_buyer_status_created")
@@ -0,0 +1,103 @@
+"""
+Tests for scheduler leader election in core/leader.py and services/scheduler.py
+"""
+import os
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core import leader  # noqa: E402
+from app.core.leader import AdvisoryLock, FileLock, LeaderElector  # noqa: E402
+from app.services import scheduler  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def elector(path, events, name):
+    return LeaderElector(FileLock(path), on_elected=lambda: events.append((name, "elected")),
+                         on_demoted=lambda: events.append((name, "demoted")), interval=0.05)
+
+
+def test_one_leader_and_handover_on_stop(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    events = []
+    first, second = elector(path, events, "first"), elector(path, events, "second")
+    first.start()
+    second.start()
+    try:
+        assert (first.is_leader, second.is_leader) == (True, False)
+        time.sleep(0.2)
+        assert events == [("first", "elected")]
+
+        first.stop()
+        assert wait_for(lambda: second.is_leader)
+        assert events == [("first", "elected"), ("second", "elected")]
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_follower_takes_over_when_the_leader_process_dies(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    leader = subprocess.Popen(
+        [sys.executable, "-c",
+         "import sys, time; from app.core.leader import FileLock; "
+         f"assert FileLock({path!r}).acquire(); print('locked', flush=True); time.sleep(60)"],
+        cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True)
+    try:
+        assert leader.stdout.readline().strip() == "locked"
+        events = []
+        follower = elector(path, events, "follower")
+        follower.start()
+        time.sleep(0.2)
+        assert not follower.is_leader
+
+        leader.kill()
+        leader.wait()
+        assert wait_for(lambda: follower.is_leader)
+        follower.stop()
+    finally:
+        leader.kill()
+        leader.wait()
+
+
+def test_jobs_skip_when_not_leader(monkeypatch):
+    class Follower:
+        def confirm(self):
+            return False
+
+    calls = []
+    monkeypatch.setattr(scheduler, "elector", Follower())
+    assert scheduler._run_job("generate_alerts", calls.append) == 0
+    assert calls == []
+
+
+def test_advisory_lock_uses_its_own_unpooled_engine(monkeypatch):
+    created = []
+
+    def create_sync_engine(url, poolclass=None):
+        created.append((url, poolclass))
+        return SimpleNamespace(url=url)
+
+    monkeypatch.setattr(leader, "create_sync_engine", create_sync_engine)
+    app_engine = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"),
+                                 url=make_url("postgresql://munda:secret@db:5432/munda"))
+
+    lock = leader.scheduler_lock(app_engine)
+    assert isinstance(lock, AdvisoryLock) and lock.engine is not app_engine
+    assert created == [("postgresql://munda:secret@db:5432/munda", NullPool)]
@@ -0,0 +1,173 @@
+"""
+Tests for record_stock_history in services/inventory_alerts.py and the
+rollups/retention in services/stock_history.py
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, delete, event, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core.database import Base  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.models import Crop, Listing, Lot, ProductionPlan, StockHistory, StockHistoryRollup, User  # noqa: E402
+from app.services.inventory_alerts import record_stock_history  # noqa: E402
+from app.services.stock_history import expire_stock_history, history_resolution, roll_up_stock_history  # noqa: E402
+from benchmarks.seed import SCALES, seed_marketplace  # noqa: E402
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed_marketplace(session, SCALES["tiny"])
+        session.commit()
+    yield engine
+    engine.dispose()
+
+
+def expected_snapshot(db, crop_id):
+    """The per-crop aggregate the snapshot used to run for every crop"""
+    return db.query(
+        func.sum(Lot.available_kg), func.sum(Lot.reserved_kg), func.sum(Lot.sold_kg),
+        func.count(Listing.listing_id), func.avg(Listing.sell_price_per_kg),
+        func.min(Listing.sell_price_per_kg), func.max(Listing.sell_price_per_kg),
+    ).join(Listing, Listing.lot_id == Lot.lot_id).join(ProductionPlan, ProductionPlan.plan_id == Lot.plan_id).filter(
+        ProductionPlan.crop_id == crop_id, Lot.current_status == "available", Listing.is_active == True
+    ).one()
+
+
+def test_snapshot_is_one_grouped_query_matching_per_crop_totals(engine):
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    with Session(engine) as db:
+        recorded = record_stock_history(db)
+    event.remove(engine, "before_cursor_execute", capture)
+
+    assert [s.split()[0].upper() for s in statements] == ["SELECT", "INSERT"]
+
+    with Session(engine) as db:
+        rows = {row.crop_id: row for row in db.scalars(select(StockHistory))}
+        assert len(rows) == recorded > 0
+        for crop_id in db.scalars(select(Crop.crop_id).where(Crop.is_active == True)):
+            available, reserved, sold, listings, avg_price, min_price, max_price = expected_snapshot(db, crop_id)
+            if not available:
+                assert crop_id not in rows
+                continue
+            row = rows[crop_id]
+            assert row.total_available_kg == pytest.approx(available)
+            assert row.remaining_kg == pytest.approx(available - (reserved or 0) - (sold or 0))
+            assert (row.active_listings_count, row.min_price_per_kg, row.max_price_per_kg) == (
+                listings, min_price, max_price)
+            assert row.avg_price_per_kg == pytest.approx(avg_price)
+
+
+def test_snapshot_for_one_crop(engine):
+    with Session(engine) as db:
+        crop_id = db.scalar(
+            select(ProductionPlan.crop_id).join(Lot, Lot.plan_id == ProductionPlan.plan_id)
+            .join(Listing, Listing.lot_id == Lot.lot_id)
+            .where(Listing.is_active == True, Lot.current_status == "available").limit(1))
+        assert record_stock_history(db, crop_id=crop_id) == 1
+        assert db.scalars(select(StockHistory.crop_id)).all() == [crop_id]
+
+
+# A Wednesday, just after midnight; 21 days of hourly snapshots end just before it
+NOW = datetime(2026, 3, 18, 0, 30)
+
+
+def seed_hourly_snapshots(db, days=21, now=NOW):
+    crop_id = db.scalar(select(Crop.crop_id))
+    db.execute(delete(StockHistory))
+    start = now - timedelta(days=days)
+    db.execute(insert(StockHistory), [
+        {"crop_id": crop_id, "total_available_kg": 100.0 + hour % 24, "total_reserved_kg": 0.0,
+         "total_sold_kg": 0.0, "remaining_kg": 100.0 + hour % 24, "avg_price_per_kg": 1.0 + hour % 2,
+         "min_price_per_kg": 0.5 + hour % 3, "max_price_per_kg": 2.0 + hour % 5, "active_listings_count": 2,
+         "recorded_at": start + timedelta(hours=hour, minutes=1)}
+        for hour in range(days * 24)
+    ])
+    db.commit()
+    return crop_id
+
+
+def rollup_count(db, resolution):
+    return db.scalar(select(func.count()).select_from(StockHistoryRollup).where(
+        StockHistoryRollup.resolution == resolution))
+
+
+def test_rollups_cover_completed_buckets_once(engine):
+    with Session(engine) as db:
+        seed_hourly_snapshots(db)
+
+        # Weeks starting Feb 23 (partial), Mar 2 and Mar 9; the week of Mar 16 is still filling
+        assert roll_up_stock_history(db, now=NOW) == {"hour": 21 * 24, "day": 21, "week": 3}
+        assert roll_up_stock_history(db, now=NOW) == {"hour": 0, "day": 0, "week": 0}
+
+        day = db.scalars(select(StockHistoryRollup).where(StockHistoryRollup.resolution == "day")).first()
+        assert day.sample_count == 24
+        assert day.total_available_kg == pytest.approx(100 + 11.5)  # mean of 100..123
+        assert day.avg_price_per_kg == pytest.approx(1.5)
+        assert (day.min_price_per_kg, day.max_price_per_kg) == (0.5, 6.0)
+        weeks = db.scalars(select(StockHistoryRollup).where(StockHistoryRollup.resolution == "week")
+                           .order_by(StockHistoryRollup.bucket_start)).all()
+        assert all(week.bucket_start.weekday() == 0 for week in weeks)
+        assert [week.sample_count for week in weeks] == [5 * 24, 7 * 24, 7 * 24]
+
+
+def test_retention_only_drops_rows_the_next_tier_covers(engine, monkeypatch):
+    monkeypatch.setattr(settings, "STOCK_HISTORY_RAW_RETENTION_DAYS", 3)
+    monkeypatch.setattr(settings, "STOCK_HISTORY_HOURLY_RETENTION_DAYS", 7)
+    monkeypatch.setattr(settings, "STOCK_HISTORY_DAILY_RETENTION_DAYS", 14)
+    with Session(engine) as db:
+        seed_hourly_snapshots(db)
+        # Nothing rolled up yet: nothing may be deleted
+        assert expire_stock_history(db, now=NOW) == {"raw": 0, "hour": 0, "day": 0}
+
+        roll_up_stock_history(db, now=NOW)
+        expire_stock_history(db, now=NOW)
+        oldest_raw = db.scalar(select(func.min(StockHistory.recorded_at)))
+        assert oldest_raw >= NOW - timedelta(days=3)
+        assert rollup_count(db, "hour") == 7 * 24 - 1  # from 01:00 seven days ago
+        assert rollup_count(db, "week") == 3
+        # Daily rows older than 14 days go only where a weekly bucket covers them
+        oldest_day = db.scalar(select(func.min(StockHistoryRollup.bucket_start)).where(
+            StockHistoryRollup.resolution == "day"))
+        assert oldest_day >= NOW - timedelta(days=15)
+
+
+def test_history_endpoint_reads_the_coarsest_fitting_tier(engine, tmp_path):
+    from app.api.v1.endpoints.inventory_alerts import get_stock_history
+
+    with Session(engine) as db:
+        # The endpoint's window is relative to the real clock
+        crop_id = seed_hourly_snapshots(db, days=60, now=datetime.utcnow())
+        roll_up_stock_history(db)
+        buyer = db.scalars(select(User)).first()
+        db.expunge(buyer)
+
+    assert [history_resolution(days) for days in (1, 7, 16, 30, 365)] == ["raw", "raw", "hour", "day", "day"]
+
+    async def fetch(days):
+        async_engine = create_async_engine(str(engine.url).replace("sqlite://", "sqlite+aiosqlite://"))
+        async with AsyncSession(async_engine) as db:
+            points = await get_stock_history(crop_id=crop_id, days=days, resolution=None, db=db, current_user=buyer)
+        await async_engine.dispose()
+        return points
+
+    points = asyncio.run(fetch(365))
+    assert {p.resolution for p in points[:-1]} == {"day"}
+    assert len(points) <= 61 and points[-1].resolution in ("day", "raw")
+    # Whole days in the middle; the first one starts part-way through
+    assert all(p.sample_count == 24 for p in points[1:] if p.resolution == "day")
@@ -0,0 +1,145 @@
+"""
+Tests for bulk stock movement ingestion in services/stock_ingest.py and
+POST /buyer-inventory/stock/movements/bulk
+"""
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.api.v1.endpoints import buyer_inventory  # noqa: E402
+from app.core.auth import require_buyer  # noqa: E402
+from app.core.database import Base, get_async_db  # noqa: E402
+from app.models import BuyerStock, Crop, StockMovement  # noqa: E402
+from app.models.buyer_stock import StockMovementType  # noqa: E402
+from app.services.stock_ingest import MovementFeedParser, ingest_stock_movements  # noqa: E402
+from benchmarks.seed import SCALES, seed_marketplace  # noqa: E402
+
+
+@pytest.fixture()
+def seeded(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        result = seed_marketplace(db, SCALES["tiny"])
+        crop_ids = db.scalars(select(Crop.crop_id).order_by(Crop.crop_id).limit(3)).all()
+    yield SimpleNamespace(engine=engine, buyer_user_id=result.buyer_user_id, crop_ids=crop_ids)
+    engine.dispose()
+
+
+def balances(engine, buyer_user_id, crop_ids):
+    with Session(engine) as db:
+        return {
+            crop_id: db.scalar(select(func.coalesce(func.sum(BuyerStock.current_quantity_kg), 0.0)).where(
+                BuyerStock.buyer_user_id == buyer_user_id, BuyerStock.crop_id == crop_id,
+                BuyerStock.is_active == True))
+            for crop_id in crop_ids
+        }
+
+
+def movement_count(engine, buyer_user_id):
+    with Session(engine) as db:
+        return db.scalar(select(func.count()).select_from(StockMovement).where(
+            StockMovement.buyer_user_id == buyer_user_id))
+
+
+def test_parser_handles_split_lines_csv_and_bad_rows():
+    feed = b'\xef\xbb\xbfcrop_id,movement_type,quantity_kg,notes\n1,consumption,2.5,\n1,sold,3,x\n2,purchase,4\n'
+    parser = MovementFeedParser("csv")
+    parsed = []
+    for i in range(0, len(feed), 7):
+        parsed.extend(parser.feed(feed[i:i + 7]))
+    parsed.extend(parser.close())
+
+    assert [row for row, _ in parsed] == [1, 2, 3]
+    assert parsed[0][1].quantity_kg == 2.5 and parsed[0][1].notes is None
+    assert "movement_type" in parsed[1][1]
+    assert parsed[2][1] == "Expected 4 columns, got 3"
+
+    parser = MovementFeedParser("ndjson")
+    parsed = parser.feed(b'{"crop_id": 1, "movement_type": "waste", "quantity_kg": 1}\n[1]\n\n{"crop_id": ')
+    parsed += parser.close()
+    assert [type(row).__name__ for _, row in parsed] == ["MovementRow", "str", "str"]
+
+
+def test_feed_applies_summed_deltas_and_signed_movements(seeded):
+    buyer, (crop_a, crop_b, _) = seeded.buyer_user_id, seeded.crop_ids
+    before = balances(seeded.engine, buyer, [crop_a, crop_b])
+    movements_before = movement_count(seeded.engine, buyer)
+    lines = (
+        [{"crop_id": crop_a, "movement_type": "purchase", "quantity_kg": 100, "unit_cost_usd": 1.5}]
+        + [{"crop_id": crop_a, "movement_type": "consumption", "quantity_kg": 2}] * 10
+        + [{"crop_id": 999_999, "movement_type": "consumption", "quantity_kg": 1}]
+        + [{"crop_id": crop_b, "movement_type": "waste", "quantity_kg": -1}]
+        + [{"crop_id": crop_b, "movement_type": "purchase", "quantity_kg": 7,
+            "movement_date": "2025-05-01T10:00:00+02:00"}]
+    )
+    body = "".join(json.dumps(line) + "\n" for line in lines).encode()
+
+    with Session(seeded.engine) as db:
+        result = ingest_stock_movements(db, buyer, [body[:100], body[100:]], "ndjson", chunk_size=4)
+
+    assert (result["rows"], result["applied"], result["rejected"]) == (14, 12, 2)
+    assert [r["error"] for r in result["results"] if r["status"] == "rejected"] == [
+        "Crop not found", "quantity_kg: Input should be greater than 0"]
+    after = balances(seeded.engine, buyer, [crop_a, crop_b])
+    assert after[crop_a] == pytest.approx(before[crop_a] + 80)
+    assert after[crop_b] == pytest.approx(before[crop_b] + 7)
+    assert movement_count(seeded.engine, buyer) == movements_before + 12
+    with Session(seeded.engine) as db:
+        consumption = db.scalars(select(StockMovement.quantity_kg).where(
+            StockMovement.buyer_user_id == buyer, StockMovement.crop_id == crop_a,
+            StockMovement.movement_type == StockMovementType.CONSUMPTION).order_by(StockMovement.movement_id)).all()
+        assert consumption[-10:] == [-2.0] * 10
+        purchase_date = db.scalar(select(BuyerStock.purchase_date).where(
+            BuyerStock.buyer_user_id == buyer, BuyerStock.crop_id == crop_b, BuyerStock.is_active == True))
+        assert purchase_date.replace(tzinfo=None).isoformat() == "2025-05-01T08:00:00"
+
+
+def test_bulk_endpoint_streams_csv(seeded):
+    buyer, crop_ids = seeded.buyer_user_id, seeded.crop_ids
+    before = balances(seeded.engine, buyer, crop_ids)
+    rows = 3000
+    user = SimpleNamespace(user_id=buyer)
+    async_engine = create_async_engine(str(seeded.engine.url).replace("sqlite://", "sqlite+aiosqlite://"))
+
+    async def get_db():
+        async with AsyncSession(async_engine) as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(buyer_inventory.router, prefix="/buyer-inventory")
+    app.dependency_overrides[get_async_db] = get_db
+    app.dependency_overrides[require_buyer] = lambda: user
+
+    async def body():
+        yield b"crop_id,movement_type,quantity_kg,unit_cost_usd\n"
+        for i in range(rows):
+            yield f"{crop_ids[i % 3]},purchase,1.0,2.0\n".encode()
+
+    async def post():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/buyer-inventory/stock/movements/bulk", content=body(),
+                                         headers={"Content-Type": "text/csv"})
+        await async_engine.dispose()
+        return response
+
+    response = asyncio.run(post())
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["rows"], result["applied"], result["rejected"]) == (rows, rows, 0)
+    assert [r["row"] for r in result["results"]] == list(range(1, rows + 1))
+    after = balances(seeded.engine, buyer, crop_ids)
+    assert {stock["crop_id"]: stock["new_quantity_kg"] for stock in result["stocks"]} == pytest.approx(after)
+    assert all(after[crop_id] == pytest.approx(before[crop_id] + rows / 3) for crop_id in crop_ids)
@@ -0,0 +1,112 @@
+"""
+Tests for atomic stock balance updates and ledger reconciliation in
+services/stock_ledger.py, including a concurrent writer stress test
+"""
+import asyncio
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core import metrics  # noqa: E402
+from app.core.database import Base, create_sync_engine  # noqa: E402
+from app.models import BuyerStock, StockMovement  # noqa: E402
+from app.models.buyer_stock import StockMovementType  # noqa: E402
+from app.services import scheduler  # noqa: E402
+from app.services.stock_ingest import ingest_stock_movements  # noqa: E402
+from app.services.stock_ledger import ledger_drift, reconcile_stock_balances  # noqa: E402
+from app.services.stock_sync import record_consumption, record_waste  # noqa: E402
+from benchmarks.seed import SCALES, seed_marketplace  # noqa: E402
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = create_sync_engine(f"sqlite:///{tmp_path / 'ledger.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        seed_marketplace(db, SCALES["tiny"])
+    yield engine
+    engine.dispose()
+
+
+def test_reconciliation_reports_then_rebuilds_drift(engine):
+    # Seeded balances are random and don't match their seeded movements
+    with Session(engine) as db:
+        balances = dict(db.execute(select(BuyerStock.stock_id, BuyerStock.current_quantity_kg)).all())
+        report = reconcile_stock_balances(db, fix=False)
+        assert report["stocks_checked"] == len(balances)
+        assert report["stocks_drifted"] > 0 and report["drift_kg"] > 0 and report["stocks_fixed"] == 0
+        assert dict(db.execute(select(BuyerStock.stock_id, BuyerStock.current_quantity_kg)).all()) == balances
+
+        result = scheduler._reconcile_stock_ledger(db)
+        assert result == scheduler.JobResult(report["stocks_drifted"], len(balances))
+        assert metrics.stock_ledger_drift_stocks._values[()] == report["stocks_drifted"]
+        assert ledger_drift(db) == []
+
+        stock_id, _, ledger = report["examples"][0]
+        assert db.get(BuyerStock, stock_id).current_quantity_kg == pytest.approx(ledger)
+        assert reconcile_stock_balances(db)["stocks_drifted"] == 0
+
+
+def test_concurrent_writers_keep_balance_and_ledger_in_step(engine):
+    with Session(engine) as db:
+        reconcile_stock_balances(db)
+        stock = db.scalars(select(BuyerStock).where(BuyerStock.is_active == True)
+                           .order_by(BuyerStock.stock_id)).first()
+        stock.current_quantity_kg += 10_000
+        db.add(StockMovement(stock_id=stock.stock_id, buyer_user_id=stock.buyer_user_id, crop_id=stock.crop_id,
+                             movement_type=StockMovementType.ADJUSTMENT, quantity_kg=10_000))
+        db.commit()
+        stock_id, buyer_user_id, crop_id = stock.stock_id, stock.buyer_user_id, stock.crop_id
+        start = stock.current_quantity_kg
+
+    from app.api.v1.endpoints.buyer_inventory import StockMovementCreate, create_stock_movement
+
+    sessions = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    user = SimpleNamespace(user_id=buyer_user_id)
+    threads, rounds = 6, 25
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def writer(index):
+        barrier.wait()
+        try:
+            for _ in range(rounds):
+                with sessions() as db:
+                    if index % 3 == 0:
+                        record_consumption(db, buyer_user_id, crop_id, 1.0)
+                    elif index % 3 == 1:
+                        record_waste(db, buyer_user_id, crop_id, 0.5)
+                    else:
+                        asyncio.run(create_stock_movement(
+                            StockMovementCreate(crop_id=crop_id, movement_type=StockMovementType.PURCHASE,
+                                                quantity_kg=2.0),
+                            idempotency_key=None, db=db, current_user=user))
+                        ingest_stock_movements(
+                            db, buyer_user_id,
+                            [f'{{"crop_id": {crop_id}, "movement_type": "consumption", "quantity_kg": 0.25}}\n'
+                             .encode()], "ndjson")
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    assert errors == []
+
+    # Per round: 2 threads x -1.0, 2 x -0.5, 2 x (+2.0 - 0.25)
+    expected = start + rounds * (2 * -1.0 + 2 * -0.5 + 2 * 1.75)
+    with Session(engine) as db:
+        assert db.get(BuyerStock, stock_id).current_quantity_kg == pytest.approx(expected)
+        assert db.scalar(select(func.count()).select_from(BuyerStock).where(
+            BuyerStock.buyer_user_id == buyer_user_id, BuyerStock.crop_id == crop_id,
+            BuyerStock.is_active == True)) == 1
+        assert ledger_drift(db) == []
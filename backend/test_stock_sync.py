@@ -0,0 +1,129 @@
+"""
+Tests for batched stock sync in services/stock_sync.py and the bulk
+mark-delivered endpoint in endpoints/orders.py
+"""
+import os
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(__file__))
+
+from app.core.database import Base  # noqa: E402
+from app.models import Buyer, BuyerStock, Order, OrderItem, StockMovement  # noqa: E402
+from app.models.order import OrderStatus  # noqa: E402
+from app.models.pricing import Listing  # noqa: E402
+from app.models.production import Lot, ProductionPlan  # noqa: E402
+from app.services.stock_sync import sync_stock_from_order, sync_stock_from_orders  # noqa: E402
+from benchmarks.seed import SCALES, seed_marketplace  # noqa: E402
+
+STAFF = SimpleNamespace(role=SimpleNamespace(value="ADMIN"))
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'stock.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        seed_marketplace(db, SCALES["tiny"])
+        db.commit()
+    yield engine
+    engine.dispose()
+
+
+def undelivered(db, count):
+    return db.scalars(select(Order).where(Order.status != OrderStatus.DELIVERED)
+                      .order_by(Order.order_id).limit(count)).all()
+
+
+def expected_totals(db, orders):
+    """(buyer_user_id, crop_id) -> kg delivered by these orders"""
+    totals = {}
+    for buyer_user_id, crop_id, qty in db.execute(
+        select(Buyer.user_id, ProductionPlan.crop_id, OrderItem.qty_kg)
+        .join(Order, Order.order_id == OrderItem.order_id)
+        .join(Buyer, Buyer.buyer_id == Order.buyer_id)
+        .join(Listing, Listing.listing_id == OrderItem.listing_id)
+        .join(Lot, Lot.lot_id == Listing.lot_id)
+        .join(ProductionPlan, ProductionPlan.plan_id == Lot.plan_id)
+        .where(OrderItem.order_id.in_([order.order_id for order in orders]))
+    ):
+        totals[(buyer_user_id, crop_id)] = totals.get((buyer_user_id, crop_id), 0.0) + qty
+    return totals
+
+
+def stock_levels(db, keys):
+    return {
+        key: db.scalar(select(func.coalesce(func.sum(BuyerStock.current_quantity_kg), 0.0)).where(
+            BuyerStock.buyer_user_id == key[0], BuyerStock.crop_id == key[1], BuyerStock.is_active == True))
+        for key in keys
+    }
+
+
+def test_batch_sync_uses_a_fixed_number_of_queries(engine):
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with Session(engine) as db:
+        orders = undelivered(db, 20)
+        expected = expected_totals(db, orders)
+        before = stock_levels(db, expected)
+        item_count = db.scalar(select(func.count()).select_from(OrderItem).where(
+            OrderItem.order_id.in_([order.order_id for order in orders])))
+
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            assert sync_stock_from_orders(db, orders) == item_count
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        # One query each for buyers, order items and stocks, and one movement insert
+        assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 3
+        assert len([s for s in statements if "INSERT INTO stock_movements" in s]) == 1
+        after = stock_levels(db, expected)
+        for key, qty in expected.items():
+            assert after[key] == pytest.approx(before[key] + qty)
+        movements = db.scalars(select(StockMovement).where(
+            StockMovement.order_id.in_([order.order_id for order in orders]))).all()
+        assert len(movements) == item_count
+        stock_ids = set(db.scalars(select(BuyerStock.stock_id)))
+        assert all(movement.stock_id in stock_ids for movement in movements)
+
+
+def test_single_order_sync_matches_batch(engine):
+    with Session(engine) as db:
+        [order] = undelivered(db, 1)
+        expected = expected_totals(db, [order])
+        before = stock_levels(db, expected)
+        sync_stock_from_order(db, order)
+        after = stock_levels(db, expected)
+        assert all(after[key] == pytest.approx(before[key] + qty) for key, qty in expected.items())
+
+
+def test_mark_delivered_endpoint(engine):
+    from app.api.v1.endpoints.orders import MarkDeliveredIn, mark_orders_delivered
+
+    with Session(engine) as db:
+        orders = undelivered(db, 5)
+        delivered_id = db.scalar(select(Order.order_id).where(Order.status == OrderStatus.DELIVERED))
+        ids = [order.order_id for order in orders]
+        delivered_at = datetime(2025, 3, 1, 12, 0)
+
+        result = mark_orders_delivered(
+            MarkDeliveredIn(order_ids=ids + [delivered_id, 999_999, ids[0]], delivered_at=delivered_at),
+            db=db, current_user=STAFF)
+
+    assert result.delivered == ids
+    assert result.already_delivered == [delivered_id]
+    assert result.not_found == [999_999]
+    with Session(engine) as db:
+        rows = db.execute(select(Order.status, Order.actual_delivery_date).where(Order.order_id.in_(ids))).all()
+        assert {status for status, _ in rows} == {OrderStatus.DELIVERED}
+        assert result.movements_created == db.scalar(select(func.count()).select_from(StockMovement).where(
+            StockMovement.order_id.in_(ids), StockMovement.movement_date == delivered_at))